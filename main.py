@@ -1,20 +1,17 @@
-from Npp import notepad, editor, console, SCINTILLANOTIFICATION, UPDATE, NOTIFICATION
-import logging, time, re
-from npp_mcnp_plugin.utils.file_parser import FileParser
+import time
+# start of the plugin activation, the import of this script is the first startup phase
+STARTUP_STARTED = time.time()
+
+from Npp import notepad, editor, console, SCINTILLANOTIFICATION, UPDATE, NOTIFICATION, MODIFICATIONFLAGS
+import logging, re, threading
 from npp_mcnp_plugin.views.autocoplete_view import  AutocompleteNotification
 from npp_mcnp_plugin.views.selection_view import  SelectionNotification
 from npp_mcnp_plugin.views.error_view   import  ErrorView
 
-from npp_mcnp_plugin.models.line_model import ModelOfLine
-from npp_mcnp_plugin.models.error import  ErrorCollection
-from npp_mcnp_plugin.models.mcnp_input  import ModelMcnpInput   
-from npp_mcnp_plugin.utils.general_utils import configure_logging, get_char_from_args, validate_return_id_as_int
-from npp_mcnp_plugin.utils.string_utils import is_comment_line, is_string_empty
-from npp_mcnp_plugin.utils.input_validator import InputValidator
+from npp_mcnp_plugin.utils.general_utils import configure_logging, get_char_from_args, validate_return_id_as_int, PhaseTimer
 
-from npp_mcnp_plugin.presenters.presenter_factories import BlockPreseterFactory, BlockAutoCompletePresenterFactory
-from npp_mcnp_plugin.presenters.validation_presenter import validate_mcnp_model
-from npp_mcnp_plugin.utils.string_utils import get_block_type_from_line
+# The presenters, the parser, the validator and the services are imported by the first event which needs them,
+# so activating the plugin doesn't wait for their imports and data files.
 
 FILE_TYPES_TO_IGNORE = [
     # Documentation and text files
@@ -70,83 +67,290 @@ class EditorHandler:
         self.autocomplete_notifier = autocomplete_notifier
         self.logger = logging.getLogger(self.__class__.__name__)
         self.autocompletion_data = None
+        self.parsed_file = None
+        self.mcnp_input = None
+        self.model_sync_service = None
+        # parsed and validated inputs by content hash, persisted between sessions, created with the parse service
+        self.parse_cache = None
+        self.content_hash = None
+        # file of the latest parse request, the model of another file is never served for it
+        self.current_filename = None
+        self.parse_service = None
+        # coalesces the UPDATEUI events and memoizes the hovers by model version, line and selection
+        self.selection_service = None
+        self._services_lock = threading.Lock()
+        # guards the swap of the model against a file switch
+        self._model_lock = threading.Lock()
+        # the cards of the model are created on first access and changed by the live sync, the UI callbacks
+        # and the selection worker read or change the model one at a time
+        self._model_access_lock = threading.RLock()
+        # PhaseTimer of the plugin activation, the first parse is reported with it
+        self.startup_timer = None
+        # errors of the latest parse, shown by the next UI callback as the message box can't be opened by the worker
+        self.pending_errors = None
+        # number of the latest parse request, a request started on a worker thread is dropped once a newer one exists
+        self._parse_request = 0
+        self._request_lock = threading.Lock()
+        # number of modifications of the text, compared at the swap with the number when the parsed text was read:
+        # the modifications made meanwhile are not in the parsed model, the next UI callback parses the text again
+        self.modification_count = 0
+        self._parsed_modification_count = 0
+        self.model_outdated = False
 
-        # initialisng parser instance from file cls method 
+    def start(self, startup_timer=None):
+        """
+        Requests the parse of the open file, the imports and the parse run on a worker thread.
+        Called once the callbacks are registered, so the activation doesn't wait for the parse.
+        """
+        self.startup_timer = startup_timer
         self._initialise_parser_and_mcnp_input()
+
+    def _get_parse_service(self):
+        """ imports and creates the parse cache and the parse service on the first parse request """
+        with self._services_lock:
+            if self.parse_service is None:
+                from npp_mcnp_plugin.utils.parse_cache import ParseCache
+                from npp_mcnp_plugin.services.background_parse_service import BackgroundParseService
+                self.parse_cache = ParseCache()
+                self.parse_service = BackgroundParseService(self.parse_cache, self._on_parsed)
+            return self.parse_service
+
+    def _get_selection_service(self):
+        if self.selection_service is None:
+            from npp_mcnp_plugin.services.selection_event_service import SelectionEventService
+            self.selection_service = SelectionEventService(self._analyze_selection, self.selection_notifier.notify)
+        return self.selection_service
         
     def register_callbacks(self):
         editor.clearCallbacks([SCINTILLANOTIFICATION.UPDATEUI])
         editor.callbackSync(self.on_select, [SCINTILLANOTIFICATION.UPDATEUI])
         editor.callbackSync(self.on_character_added, [SCINTILLANOTIFICATION.CHARADDED])
+        # synchronous as the line numbers of the notification are only valid until the next modification
+        editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
         notepad.callback(self.on_document_saved, [NOTIFICATION.FILESAVED])
         editor.callback(self.on_autocompletion_selection, [SCINTILLANOTIFICATION.AUTOCSELECTIONCHANGE])
 
         pass
     def _initialise_parser_and_mcnp_input(self):
         """
-        Parse the file and create the MCNP input instance. Validate the model after parsing.
+        Requests the parse of the current file. The import of the parse service, the hash, the parse and the validation
+        run in the background, the model is swapped in by _on_parsed.
         """
-        self.logger.info("Initialising ErrorCollection")
-        mcnp_error_collection = ErrorCollection()
         self.logger.info("Initialising parser and Mcnp input")
         
         # Parse the file
 
-        current_filename = notepad.getCurrentFilename()
+        current_filename = str(notepad.getCurrentFilename())
+        with self._model_lock:
+            if current_filename != self.current_filename:
+                self._drop_model()
+            self.current_filename = current_filename
 
         # Ignore certain file types, such as text, output, csv, or python files and stop parsing in that case
         if any(current_filename.lower().endswith(filetype.lower()) for filetype in FILE_TYPES_TO_IGNORE):
             self.logger.info("Ignoring file: {}".format(current_filename))
+            if self.parse_service is not None:
+                self.parse_service.cancel()
             return
 
-        self.parsed_file = FileParser.from_file(current_filename, mcnp_error_collection)
-        self.mcnp_input = ModelMcnpInput.from_file_parser(self.parsed_file)
+        # one bulk read of the editor buffer, no disk round-trip and unsaved edits are included
+        text = editor.getCharacterPointer()
+        self._parsed_modification_count = self.modification_count
+        self._start_request(self._submit_parse, text, current_filename)
 
-        
-        # Validate the parsed model
-        validator = InputValidator()  # initialise validator
-        validate_mcnp_model(self.mcnp_input, mcnp_error_collection, validator)
+    def _start_request(self, submit, *args):
+        """
+        Calls submit on a worker thread, so the UI thread never waits for the imports or the hash of the text.
+        The requests are numbered, a request whose thread starts after a newer one is dropped.
+        """
+        self._parse_request += 1
+        starter = threading.Thread(target=self._run_request, args=(self._parse_request, submit) + args)
+        starter.daemon = True
+        starter.start()
+
+    def _run_request(self, request, submit, *args):
+        with self._request_lock:
+            if request == self._parse_request:
+                submit(*args)
+
+    def _drop_model(self):
+        """
+        Stops serving the model of the previous file, the hovers and the live sync wait for the parse of the new one.
+        """
+        self.mcnp_input = None
+        self.model_sync_service = None
+        self.parsed_file = None
+        self.content_hash = None
+        self.pending_errors = None
+        self.model_outdated = False
+        if self.selection_service is not None:
+            self.selection_service.clear()
+
+    def _submit_parse(self, text, filename):
+        parse_service = self._get_parse_service()
+        parse_service.submit(text, filename, self.parse_cache.content_hash(text, filename))
+
+    def _update_parser_and_mcnp_input(self):
+        """
+        Requests the re-parse of the saved file, the cards unchanged since the previous parse reuse their instances.
+        An identical save is skipped, a newer save cancels the parse which is still running.
+        """
+        self.logger.info("Updating parser and Mcnp input")
+        text = editor.getCharacterPointer()
+        self._parsed_modification_count = self.modification_count
+        # copied here as the live sync changes the model on the UI thread,
+        # the worker patches the copy and the current model keeps serving the callbacks until the swap
+        with self._model_access_lock:
+            previous_model = self.mcnp_input.copy() if self.mcnp_input is not None else None
+        self._start_request(self._submit_update, text, self.current_filename, self.parsed_file, previous_model)
+
+    def _submit_update(self, text, filename, previous_parser, previous_model):
+        parse_service = self._get_parse_service()
+        content_hash = self.parse_cache.content_hash(text, filename)
+        # identical save, the model and the validation results are up to date
+        if content_hash == self.content_hash:
+            self.logger.info("Saved text unchanged, skipping parsing and validation")
+            # the parse of an intermediate save would replace the model of this text
+            parse_service.cancel()
+            return
+        parse_service.submit(text, filename, content_hash, previous_parser=previous_parser, previous_model=previous_model)
+
+    def _on_parsed(self, result):
+        """
+        Swaps the parsed model in, called from the parse worker once parsing and validation completed.
+        """
+        from npp_mcnp_plugin.services.model_sync_service import ModelSyncService
+        model_sync_service = ModelSyncService(result.mcnp_input, editor.getLine, editor.getLineCount)
+        # checked and swapped under the lock, a file switch meanwhile can't get the model of the previous file
+        with self._model_lock:
+            if result.filename != self.current_filename:
+                return
+            self.parsed_file = result.parser
+            self.model_sync_service = model_sync_service
+            self.content_hash = result.content_hash
+            # single assignment, callbacks running meanwhile keep the previous model
+            self.mcnp_input = result.mcnp_input
+            # the text was modified during the parse, e.g. on first open before the live sync existed
+            self.model_outdated = self.modification_count != self._parsed_modification_count
+
+        if self.startup_timer is not None:
+            self.logger.info("First model ready {:.1f} ms after the activation started".format(self.startup_timer.elapsed() * 1000))
+            self.startup_timer = None
+
+        self.logger.debug("Parsing errors: %s", result.error_collection)
+        self.pending_errors = result.error_collection
+
+    def _parse_outdated_model(self):
+        """ parses the text again if it was modified during the parse of the model, called from the UI callbacks """
+        if self.model_outdated:
+            self.model_outdated = False
+            self._update_parser_and_mcnp_input()
 
-        # Notify the error view if there are any validation errors
-        self.logger.debug("Parsing errors: %s", mcnp_error_collection)
-        self.error_notifier.notify(mcnp_error_collection)
+    def _show_pending_errors(self):
+        """ shows the errors of the latest parse, called from the UI callbacks """
+        error_collection, self.pending_errors = self.pending_errors, None
+        if error_collection is not None:
+            self.error_notifier.notify(error_collection)
 
     def on_document_saved(self, args):
         self.logger.info("Document saved")
+        self._show_pending_errors()
+        # the saved file is the parsed one, only the changed cards have to be re-created
+        if self.parsed_file is not None and str(notepad.getCurrentFilename()) == self.current_filename:
+            self._update_parser_and_mcnp_input()
+            return
         self._initialise_parser_and_mcnp_input()
         
 
+    def on_modified(self, args):
+        """
+        Updates the cards of the model overlapping the modified lines, so hovers and autocomplete don't wait for a save.
+        """
+        modification_type = args['modificationType']
+        if not modification_type & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            return
+        self.modification_count += 1
+        if self.model_sync_service is None:
+            return
+        position = args['position']
+        first_line = editor.lineFromPosition(position)
+
+        last_line = first_line
+        if modification_type & MODIFICATIONFLAGS.INSERTTEXT:
+            last_line = editor.lineFromPosition(position + args['length'])
+        with self._model_access_lock:
+            self.model_sync_service.after_modification(first_line, last_line, args['linesAdded'])
+
     def on_select(self, args):
+        self._show_pending_errors()
         # if file has changed reload!
-        if str(notepad.getCurrentFilename()) != self.parsed_file.filename:
+        if str(notepad.getCurrentFilename()) != self.current_filename:
             self._initialise_parser_and_mcnp_input()
+        else:
+            self._parse_outdated_model()
+        # the first parse is still running
+        if self.mcnp_input is None:
+            return
         # if the selection arguments are not updated
         #  and the selection is not updated
         if  args['updated'] is False or  UPDATE.SELECTION is False:
             return 
-        # getting the current line and the selection in a class
-        model_of_current_line = ModelOfLine.from_notepad()
-        
+        # only the positions are read here, the line is analysed once the caret rests (see SelectionEventService)
+        selection_start, selection_end = editor.getSelectionStart(), editor.getSelectionEnd()
+        if selection_start == selection_end:
+            self._get_selection_service().submit(None)
+            return
+        mcnp_input = self.mcnp_input
+        self._get_selection_service().submit((mcnp_input.version, editor.lineFromPosition(selection_start), selection_start, selection_end),
+                                             lambda: self._snapshot_selection(mcnp_input))
+
+    def _snapshot_selection(self, mcnp_input):
+        """
+        Reads the selection and the lines of its card on the UI thread, the analysis runs on the selection worker.
+        """
+        from npp_mcnp_plugin.models.line_model import ModelOfLine
+        model_of_current_line = ModelOfLine.from_notepad(mcnp_input.line_index)
+        # computed here, so the worker never reads lines outside of the snapshot from the editor
+        model_of_current_line.full_entry
+        return mcnp_input, model_of_current_line
+
+    def _analyze_selection(self, snapshot):
+        """
+        Returns the result of the block presenter for the snapshot of the selection, None if there is nothing to show.
+        """
+        from npp_mcnp_plugin.utils.string_utils import is_comment_line, is_string_empty, get_block_type_from_line
+        from npp_mcnp_plugin.presenters.presenter_factories import BlockPreseterFactory
+
+        mcnp_input, model_of_current_line = snapshot
+
         # if the current line is a comment or the selection is empty or the line is empty then return
         if (is_comment_line(model_of_current_line.current_line) or 
             is_string_empty(model_of_current_line.selected_text) or 
             is_string_empty(model_of_current_line.current_line)):
-            return
+            return None
         
         # getting the block type according to which we can select presenter
         block_type = get_block_type_from_line(self.logger, model_of_current_line.full_entry.strip())
         self.logger.info("Block type is: %s", block_type)
         if not block_type:
-             return 
+             return None
         
         # block presenter can analysie the 
-        block_presenter = BlockPreseterFactory(block_type, model_of_mcnp_card= model_of_current_line, mcnp_input=self.mcnp_input, notifier=self.selection_notifier)
-        block_presenter.notify_selection()
+        block_presenter = BlockPreseterFactory(block_type, model_of_mcnp_card= model_of_current_line, mcnp_input=mcnp_input, notifier=self.selection_notifier)
+        with self._model_access_lock:
+            return block_presenter.analyze_selection()
         
     def on_character_added(self, args):
+            # the first parse is still running
+            if self.mcnp_input is None:
+                return
+            from npp_mcnp_plugin.models.line_model import ModelOfLine
+            from npp_mcnp_plugin.utils.string_utils import get_block_type_from_line
+            from npp_mcnp_plugin.presenters.presenter_factories import BlockAutoCompletePresenterFactory
+
             char_added = get_char_from_args(args)
             
-            model_of_current_line = ModelOfLine.from_notepad()
+            model_of_current_line = ModelOfLine.from_notepad(self.mcnp_input.line_index)
 
             block_type = get_block_type_from_line(self.logger, model_of_current_line.full_entry.strip())
             self.logger.info("Block type is: %s, char added is: %s", block_type, char_added)
@@ -162,7 +366,8 @@ class EditorHandler:
                 mcnp_input=self.mcnp_input, 
                 notifier=self.autocomplete_notifier,
             )
-            self.autocompletion_data = autocomplete_presenter.pop_suggestions() 
+            with self._model_access_lock:
+                self.autocompletion_data = autocomplete_presenter.pop_suggestions()
 
         
     def on_autocompletion_selection(self, selection):
@@ -181,7 +386,8 @@ class EditorHandler:
             if metadata=="material" or metadata=="surface":
                 # Print the selected item along with its type and info
                 # get the selected item from the mcnp_input and pass to the selection_notifier to notify
-                selected_item = self.mcnp_input.get_item_by_name(metadata, validate_return_id_as_int(selected_text))
+                with self._model_access_lock:
+                    selected_item = self.mcnp_input.get_item_by_name(metadata, validate_return_id_as_int(selected_text))
                 self.logger.info("Selected {} ".format(selected_item))
                 #analysis_result = {"value" : selected_item}
                 #self.selection_notifier.notify(analysis_result)
@@ -190,9 +396,9 @@ class EditorHandler:
 
 if __name__ == "__main__":
     configure_logging(enable_logging=True)
-    
-    # Record the start time
-    start_time = time.time()
+    # per-phase breakdown of the activation, the import of this script included
+    startup_timer = PhaseTimer(STARTUP_STARTED)
+    startup_timer.mark("imports")
     
     # Initialize objects
     selection_notifier = SelectionNotification()
@@ -201,15 +407,16 @@ if __name__ == "__main__":
     
     # Setting autocomplete separator as a new line character
     editor.autoCSetSeparator(ord("\n"))
+    startup_timer.mark("views")
     
     # Renamed the handler for consistency and clarity
     editor_handler = EditorHandler(selection_notifier, error_view, autocomplete_notifier)
+    startup_timer.mark("handler")
     editor_handler.register_callbacks()
-    
-    # Record the end time
-    end_time = time.time()
-    
-    # Calculate and print the elapsed time
-    elapsed_time = end_time - start_time
-    editor_handler.logger.info("Initialization took {:.4e} seconds".format(elapsed_time))
+    startup_timer.mark("callbacks")
+
+    # the first parse runs in the background, the callbacks serve the editor meanwhile
+    editor_handler.start(startup_timer)
+    startup_timer.mark("parse request")
 
+    editor_handler.logger.info("Initialization took {}".format(startup_timer.summary()))
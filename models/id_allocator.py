@@ -0,0 +1,117 @@
+from array import array
+from bisect import bisect_right
+
+# ids of new cards start at 1, material 0 is the void
+FIRST_ID = 1
+
+
+class IdAllocator(object):
+    """
+    Interval set of the used ids of a model component, answers which ids are free for new cards.
+
+    The used ids are kept as merged [start, end] ranges in sorted arrays, so the next free id after N is one bisect.
+    The first free block of K ids is found by descending a max-tree over the gaps between the ranges,
+    the tree is rebuilt on the first query after the ids changed.
+    """
+    def __init__(self, ids=()):
+        self.starts = array('l')
+        self.ends = array('l')
+        previous = None
+        for item_id in sorted(ids):
+            if previous is not None and item_id <= previous + 1:
+                self.ends[-1] = max(self.ends[-1], item_id)
+            else:
+                self.starts.append(item_id)
+                self.ends.append(item_id)
+            previous = item_id
+        self._gap_tree = None
+
+    def __len__(self):
+        """ number of used ranges """
+        return len(self.starts)
+
+    def copy(self):
+        copied = IdAllocator()
+        copied.starts = array('l', self.starts)
+        copied.ends = array('l', self.ends)
+        return copied
+
+    def _range_of(self, item_id):
+        position = bisect_right(self.starts, item_id) - 1
+        if position >= 0 and item_id <= self.ends[position]:
+            return position
+        return None
+
+    def __contains__(self, item_id):
+        return self._range_of(item_id) is not None
+
+    def add(self, item_id):
+        if item_id in self:
+            return
+        position = bisect_right(self.starts, item_id)
+        joins_previous = position > 0 and self.ends[position - 1] == item_id - 1
+        joins_next = position < len(self.starts) and self.starts[position] == item_id + 1
+        if joins_previous and joins_next:
+            self.ends[position - 1] = self.ends[position]
+            del self.starts[position], self.ends[position]
+        elif joins_previous:
+            self.ends[position - 1] = item_id
+        elif joins_next:
+            self.starts[position] = item_id
+        else:
+            self.starts.insert(position, item_id)
+            self.ends.insert(position, item_id)
+        self._gap_tree = None
+
+    def remove(self, item_id):
+        position = self._range_of(item_id)
+        if position is None:
+            return
+        start, end = self.starts[position], self.ends[position]
+        if start == end:
+            del self.starts[position], self.ends[position]
+        elif item_id == start:
+            self.starts[position] = item_id + 1
+        elif item_id == end:
+            self.ends[position] = item_id - 1
+        else:
+            self.ends[position] = item_id - 1
+            self.starts.insert(position + 1, item_id + 1)
+            self.ends.insert(position + 1, end)
+        self._gap_tree = None
+
+    def next_free(self, after):
+        """ returns the first id greater than after which is not used """
+        candidate = max(after + 1, FIRST_ID)
+        position = self._range_of(candidate)
+        return self.ends[position] + 1 if position is not None else candidate
+
+    def _gap_start(self, position):
+        return self.ends[position - 1] + 1 if position else FIRST_ID
+
+    def _build_gap_tree(self):
+        """ max-tree over the sizes of the free gaps in front of each used range, leaves at [size, 2 * size) """
+        size = 1
+        while size < len(self.starts):
+            size *= 2
+        tree = array('l', [0] * (2 * size))
+        for position in range(len(self.starts)):
+            tree[size + position] = self.starts[position] - self._gap_start(position)
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._gap_tree = tree
+
+    def first_free_block(self, block_size):
+        """ returns the first id of the lowest block of block_size consecutive free ids """
+        if not self.starts:
+            return FIRST_ID
+        if self._gap_tree is None:
+            self._build_gap_tree()
+        tree = self._gap_tree
+        if tree[1] < block_size:
+            return self.ends[-1] + 1
+        node = 1
+        leaves = len(tree) // 2
+        while node < leaves:
+            node = 2 * node if tree[2 * node] >= block_size else 2 * node + 1
+        return self._gap_start(node - leaves)
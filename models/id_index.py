@@ -0,0 +1,56 @@
+from array import array
+from bisect import bisect_left, insort
+
+
+class IdPrefixIndex(object):
+    """
+    Sorted array of the ids of a model component (cells, surfaces, ...) for id autocompletion.
+
+    The ids starting with the typed digits are the numeric ranges [prefix * 10**k, (prefix + 1) * 10**k) for each
+    number of extra digits k, so the completions are found with a bisect per range, in numeric order,
+    and only the returned ids are read.
+    """
+    def __init__(self, ids=()):
+        self.ids = array('l', sorted(ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        position = bisect_left(self.ids, item_id)
+        return position < len(self.ids) and self.ids[position] == item_id
+
+    def copy(self):
+        copied = IdPrefixIndex()
+        copied.ids = array('l', self.ids)
+        return copied
+
+    def add(self, item_id):
+        if item_id not in self:
+            insort(self.ids, item_id)
+
+    def remove(self, item_id):
+        position = bisect_left(self.ids, item_id)
+        if position < len(self.ids) and self.ids[position] == item_id:
+            del self.ids[position]
+
+    def complete(self, prefix, limit):
+        """
+        Returns up to limit ids starting with the digits of prefix, shorter ids first and in numeric order.
+        """
+        if not self.ids:
+            return []
+        if not prefix:
+            return list(self.ids[:limit])
+
+        completions = []
+        low, high = int(prefix), int(prefix) + 1
+        # "0" only completes the id 0, ids have no leading zeros
+        while low <= self.ids[-1] and len(completions) < limit:
+            start = bisect_left(self.ids, low)
+            end = min(bisect_left(self.ids, high, start), start + limit - len(completions))
+            completions.extend(self.ids[start:end])
+            if low == 0:
+                break
+            low, high = low * 10, high * 10
+        return completions
@@ -0,0 +1,187 @@
+import logging
+from collections import OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+try:
+    from npp_mcnp_plugin.models.error import ErrorModel
+except ImportError:
+    from models.error import ErrorModel
+
+# number of built cards kept per LazyCardDict, the least recently used are dropped first
+MAX_CACHED_CARDS = 10000
+
+
+class LazyCardDict(MutableMapping):
+    """
+    Dictionary of cards by id which keeps only the source (merged line and comment) of each card
+    and creates the card instance on first access.
+
+    Built instances are kept in a bounded least recently used cache, instances set explicitly
+    (e.g. the default "Void" material or cards synced live from the editor) are kept until they are removed.
+    Cards which fail to be created are reported to the error collection once and behave as missing.
+    """
+    def __init__(self, sources, create_instance_func, error_collection=None, max_cached=MAX_CACHED_CARDS):
+        """
+        Args:
+            sources (dict): id -> (line, comment) of the cards.
+            create_instance_func (function): creates the card instance from the line and comment.
+            error_collection (ErrorCollection): collects the errors of the cards which fail to be created.
+            max_cached (int): maximum number of built instances kept.
+        """
+        self.sources = sources
+        self.create_instance_func = create_instance_func
+        self.error_collection = error_collection
+        self.max_cached = max_cached
+        self.cached = OrderedDict()
+        self.instances = {}
+        self.failed = set()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def __getstate__(self):
+        """
+        Only the sources, the explicitly set instances and the failed ids are pickled,
+        the built instances are created again on access.
+        """
+        state = self.__dict__.copy()
+        del state["logger"]
+        state["cached"] = OrderedDict()
+        state["error_collection"] = None
+        # the factories are class methods (CellFactory, Surface and Material.create_from_input_line),
+        # pickled by owner and name as python 2 can't pickle bound methods
+        func = self.create_instance_func
+        if getattr(func, "__self__", None) is None:
+            raise TypeError("create_instance_func {!r} must be a class method to be pickled".format(func))
+        state["create_instance_func"] = (func.__self__, func.__name__)
+        return state
+
+    def __setstate__(self, state):
+        func = state["create_instance_func"]
+        if isinstance(func, tuple):
+            state["create_instance_func"] = getattr(*func)
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _build(self, card_id):
+        line, comment = self.sources[card_id]
+        try:
+            instance = self.create_instance_func(line, comment)
+        except Exception as e:
+            self.logger.error("Error while processing line '%s': %s", line, e)
+            self.failed.add(card_id)
+            if self.error_collection is not None:
+                self.error_collection.add_error(ErrorModel(line, e, "INVALID_DATA"))
+            return None
+
+        if instance is None:
+            self.failed.add(card_id)
+            return None
+        self.cached[card_id] = instance
+        if len(self.cached) > self.max_cached:
+            self.cached.popitem(last=False)
+        return instance
+
+    def __getitem__(self, card_id):
+        if card_id in self.instances:
+            return self.instances[card_id]
+        if card_id in self.cached:
+            instance = self.cached.pop(card_id)
+            self.cached[card_id] = instance
+            return instance
+        if card_id in self.sources and card_id not in self.failed:
+            instance = self._build(card_id)
+            if instance is not None:
+                return instance
+        raise KeyError(card_id)
+
+    def __setitem__(self, card_id, instance):
+        self.cached.pop(card_id, None)
+        self.failed.discard(card_id)
+        self.instances[card_id] = instance
+
+    def __delitem__(self, card_id):
+        if card_id not in self:
+            raise KeyError(card_id)
+        self.instances.pop(card_id, None)
+        self.sources.pop(card_id, None)
+        self.cached.pop(card_id, None)
+        self.failed.discard(card_id)
+
+    def __contains__(self, card_id):
+        # does not build the card
+        return card_id in self.instances or (card_id in self.sources and card_id not in self.failed)
+
+    def __iter__(self):
+        for card_id in self.instances:
+            yield card_id
+        for card_id in list(self.sources):
+            if card_id not in self.instances and card_id not in self.failed:
+                yield card_id
+
+    def __len__(self):
+        return len(self.instances) + sum(1 for card_id in self.sources
+                                         if card_id not in self.instances and card_id not in self.failed)
+
+    def items(self):
+        """ yields the built cards one by one, the cards which fail to be created are skipped """
+        for card_id in list(self):
+            instance = self.get(card_id)
+            if instance is not None:
+                yield card_id, instance
+
+    def values(self):
+        for card_id, instance in self.items():
+            yield instance
+
+    def copy(self):
+        """
+        Returns a dictionary sharing the sources and the built instances, adding or removing cards of one
+        doesn't change the other.
+        """
+        copied = LazyCardDict(dict(self.sources), self.create_instance_func, self.error_collection, self.max_cached)
+        copied.cached = OrderedDict(self.cached)
+        copied.instances = dict(self.instances)
+        copied.failed = set(self.failed)
+        return copied
+
+    def source(self, card_id):
+        return self.sources.get(card_id)
+
+    def patch(self, new_cards, keep_ids=()):
+        """
+        Updates the cards in place to match the cards of a re-parsed file.
+        The cards with unchanged source keep their built instance.
+
+        Returns:
+            set: the added, changed or removed ids.
+        """
+        changed_ids = set()
+        for card_id in set(self.instances) | set(self.sources):
+            if card_id not in keep_ids and card_id not in new_cards.sources and card_id not in new_cards.instances:
+                self.instances.pop(card_id, None)
+                self.sources.pop(card_id, None)
+                self.cached.pop(card_id, None)
+                self.failed.discard(card_id)
+                changed_ids.add(card_id)
+
+        for card_id, source in new_cards.sources.items():
+            if card_id in keep_ids:
+                continue
+            if card_id in self.instances or self.sources.get(card_id) != source:
+                self.instances.pop(card_id, None)
+                self.cached.pop(card_id, None)
+                self.failed.discard(card_id)
+                self.sources[card_id] = source
+                changed_ids.add(card_id)
+
+        # instances set explicitly, e.g. the cards of the included files
+        for card_id, instance in new_cards.instances.items():
+            if card_id in keep_ids or self.instances.get(card_id) is instance:
+                continue
+            self[card_id] = instance
+            self.sources.pop(card_id, None)
+            changed_ids.add(card_id)
+        self.error_collection = new_cards.error_collection
+        return changed_ids
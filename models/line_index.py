@@ -0,0 +1,176 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+try:
+    from npp_mcnp_plugin.utils.string_utils import is_comment_line, remove_comments
+except ImportError:
+    from utils.string_utils import is_comment_line, remove_comments
+
+# lines of a card, from its first line to its last continuation line (inclusive)
+CardSpan = namedtuple("CardSpan", ["start", "end", "block_type", "card_id"])
+
+
+def _card_id(line):
+    """ id of the card: number of the cell or surface, first entry (e.g. "m1", "f4:n") of a data card """
+    first_entry = line.split()[0]
+    return int(first_entry) if first_entry.isdigit() else first_entry
+
+
+def scan_cards(lines, first_line_no):
+    """
+    Yields (start, end, card id) of the cards of the raw editor lines starting at line first_line_no.
+    A line continues the card if it starts with 4 spaces or the previous line ends with '&',
+    comment lines between the continuation lines belong to the card.
+    """
+    card_start = card_end = card_id = None
+    previous_line_continues = False
+    for line_no, raw_line in enumerate(lines, first_line_no):
+        line, __ = remove_comments(raw_line.rstrip("\r\n").lower())
+        if line.strip() == "" or is_comment_line(line):
+            continue
+        if card_start is not None and (line.startswith("    ") or previous_line_continues):
+            card_end = line_no
+        else:
+            if card_start is not None:
+                yield card_start, card_end, card_id
+            card_start = card_end = line_no
+            card_id = _card_id(line)
+        previous_line_continues = line.rstrip().endswith("&")
+    if card_start is not None:
+        yield card_start, card_end, card_id
+
+
+class LineIndex(object):
+    """
+    Sorted interval index of the lines of the input: maps every line to its block and to the card
+    (id, first and last line) it belongs to with a bisect, instead of walking the editor lines.
+
+    The card intervals are kept in parallel arrays sorted by their first line, the block intervals
+    are the block locations of the parser (end line included as in ModelMcnpInput.return_block_type).
+
+    Adding or removing lines moves all the cards below them. The move is kept as a pending offset of the cards
+    from position `shift_position` on instead of being written to the arrays, so an edit only writes the cards
+    between its position and the position of the previous edit, and the lookups subtract the offset from the line
+    they bisect for in the shifted part.
+    """
+    def __init__(self, block_locations):
+        self.block_locations = block_locations
+        self.starts = array('l')
+        self.ends = array('l')
+        self.card_ids = []
+        # the cards from shift_position on are shift_delta lines below their line numbers in the arrays
+        self.shift_position = 0
+        self.shift_delta = 0
+
+    @classmethod
+    def from_blocks(cls, block_locations, iter_block_lines):
+        """
+        Args:
+            block_locations (dict): start and end line of each block.
+            iter_block_lines (function): returns the raw lines of the block by its type.
+        """
+        instance = cls(block_locations)
+        for block_type in sorted(block_locations, key=lambda key: block_locations[key]['start']):
+            instance._append_cards(scan_cards(iter_block_lines(block_type), block_locations[block_type]['start']))
+        return instance
+
+    def _append_cards(self, cards):
+        self._move_shift(len(self.starts))
+        for start, end, card_id in cards:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.card_ids.append(card_id)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _move_shift(self, position):
+        """ moves the start of the pending offset to the position, the cards in between are written """
+        delta = self.shift_delta
+        if delta:
+            starts, ends = self.starts, self.ends
+            if position < self.shift_position:
+                for index in range(position, self.shift_position):
+                    starts[index] -= delta
+                    ends[index] -= delta
+            else:
+                for index in range(self.shift_position, min(position, len(starts))):
+                    starts[index] += delta
+                    ends[index] += delta
+        self.shift_position = position
+
+    def _bisect(self, bisect, values, line_number):
+        """ bisect of the line number in the starts or ends, taking the pending offset into account """
+        position, delta = self.shift_position, self.shift_delta
+        if position < len(values) and values[position] + delta <= line_number:
+            return bisect(values, line_number - delta, position)
+        return bisect(values, line_number, 0, position)
+
+    def _span(self, position):
+        delta = self.shift_delta if position >= self.shift_position else 0
+        start = self.starts[position] + delta
+        return CardSpan(start, self.ends[position] + delta, self.block_type_of(start), self.card_ids[position])
+
+    def block_type_of(self, line_number):
+        """ returns the type of block the line is in, None if not in any block """
+        blocks = sorted((location['start'], location['end'], block_type) for block_type, location in self.block_locations.items())
+        position = bisect_right([start for start, __, __ in blocks], line_number) - 1
+        if position >= 0 and line_number <= blocks[position][1]:
+            return blocks[position][2]
+        return None
+
+    def card_at(self, line_number):
+        """ returns the CardSpan of the card the line belongs to, None for blank, comment only or unknown lines """
+        position = self._bisect(bisect_right, self.starts, line_number) - 1
+        if position < 0:
+            return None
+        card_span = self._span(position)
+        return card_span if line_number <= card_span.end else None
+
+    def card_before(self, line_number):
+        """ returns the CardSpan of the last card starting before the line, None if there is none """
+        position = self._bisect(bisect_left, self.starts, line_number) - 1
+        if position < 0:
+            return None
+        return self._span(position)
+
+    def cards_between(self, first_line, last_line):
+        """ returns the CardSpans of the cards overlapping the lines first_line to last_line """
+        first = self._bisect(bisect_left, self.ends, first_line)
+        last = self._bisect(bisect_right, self.starts, last_line)
+        return [self._span(position) for position in range(first, last)]
+
+    def shift(self, line_number, lines_added):
+        """
+        Moves the cards after lines were added (or removed if negative) at the given line number.
+        The cards overlapping the removed lines are dropped, see reindex.
+        """
+        if not lines_added:
+            return
+        if lines_added < 0:
+            first = self._bisect(bisect_left, self.ends, line_number)
+            last = self._bisect(bisect_right, self.starts, line_number - lines_added)
+            self._move_shift(first)
+            del self.starts[first:last], self.ends[first:last], self.card_ids[first:last]
+        position = self._bisect(bisect_right, self.starts, line_number)
+        self._move_shift(position)
+        self.shift_delta += lines_added
+        # the card the lines were added to or removed from, it is before the pending offset
+        if position > 0 and self.ends[position - 1] >= line_number:
+            self.ends[position - 1] = max(self.starts[position - 1], self.ends[position - 1] + lines_added)
+
+    def reindex(self, first_line, last_line, lines):
+        """
+        Replaces the cards of the lines first_line to last_line by the cards scanned from their current text,
+        the range has to start and end at card boundaries (see ModelSyncService.card_range).
+        """
+        first = self._bisect(bisect_left, self.ends, first_line)
+        last = self._bisect(bisect_right, self.starts, last_line)
+        self._move_shift(first)
+        # the new cards are after the start of the pending offset, they are stored without it
+        delta = self.shift_delta
+        cards = list(scan_cards(lines, first_line))
+        self.starts[first:last] = array('l', [start - delta for start, __, __ in cards])
+        self.ends[first:last] = array('l', [end - delta for __, end, __ in cards])
+        self.card_ids[first:last] = [card_id for __, __, card_id in cards]
@@ -1,65 +1,127 @@
-
 from Npp import editor
 import logging, re
 try:
     from npp_mcnp_plugin.utils.string_utils import is_comment_line, remove_comments, return_last_number_in_string
+    from npp_mcnp_plugin.utils.card_patterns import compile_pattern
 except ImportError:
     from utils.string_utils import is_comment_line, remove_comments, return_last_number_in_string
+    from utils.card_patterns import compile_pattern
+
+# lines read around the current line when the card range is not known from the line index
+CONTEXT_LINES = 50
+
+
+class cached_property(object):
+    """
+    Property computed on first access and stored on the instance, the snapshot of the line doesn't change.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.func.__name__] = self.func(instance)
+        return value
+
 
 class ModelOfLine(object):
     """
     This class is used to interact with the current line of the text editor. creates model representation of the line.
+
+    The instance is a snapshot of one editor event: the lines of the current card (and the lines around it) are read
+    once by from_notepad and the derived views (current line, entries, full entry) are computed on first use and kept.
     """
-    def __init__(self, selected_text=None, cursor_column=None, current_line_no=None, selection_start=None, selection_end=None):
-        
+    def __init__(self, selected_text=None, cursor_column=None, current_line_no=None, selection_start=None, selection_end=None, line_index=None,
+                 lines=None, first_line_no=0, line_count=None):
+        """
+        Args:
+            lines (list): lowercase text of the editor lines first_line_no, first_line_no + 1, ... without the line ends.
+            line_count (int): number of lines in the editor, lines outside the snapshot are read from the editor.
+        """
         self.selected_text = selected_text
         self.cursor_column = cursor_column
         self.current_line_no = current_line_no
 
         self.selection_start = selection_start
         self.selection_end = selection_end
+        # LineIndex of the parsed input, used to find the lines of the card without walking the editor lines
+        self.line_index = line_index
+        self.lines = lines if lines is not None else []
+        self.first_line_no = first_line_no
+        self.line_count = line_count
+        self._lines_without_comment = {}
         self.logger = logging.getLogger(self.__class__.__name__)
 
     @classmethod
-    def from_notepad(cls):
+    def from_notepad(cls, line_index=None):
         selected_text = editor.getSelText().lower().split("imp")[0].strip()
         selection_start = editor.getColumn(editor.getSelectionStart())
         selection_end = editor.getColumn(editor.getSelectionEnd())
         cursor_column = editor.getColumn(editor.getCurrentPos())
         current_line_no = editor.lineFromPosition(editor.getCurrentPos())
-        instance = cls( selected_text, cursor_column, current_line_no,selection_start,selection_end)
+        line_count = editor.getLineCount()
+
+        # the lines of the card and one line on each side (continuation marks), or a window when the card is unknown
+        card_span = line_index.card_at(current_line_no) if line_index is not None else None
+        if card_span is not None:
+            first_line_no, last_line_no = card_span.start - 1, card_span.end + 1
+        else:
+            first_line_no, last_line_no = current_line_no - CONTEXT_LINES, current_line_no + CONTEXT_LINES
+        first_line_no = max(0, first_line_no)
+        last_line_no = max(first_line_no, min(line_count - 1, last_line_no))
+
+        # one bulk read of the range
+        text = editor.getTextRange(editor.positionFromLine(first_line_no), editor.getLineEndPosition(last_line_no))
+        lines = [line.rstrip("\r") for line in text.lower().split("\n")]
+
+        instance = cls( selected_text, cursor_column, current_line_no,selection_start,selection_end, line_index,
+                        lines, first_line_no, line_count)
 
         return instance
 
+    def _raw_line(self, line_no):
+        index = line_no - self.first_line_no
+        if 0 <= index < len(self.lines):
+            return self.lines[index]
+        if line_no < 0 or (self.line_count is not None and line_no >= self.line_count):
+            return ""
+        self.logger.debug("Line %s is outside of the snapshot, reading it from the editor", line_no)
+        return editor.getLine(line_no).lower().rstrip("\r\n")
+
     def get_line(self, line_no):
         """
-        Fetches a specific line from the editor by line number.
+        Returns the line without the comment, from the snapshot (the editor is read for lines outside of it).
 
-        If an exception occurs, logs the error, continues execution, 
+        If an exception occurs, logs the error, continues execution,
         and returns a line containing "0".
         """
+        line = self._lines_without_comment.get(line_no)
+        if line is not None:
+            return line
         try:
-            current_line = editor.getLine(line_no).lower()
+            current_line = self._raw_line(line_no)
         except Exception as e:
             self.logger.exception(
                 "Error fetching line {}: {}. Returning default line '0'.".format(line_no, str(e))
             )
             return "0"
-        
+
         line, comment = remove_comments(current_line)
+        self._lines_without_comment[line_no] = line
         return line
-    
-    @property
+
+    @cached_property
     def current_line(self):
         """
         Returns the current line from the editor.
         """
-        line, comment = remove_comments(self.get_line(self.current_line_no))
-        return line
-    
+        return self.get_line(self.current_line_no)
+
     def is_pattern_before_cursor(self, pattern):
         return pattern in self.text_till_cursor
-        
+
     @property
     def first_entry_in_line(self):
         try:
@@ -72,41 +134,41 @@ class ModelOfLine(object):
             return self.selected_text_list[0]
         except IndexError:
             return None  # Or any default value or action
-    @property
+    @cached_property
     def selected_text_list(self):
         return self.selected_text.split()
-    @property
+    @cached_property
     def current_line_list(self):
         return self.current_line.split()
-    @property
+    @cached_property
     def text_till_cursor(self):
         return self.current_line[:self.cursor_column]
-    @property
+    @cached_property
     def text_till_cursor_list(self):
-        return self.current_line[:self.cursor_column].split()
-    
-    @property
+        return self.text_till_cursor.split()
+
+    @cached_property
     def has_non_digit_chars_before_cursor(self):
         """
         Checks if there are non-digit characters before the cursor in the current line.
         """
         return any(char.isalpha() for char in self.text_till_cursor)
 
-    @property
+    @cached_property
     def last_number_in_line(self):
         return return_last_number_in_string(self.current_line)
-    @property
+    @cached_property
     def last_number_before_cursor(self):
         return return_last_number_in_string(self.text_till_cursor)
-    
+
     @property
     def last_entry_before_cursor(self):
         try:
-            last_entry = self.text_till_cursor.split()[-1]
+            last_entry = self.text_till_cursor_list[-1]
             return last_entry
         except IndexError:
-            return None  # Or any default value or action       
-   
+            return None  # Or any default value or action
+
     def find_space_separated_token_end_position(self, token_index, pattern=r'\S+'):
         """
         Finds the position immediately after the first character of a specified space-separated token in a string.
@@ -120,49 +182,28 @@ class ModelOfLine(object):
         Returns:
         - int: The position immediately after the first character of the specified space-separated token.
         """
-        matches = list(re.finditer(pattern, self.current_line))
+        matches = list(compile_pattern(pattern).finditer(self.current_line))
         if token_index < len(matches):
             match = matches[token_index]
             return match.end()
         return None
 
-    def is_continuation_line(self, line_no):
-        """
-        Determines if a specific line is a continuation line.
-
-        :param line_no: The line number to check.
-        :return: True if the line is a continuation line, False otherwise.
-        """
-        current_line, _ = remove_comments(self.get_line(line_no))
-        if current_line and current_line.startswith("    "):
-            return True
-
-        previous_line = remove_comments(self.get_line(line_no - 1))
-        return bool(previous_line and previous_line.endswith("&"))
-
-    def is_current_line_continuation_line(self):
-        """
-        Determines if the current line is a continuation line.
-
-        :return: True if the current line is a continuation line, False otherwise.
-        """
-        return self.is_continuation_line(self.current_line_no)
     @property
     def is_cursor_at_material(self):
         """
-        Determine if the cursor is at a material definition 
+        Determine if the cursor is at a material definition
         only usable within a cell block.
 
         Returns:
             bool: True if the cursor is at a material definition, False otherwise.
         """
         # strip line into list, if there is only two elements in the list then it is likely we are adding a material
-        return len(self.text_till_cursor_list) == 2 
+        return len(self.text_till_cursor_list) == 2
 
-    @property
+    @cached_property
     def is_current_line_continuation_line(self):
         return self.is_continuation_line(self.current_line_no)
-    
+
     def is_continuation_line(self, line_number=0):
         """
         answers if current line is a continuation line or not
@@ -175,35 +216,38 @@ class ModelOfLine(object):
         line = self._get_line_without_comment(line_number)
         if line.startswith('    '):
             return True
-       
+
         previous_line = self._get_line_without_comment(line_number - 1)
-        return previous_line.endswith('&')
-    
+        return previous_line.rstrip().endswith('&')
+
     def _get_line_without_comment(self, current_line_no):
         """
         Returns the current line without the comment part.
         - stripped right side for empty spaces
         - cant strip left side for leading spaces as this may mark a continuation line.
         """
-        current_line = editor.getLine(current_line_no).lower()
-        current_line_no_comment, __ = remove_comments(current_line)
-        return current_line_no_comment
-    @property
+        return self.get_line(current_line_no)
+    @cached_property
     def full_entry(self):
+        card_span = self.line_index.card_at(self.current_line_no) if self.line_index is not None else None
+        if card_span is not None:
+            if card_span.start == card_span.end:
+                return self.current_line
+            return self._merge_continuation_lines(card_span.start, card_span.end)
 
         # if current line or next line is continuation line then return full line
         if  self.is_current_line_continuation_line or self.is_continuation_line(self.current_line_no+1):
             line_no_of_card_start = self._start_line_no_of_mcnp_card()
             return self._merge_continuation_lines(line_no_of_card_start)
-        return self.current_line 
-    
+        return self.current_line
+
     @property
     def entry_until_selection(self):
         return self.full_entry
 
     def _start_line_no_of_mcnp_card(self):
         current_line_no = self.current_line_no
-        
+
         # Move backwards to find the start of the card (non-continuation and non-comment line)
         while current_line_no >= 0:
             current_line = self._get_line_without_comment(current_line_no).lstrip()
@@ -213,20 +257,21 @@ class ModelOfLine(object):
                 self.logger.debug("Card start found, line no %s", current_line_no)
                 break
             # Move to the previous line
-            current_line_no -= 1        
+            current_line_no -= 1
         return current_line_no
-    
-    
+
+
     def _is_this_line_start_of_mcnp_card(self, line_no, content):
         return not self.is_continuation_line(line_no) and not is_comment_line(content)
-    
-    def _merge_continuation_lines(self, start_line_number):
+
+    def _merge_continuation_lines(self, start_line_number, end_line_number=None):
         """
-        Merges continuation lines into a single complete input card by finding the 
+        Merges continuation lines into a single complete input card by finding the
         start of the card and collecting all continuation lines up to the current line.
+        If the last line of the card is known (line index), the lines are collected without looking for the card end.
 
-        Collects parts of the lines, strips leading spaces, and removes the 
-        continuation character '&' from the end.
+        Collects parts of the lines, strips leading spaces, and removes the
+        continuation character '&' from the end of each line.
 
         Returns:
             str: The merged full input card as a single string.
@@ -234,23 +279,26 @@ class ModelOfLine(object):
         full_line_parts = []
         current_line_no = start_line_number
         current_line = self.get_line(current_line_no)
+        if end_line_number is not None:
+            lines = [current_line] + [self._get_line_without_comment(line_no).lstrip()
+                                      for line_no in range(start_line_number + 1, end_line_number + 1)]
+            return ' '.join(line.rstrip().rstrip("&").rstrip() for line in lines if not is_comment_line(line)).strip()
         # Continue processing as long as the next line is a continuation line or a comment line
         while True:
 
             if not is_comment_line(current_line):
-                full_line_parts.append(current_line)
+                full_line_parts.append(current_line.rstrip().rstrip("&").rstrip())
 
             # Move to the previous line
-            
+
             current_line_no += 1
-            # Start with the current line, cleaned of comments and leading spaces
-            try:
-                current_line = self._get_line_without_comment(current_line_no).lstrip()
-            except IndexError:
+            if self.line_count is not None and current_line_no >= self.line_count:
                 self.logger.warning("Couldn't find end of mcnp input card")
                 break
+            # Start with the current line, cleaned of comments and leading spaces
+            current_line = self._get_line_without_comment(current_line_no).lstrip()
 
             if self._is_this_line_start_of_mcnp_card(current_line_no, current_line):
                 break
-        # Join all parts and strip any '&' at the end
-        return ' '.join(full_line_parts).strip("&")
\ No newline at end of file
+        # Join all parts, the '&' continuation marks are removed from each part
+        return ' '.join(full_line_parts).strip()
@@ -3,21 +3,24 @@ import re
 try: 
     from npp_mcnp_plugin.utils.general_utils import validate_return_id_as_int
     from npp_mcnp_plugin.utils.string_utils import extract_keyword_value
+    from npp_mcnp_plugin.utils.card_patterns import PATTERNS, compile_pattern
     from mcnp_input_cards import  Cell
 except ImportError:
     from utils.general_utils import validate_return_id_as_int
     from utils.string_utils import extract_keyword_value
+    from utils.card_patterns import PATTERNS, compile_pattern
     from models.mcnp_input_cards import  Cell
 
-class CellFactory:
+class CellFactory(object):
     """
     Factory for creating and parsing Cell instances.
     """
     logger = logging.getLogger(__name__)
-    @staticmethod
-    def create_from_input_line(line, comment=None):
+    @classmethod
+    def create_from_input_line(cls, line, comment=None):
         """
         Parses an input line and creates a Cell instance.
+        A class method, so the lazy cell dictionaries pickle it by class and name (python 2 can't pickle static methods).
         """
                             
         cell_definition_text = CellFactory.split_line(line)
@@ -31,7 +34,7 @@ class CellFactory:
         #   match.group(2) - mat number: The material number associated with the cell.
         #   match.group(3) - cell definition: A string containing the cell's properties 
         #                      (e.g., density, geometry).
-        match = re.search(r'(\d+)\s+(\d+)\s+(\S+.*)?', cell_definition_text)
+        match = PATTERNS["cell_definition"].search(cell_definition_text)
 
         # if cell is like but definition
         if "like" in cell_definition_text and "but" in cell_definition_text:
@@ -50,10 +53,16 @@ class CellFactory:
         surfaces, cells = parse_surfaces_and_cells(trimmed_line)
 
         universe, volume = CellFactory._parse_universe_and_volume(line)
+        lattice = extract_keyword_value(line, 'lat')
+        lattice = validate_return_id_as_int(lattice) if lattice else None
+        fill = parse_fill(line)
+        # trcl=n references a tr card, transformations given in parentheses (*trcl=(...)) are not
+        transformation = extract_keyword_value(line, 'trcl')
+        transformation = validate_return_id_as_int(transformation) if transformation and transformation.isdigit() else None
 
         # Placeholder for importance dictionary; can be extended as needed
         importance = {}  
-        return Cell(cell_id, material_id, density, surfaces, cells, importance, universe, volume)
+        return Cell(cell_id, material_id, density, surfaces, cells, importance, universe, volume, fill, lattice, transformation)
 
     @staticmethod
     def _extract_importance(string):
@@ -104,7 +113,7 @@ class CellFactory:
         return universe, volume
 
     
-def parse_surfaces_and_cells(trimmed_line, separators=r"[-:()]" ):
+def parse_surfaces_and_cells(trimmed_line, separators=PATTERNS["cell_separators"]):
         """
         Parses surfaces and cell exclusions from the trimmed line.
 
@@ -122,7 +131,7 @@ def parse_surfaces_and_cells(trimmed_line, separators=r"[-:()]" ):
         cells = []
 
         # replacing possible separators with space
-        all_entries = re.sub(separators, " ", trimmed_line).split()
+        all_entries = compile_pattern(separators).sub(" ", trimmed_line).split()
         for entry in all_entries:
                 entry = entry.lstrip("0")  # Remove leading zeros
                 if "#" in entry:
@@ -132,3 +141,56 @@ def parse_surfaces_and_cells(trimmed_line, separators=r"[-:()]" ):
         return surfaces, cells
 
         
+
+
+def parse_fill(line):
+    """
+    Parses the fill keyword of the cell card into the filling universes and the number of lattice elements
+    each of them fills, the elements are counted and not expanded.
+
+    Args:
+        line: The merged cell card.
+
+    Returns:
+        A list of (universe, multiplicity) in the order of their first appearance, None if the cell is not filled.
+        A single universe (fill=5 or an unbounded lattice) has multiplicity 1.
+    """
+    match = PATTERNS["fill"].search(line)
+    if not match:
+        return None
+    # transformations in parentheses are not universes
+    entries = compile_pattern(r'\([^)]*\)?').sub(" ", match.group(1)).split()
+
+    ranges = []
+    while len(ranges) < min(3, len(entries)):
+        range_match = PATTERNS["fill_range"].match(entries[len(ranges)])
+        if not range_match:
+            break
+        ranges.append(int(range_match.group(2)) - int(range_match.group(1)) + 1)
+    if not ranges:
+        return [(abs(validate_return_id_as_int(entries[0])), 1)] if entries else None
+
+    elements = 1
+    for size in ranges:
+        elements *= size
+    multiplicities = {}
+    universes = []
+    previous = None
+    remaining = elements
+    for entry in entries[len(ranges):]:
+        if remaining <= 0:
+            break
+        repeat_match = PATTERNS["repeat_entry"].match(entry)
+        if repeat_match and previous is not None:
+            count = min(int(repeat_match.group(1) or 1), remaining)
+        elif entry.lstrip("-").isdigit():
+            previous, count = abs(int(entry)), 1
+        else:
+            # next keyword of the cell card
+            break
+        if previous not in multiplicities:
+            universes.append(previous)
+            multiplicities[previous] = 0
+        multiplicities[previous] += count
+        remaining -= count
+    return [(universe, multiplicities[universe]) for universe in universes]
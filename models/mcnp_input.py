@@ -1,5 +1,24 @@
+import copy
+import itertools
+try:
+    from npp_mcnp_plugin.models.lazy_card_dict import LazyCardDict
+    from npp_mcnp_plugin.models.reference_index import ReferenceIndex
+    from npp_mcnp_plugin.models.universe_graph import UniverseGraph
+    from npp_mcnp_plugin.models.id_index import IdPrefixIndex
+    from npp_mcnp_plugin.models.id_allocator import IdAllocator
+except ImportError:
+    from models.lazy_card_dict import LazyCardDict
+    from models.reference_index import ReferenceIndex
+    from models.universe_graph import UniverseGraph
+    from models.id_index import IdPrefixIndex
+    from models.id_allocator import IdAllocator
+
+# versions are unique across the models of a session, a swapped in model never reuses the version of the previous one
+_model_versions = itertools.count(1)
+
+
 class ModelMcnpInput(object):
-    def __init__(self, surfaces=None, cells=None, materials=None, tallies=None, physics=None, block_locations=None, transformations=None):
+    def __init__(self, surfaces=None, cells=None, materials=None, tallies=None, physics=None, block_locations=None, transformations=None, card_files=None, line_index=None):
         """
         Initializes the MCNP input model with optional surfaces, cells, materials, tallies, and physics components.
 
@@ -8,6 +27,8 @@ class ModelMcnpInput(object):
         :param materials: Optional dict of materials where the key is the material name and the value is a Material object for easy reference.
         :param tallies: Optional dict of tallies where the key is the tally id and the value is a Tally object for easy reference.
         :param physics: Optional dict of physics settings where the key is the setting name and the value is the setting value.
+        :param card_files: Optional dict of the files the cards were included from (READ card), {component: {id: path}}.
+        :param line_index: Optional LineIndex mapping the lines of the input to their block and card.
         """
         # add dict self.surfaces = surfaces if surfaces is not None else {}
        
@@ -19,6 +40,18 @@ class ModelMcnpInput(object):
         self.transformations = transformations
         self.physics = physics
         self.block_locations = block_locations
+        self.card_files = card_files if card_files is not None else {}
+        self.line_index = line_index
+        # reverse references, built on first use and kept up to date by the add, update and replace methods
+        self._references = None
+        # universe/fill graph, built on first use and dropped when a cell changes
+        self._universes = None
+        # IdPrefixIndex per component, built on first use
+        self._id_indexes = {}
+        # IdAllocator per component, built on first use
+        self._id_allocators = {}
+        # changes on every modification, see mark_modified
+        self.version = next(_model_versions)
 
         # add default material
         self.materials[0] = "Void"
@@ -35,7 +68,8 @@ class ModelMcnpInput(object):
     def add_surface(self, surface):
         """Adds surfaces to the model."""
         if surface is not None:
-            self.surfaces[surface.surface_id] = surface
+            self.surfaces[surface.id] = surface
+            self.refresh_indexes({"surfaces": [surface.id]})
 
     def add_cells(self, cells):
         """Adds cells to the model from cell list."""
@@ -46,7 +80,8 @@ class ModelMcnpInput(object):
     def add_cell(self, cell):
         """Adds cells to the model."""
         if cell is not None:
-            self.cells[cell.cell_id] = cell
+            self.cells[cell.id] = cell
+            self.refresh_indexes({"cells": [cell.id]})
 
     def add_materials(self, materials):
         """Adds materials to the model from material list."""
@@ -57,12 +92,14 @@ class ModelMcnpInput(object):
     def add_material(self, material):
         """Adds materials to the model."""
         if material is not None:
-            self.material[material.id] = material
+            self.materials[material.id] = material
+            self.refresh_indexes({"materials": [material.id]})
 
     def add_tally(self, tally):
         """ add tally instance to the model tally dictionary"""
         if tally is not None:
             self.tallies[tally.id] = tally
+            self.refresh_indexes({"tallies": [tally.id]})
 
     def add_tallies(self, tallies):
         """ add tallies to the model tallies dictionary"""
@@ -106,8 +143,154 @@ class ModelMcnpInput(object):
         physics = file_parser.get_physics()
         block_locations = file_parser.block_locations
         transformations = file_parser.get_transformations()
+        card_files = file_parser.get_card_files()
+        line_index = file_parser.get_line_index()
+
+        return cls(surfaces, cells, materials, tallies, physics, block_locations, transformations, card_files, line_index)
+
+    def update_from_file_parser(self, file_parser):
+        """
+        Patches the model with the components of a re-parsed file.
+        Cards whose text did not change keep their instances (see CardCache), so only the changed ids are replaced.
+
+        :param file_parser: file parser of the re-parsed file.
+        :return: dict of the changed (added, replaced or removed) ids per component.
+        """
+        changed_ids = {
+            "surfaces": self._patch_items(self.surfaces, file_parser.get_surfaces()),
+            "cells": self._patch_items(self.cells, file_parser.get_cells()),
+            "materials": self._patch_items(self.materials, file_parser.get_materials(), keep_ids=[0]),
+            "tallies": self._patch_items(self.tallies, file_parser.get_tallies()),
+            "transformations": self._patch_items(self.transformations, file_parser.get_transformations()),
+        }
+        self.physics = file_parser.get_physics()
+        self.block_locations = file_parser.block_locations
+        self.card_files = file_parser.get_card_files()
+        self.line_index = file_parser.get_line_index()
+        self.refresh_indexes(changed_ids)
+        return changed_ids
+
+    def copy(self):
+        """
+        Returns a model sharing the card instances with its own card dictionaries,
+        so it can be patched with update_from_file_parser while this one keeps serving the editor.
+        The built indexes are copied, refresh_indexes updates them for the changed cards only.
+        """
+        copied = ModelMcnpInput.__new__(ModelMcnpInput)
+        copied.__dict__.update(self.__dict__)
+        for component in ("surfaces", "cells", "materials", "tallies", "transformations"):
+            items = getattr(self, component)
+            if items is not None:
+                setattr(copied, component, items.copy())
+        copied.card_files = dict(self.card_files)
+        if self._references is not None:
+            copied._references = self._references.copy()
+        # the universe graph isn't changed in place, refresh_indexes drops it when the cells change
+        copied._id_indexes = dict((component, id_index.copy()) for component, id_index in self._id_indexes.items())
+        copied._id_allocators = dict((component, id_allocator.copy()) for component, id_allocator in self._id_allocators.items())
+        copied.version = next(_model_versions)
+        return copied
+
+    @property
+    def references(self):
+        """
+        ReferenceIndex of the model, built from all the cards on first use.
+        """
+        if self._references is None:
+            self._references = ReferenceIndex.from_model(self)
+        return self._references
 
-        return cls(surfaces, cells, materials, tallies, physics, block_locations, transformations)
+    @property
+    def has_references(self):
+        return self._references is not None
+
+    def set_references(self, references):
+        """ sets the ReferenceIndex built by the caller from all the cards, e.g. by the validation pass """
+        self._references = references
+
+    @property
+    def universes(self):
+        """
+        UniverseGraph of the cells (u, fill and lat keywords), built on first use.
+        """
+        if self._universes is None:
+            self._universes = UniverseGraph.from_cells(self.cells)
+        return self._universes
+
+    def __setstate__(self, state):
+        """ a model loaded from the parse cache gets a new version """
+        self.__dict__.update(state)
+        self.version = next(_model_versions)
+
+    def mark_modified(self):
+        """
+        Gives the model a new version, results memoized for the previous version (e.g. selection hovers) are not used again.
+        """
+        self.version = next(_model_versions)
+
+    def id_index(self, component):
+        """
+        IdPrefixIndex of the ids of the component ('cells', 'surfaces', 'materials', 'tallies' or 'transformations'),
+        built on first use.
+        """
+        id_index = self._id_indexes.get(component)
+        if id_index is None:
+            id_index = self._id_indexes[component] = IdPrefixIndex(getattr(self, component) or ())
+        return id_index
+
+    def id_allocator(self, component):
+        """
+        IdAllocator of the used ids of the component, built on first use.
+        """
+        id_allocator = self._id_allocators.get(component)
+        if id_allocator is None:
+            id_allocator = self._id_allocators[component] = IdAllocator(getattr(self, component) or ())
+        return id_allocator
+
+    def refresh_indexes(self, changed_ids):
+        """
+        Updates the reverse references, the id indexes and the id allocators of the changed (added, replaced or removed) cards.
+
+        :param changed_ids: dict of the changed ids per component, as returned by update_from_file_parser.
+        """
+        self.mark_modified()
+        if changed_ids.get("cells"):
+            self._universes = None
+        for component, id_index in list(self._id_indexes.items()) + list(self._id_allocators.items()):
+            items = getattr(self, component)
+            for item_id in changed_ids.get(component, ()):
+                if item_id in items:
+                    id_index.add(item_id)
+                else:
+                    id_index.remove(item_id)
+        if self._references is None:
+            return
+        for component in ("cells", "surfaces", "tallies"):
+            items = getattr(self, component)
+            for item_id in changed_ids.get(component, ()):
+                self._references.update(component, item_id, items.get(item_id))
+
+    @staticmethod
+    def _patch_items(items, new_items, keep_ids=()):
+        """
+        Updates the items dict in place to match new_items and returns the set of changed ids.
+        Lazy cards are compared by their source, so the unchanged cards are not created for the comparison.
+        """
+        if isinstance(items, LazyCardDict) and isinstance(new_items, LazyCardDict):
+            return items.patch(new_items, keep_ids)
+
+        changed_ids = set()
+        for item_id in [item_id for item_id in items if item_id not in new_items and item_id not in keep_ids]:
+            del items[item_id]
+            changed_ids.add(item_id)
+
+        for item_id, item in new_items.items():
+            if item_id in keep_ids:
+                continue
+            if items.get(item_id) is not item:
+                items[item_id] = item
+                changed_ids.add(item_id)
+        return changed_ids
 
     def get_surface(self, surface_id):
         """
@@ -139,6 +322,34 @@ class ModelMcnpInput(object):
         """
         return self.transformations.get(transformation_id, "Transformation {}: The Machine god doesn't recognize this transformation".format(transformation_id))
 
+    def get_card_file(self, component, item_id):
+        """
+        This function returns the file the card was included from with a READ card, None for the cards of the input itself.
+        """
+        return self.card_files.get(component, {}).get(item_id)
+
+    def shift_block_locations(self, line_number, lines_added):
+        """
+        Moves the block locations after lines were added (or removed if negative) at the given line number.
+        """
+        for block_type in ['cells', 'surfaces', 'physics']:
+            location = self.block_locations[block_type]
+            if location['start'] > line_number:
+                location['start'] = max(line_number, location['start'] + lines_added)
+            if location['end'] >= line_number:
+                location['end'] = max(line_number, location['end'] + lines_added)
+        if self.line_index is not None:
+            self.line_index.shift(line_number, lines_added)
+
+    def return_card_span(self, line_number):
+        """
+        This function returns the CardSpan (first and last line, block type and id) of the card at the line,
+        None if the line is not part of a card or the model has no line index.
+        """
+        if self.line_index is None:
+            return None
+        return self.line_index.card_at(line_number)
+
     def return_block_type(self, line_number):
         """
         This function returns the type of block the line is in.
@@ -149,6 +360,8 @@ class ModelMcnpInput(object):
         Returns:
             str: The type of block ('surface', 'cell', 'physics') or None if not in any block.
         """
+        if self.line_index is not None:
+            return self.line_index.block_type_of(line_number)
         for block_type in ['surfaces', 'cells', 'physics']: 
             if self.block_locations[block_type]['start'] <= line_number <= self.block_locations[block_type]['end']:
                 
@@ -158,6 +371,8 @@ class ModelMcnpInput(object):
 class HandlerMcnpInput(object):
     """
     The intention of this class is to modify the ModelMcnpInput object by changing the surfaces and materials in the cells as needed.
+    The cards are shared with the card cache of the parser and the copies of the model (see ModelMcnpInput.copy),
+    a changed card is a copy set into the model.
     """
     def __init__(self, model_mcnp_input):
         self.model = model_mcnp_input
@@ -165,29 +380,39 @@ class HandlerMcnpInput(object):
     def replace_surface_in_cell_block(self, old_surface_id, new_surface):
 
         """
-        iterate over the cell dictionarry and replace the old surface with the new surface
+        replace the old surface with the new surface in the cells using it
         """
-        for cell_id in self.model.cells:
-            cell = self.model.cells[cell_id]
-            cell.replace_surface(old_surface_id, new_surface)
-
-    def replace_material_in_cell_block(self, old_material_name, new_material):
-        for cell in self.model.cells:
-            if cell.material.name == old_material_name:
-                cell.material = new_material
+        cell_ids = self.model.references.cells_using_surface(old_surface_id)
+        for cell_id in cell_ids:
+            cell = copy.copy(self.model.cells[cell_id])
+            cell.replace_surface(old_surface_id, new_surface.id)
+            self.model.cells[cell_id] = cell
+        self.model.refresh_indexes({"cells": cell_ids})
+
+    def replace_material_in_cell_block(self, old_material_id, new_material):
+        cell_ids = self.model.references.cells_using_material(old_material_id)
+        for cell_id in cell_ids:
+            cell = copy.copy(self.model.cells[cell_id])
+            cell.replace_material(new_material.id)
+            self.model.cells[cell_id] = cell
+        self.model.refresh_indexes({"cells": cell_ids})
 
     def replace_surface_parameters_in_surface_block(self, old_surface_id, new_surface):
         # get the old_surface_id from model surfaces dict and replace the parameters with new_surface parameters
         # use dict get method to get the surface with old_surface_id
-        self.model.surfaces.get(old_surface_id).update_surface_parameters(new_surface.parameters)
+        surface = copy.copy(self.model.surfaces.get(old_surface_id))
+        surface.update_surface_parameters(new_surface.parameters)
+        self.model.surfaces[old_surface_id] = surface
 
 
     def replace_surface_in_surface_block(self, old_surface_id, new_surface):
         """
         This replaces the surface definition in surface block changing the surface id and parameters.
         """
-        self.model.surfaces.get(old_surface_id).update_surface(new_surface.surface_id, new_surface.parameters)
-            
+        surface = copy.copy(self.model.surfaces.pop(old_surface_id))
+        surface.update_surface(new_surface.id, new_surface.parameters)
+        self.model.surfaces[surface.id] = surface
+        self.model.refresh_indexes({"surfaces": [old_surface_id, surface.id]})
 
     def replace_surface(self, old_surface_id, new_surface):
         """
@@ -1,29 +1,71 @@
 from abc import ABCMeta, abstractmethod
+from array import array
+import heapq
 import re
+try:
+    from sys import intern
+except ImportError:
+    # python 2, intern is a builtin
+    pass
 
 try: 
-    from npp_mcnp_plugin.utils.general_utils import validate_return_id_as_int, initialise_json_data
+    from npp_mcnp_plugin.utils.general_utils import validate_return_id_as_int
+    from npp_mcnp_plugin.utils.data_registry import load_data
+    from npp_mcnp_plugin.utils.card_patterns import PATTERNS
 except ImportError:
-    from utils.general_utils import validate_return_id_as_int, initialise_json_data
+    from utils.general_utils import validate_return_id_as_int
+    from utils.data_registry import load_data
+    from utils.card_patterns import PATTERNS
+
+
+def intern_string(value):
+    """ interns the repeated short strings (surface types, libraries, particles), None is kept """
+    return intern(value) if value is not None else None
+
+
+def _format_coefficient(value):
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
 
 
-natural_abundances = initialise_json_data("natural_abundances.json")
+def pack_coefficients(parameters):
+    """
+    Returns the surface parameters as (typed float array, text).
+    The text is only kept if it can't be rebuilt from the array (non numeric or differently formatted entries).
+    """
+    if parameters is None:
+        return None, None
+    try:
+        coefficients = array('d', [float(entry) for entry in parameters.split()])
+    except ValueError:
+        return array('d'), parameters
+    if " ".join(_format_coefficient(value) for value in coefficients) == parameters:
+        return coefficients, None
+    return coefficients, parameters
+
+
+# The cards use __slots__, models of large inputs hold millions of them.
 class Printable(object):
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
     @abstractmethod
     def print_output(self):
         pass   
 
 class Tally(Printable):
-    def __init__(self, tally_id, particles=None, entries=None, energies=None, comment=None, collision_heating_enabled=False):
+    __slots__ = ("id", "particles", "entries", "energies", "comment", "collision_heating_enabled", "multipliers")
+
+    def __init__(self, tally_id, particles=None, entries=None, energies=None, comment=None, collision_heating_enabled=False, multipliers=None):
         assert isinstance(tally_id, int), "tally_id must be an int"
         self.id = tally_id
-        self.particles = particles
+        self.particles = [intern_string(particle) for particle in particles] if particles else particles
         self.entries = entries
         self.energies = energies
         self.comment = comment
         self.collision_heating_enabled = collision_heating_enabled
+        self.multipliers = multipliers
 
     def __str__(self):
         if self.particles:
@@ -37,12 +79,17 @@ class Tally(Printable):
         Tally comment is often separate keyword Fc so it is nice to have a separate method for this
 
         """
-        self.comment = comment + "\n" + self.comment
+        self.comment = comment + "\n" + self.comment if self.comment else comment
     def add_energy_bins(self, energies):
         """
         Add energy bins to the tally instance as they are often also in a separate keyword E
         """
         self.energies = energies
+    def add_multiplier(self, multipliers):
+        """
+        Add tally multiplier entries as they are given in a separate keyword FM
+        """
+        self.multipliers = multipliers
     @classmethod
     def create_from_input_line(cls, line, comment=None):
         """
@@ -61,7 +108,7 @@ class Tally(Printable):
         # \:?        : Matches an optional colon
         # (\S+)?    : Matches one or more non-whitespace characters (optional, the particles)
         # (.*)      : Matches the rest of the line (the entries)
-        match = re.search(r'(\+?f)(\d+)\:?(\S+)?(.*)', line.lower())
+        match = PATTERNS["tally"].search(line.lower())
         
         if not match:
             return None
@@ -76,6 +123,8 @@ class Tally(Printable):
         
         return cls(tally_id=tally_id, particles=tally_particles, entries=tally_entries, comment=comment, collision_heating_enabled=collision_heating_enabled)
 class Transformation(Printable):
+    __slots__ = ("id", "parameters", "comment")
+
     def __init__(self, transformation_id, parameters, comment=None):
         assert isinstance(transformation_id, int), "transformation_id must be an int"
         self.id = transformation_id
@@ -92,7 +141,7 @@ class Transformation(Printable):
         In future may need improvement if we want to initialise the transformation with different parameters:
         cosine or angles
         """
-        match = re.search(r'\*?tr(\d+)(.*)', line)
+        match = PATTERNS["transformation"].search(line)
         id = validate_return_id_as_int(match.group(1))
         parameters = match.group(2)
         # if * in line then this is angles and not cosines
@@ -102,15 +151,27 @@ class Transformation(Printable):
     
 # class Surface is a Printable object class that has the following attributes:    
 class Surface(Printable):
+    # coefficients are kept in a float array, parameters is the text rebuilt from them
+    __slots__ = ("id", "surface_type", "transformation", "coefficients", "_parameters_text", "comment")
 
     def __init__(self, surface_id, surface_type, parameters, comment, transformation=None):
         assert isinstance(surface_id, int), "surface_id must be an int"
         self.id = surface_id # int
-        self.surface_type = surface_type
+        self.surface_type = intern_string(surface_type)
         self.transformation = transformation
         self.parameters = parameters
         self.comment = comment
 
+    @property
+    def parameters(self):
+        if self._parameters_text is not None or self.coefficients is None:
+            return self._parameters_text
+        return " ".join(_format_coefficient(value) for value in self.coefficients)
+
+    @parameters.setter
+    def parameters(self, parameters):
+        self.coefficients, self._parameters_text = pack_coefficients(parameters)
+
     def update_surface(self, new_surface_id, new_parameters):
         self.id = new_surface_id
         self.parameters = new_parameters
@@ -161,14 +222,13 @@ class Surface(Printable):
         return cls(surface_id, surface_type, surface_params, comment, surface_transform)
 
 class Isotope(object):
-    # Class variable for element names (shared across all instances)
-    element_names = initialise_json_data("element_names.json")
+    __slots__ = ("z", "a", "abundance", "library", "comment")
 
     def __init__(self, z, a, abundance, library=None, comment=""):
         self.z = z  # Atomic number
         self.a = a  # Mass number
         self.abundance = abundance
-        self.library = library  # Optional library type, e.g., ".70c"
+        self.library = intern_string(library)  # Optional library type, e.g., ".70c"
         self.comment = comment  # Comments specific to the isotope
 
     @property
@@ -183,8 +243,8 @@ class Isotope(object):
 
     @classmethod
     def get_element_name(cls, z):
-        """Access the class variable for element names."""
-        return cls.element_names.get(str(z), 'Unknown Element')
+        """Element name from the shared element_names.json dataset."""
+        return load_data("element_names.json").get(str(z), 'Unknown Element')
 
     def add_comment(self, comment):
         """Add additional information to the isotope comment."""
@@ -195,29 +255,40 @@ class Isotope(object):
         return "{:>4} {:>3} {:>3} {:.3e}".format(self.name, self.z, self.a, self.abundance)
 
 class IsotopeFactory(object):
-    """Singleton factory class for creating Isotope instances."""
+    """
+    Singleton factory class for creating Isotope instances.
+    The isotopes are interned: the same nuclide, library and abundance always give the same shared instance.
+    """
     _instance = None
-    element_names = None
+    # interned isotopes by (zzzaaa, library, abundance), cleared when full
+    isotopes = {}
+    max_interned_isotopes = 100000
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(IsotopeFactory, cls).__new__(cls)
-            cls.element_names = initialise_json_data("element_names.json")
         return cls._instance
 
     @classmethod
     def get_element_name(cls, z):
-        return cls.element_names.get(str(z), 'Unknown Element')
+        return load_data("element_names.json").get(str(z), 'Unknown Element')
 
     def create_isotope(self, zzzaaa, abundance, library=None):
-        z = zzzaaa // 1000
-        a = zzzaaa % 1000
-        name = self.get_element_name(z)
-        return Isotope(z, a, abundance, library)
-
-    def create_isotope_from_input(self, zzzaaa_library, abundance_str):
+        key = (zzzaaa, library, abundance)
+        isotope = self.isotopes.get(key)
+        if isotope is None:
+            if len(self.isotopes) >= self.max_interned_isotopes:
+                self.isotopes.clear()
+            isotope = self.isotopes[key] = Isotope(zzzaaa // 1000, zzzaaa % 1000, abundance, library)
+        return isotope
+
+    @staticmethod
+    def parse_isotope_entry(zzzaaa_library, abundance_str):
         """
         Parse an input string to extract zzzaaa, library, and abundance.
+
+        Returns:
+            tuple: (zzzaaa, abundance, library)
         """
         # Split the string into parts; provide a default empty string for the library
         parts = zzzaaa_library.split(".")
@@ -229,12 +300,25 @@ class IsotopeFactory(object):
             abundance = float(abundance_str)
         except ValueError:
             raise ValueError("Abundance ({}) is not a valid number".format(abundance_str))
+        return zzzaaa, abundance, library
 
+    def create_isotope_from_input(self, zzzaaa_library, abundance_str):
+        """
+        Parse an input string to extract zzzaaa, library, and abundance.
+        """
         # Delegate creation of the isotope
-        return self.create_isotope(zzzaaa, abundance, library)
+        return self.create_isotope(*self.parse_isotope_entry(zzzaaa_library, abundance_str))
+
 
 class Material(Printable):
-    """Class representing a material containing multiple isotopes."""
+    """
+    Class representing a material containing multiple isotopes.
+
+    The composition is kept in parallel arrays: ZAID, index into the libraries of the material and fraction
+    (positive atom fractions or negative weight fractions as in the input), so a material with thousands of
+    nuclides holds a constant number of Python objects. `isotopes` gives the shared Isotope instances.
+    """
+    __slots__ = ("id", "comment", "density", "atomic_density", "zaids", "library_indexes", "libraries", "fractions")
 
     def __init__(self, material_id, comment, isotopes=None):
         assert isinstance(material_id, int), "material_id must be an int"
@@ -244,19 +328,48 @@ class Material(Printable):
         self.atomic_density = None
         self.isotopes = isotopes if isotopes else []
 
+    @property
+    def isotopes(self):
+        factory = IsotopeFactory()
+        return [factory.create_isotope(zaid, fraction, self.libraries[library_index])
+                for zaid, library_index, fraction in zip(self.zaids, self.library_indexes, self.fractions)]
+
+    @isotopes.setter
+    def isotopes(self, isotopes):
+        self.zaids = array('l')
+        self.library_indexes = array('H')
+        self.libraries = []
+        self.fractions = array('d')
+        for isotope in isotopes:
+            self.add_isotope(isotope)
+
+    def add_nuclide(self, zzzaaa, fraction, library=None):
+        if library not in self.libraries:
+            self.libraries.append(intern_string(library))
+        self.zaids.append(zzzaaa)
+        self.library_indexes.append(self.libraries.index(library))
+        self.fractions.append(fraction)
+
     def add_isotope(self, isotope):
-        self.isotopes.append(isotope)
+        self.add_nuclide(isotope.zzzaaa, isotope.abundance, isotope.library)
+
+    def __len__(self):
+        return len(self.zaids)
 
     def __str__(self):
-        sorted_isotopes = sorted(self.isotopes, key=lambda x: abs(x.abundance), reverse=True)[:5]
-        isotopes_str = "\n".join(str(iso) for iso in sorted_isotopes)
-        if len(self.isotopes) > 5:
+        # the 5 largest fractions without sorting the whole composition
+        top_indexes = heapq.nlargest(5, range(len(self.fractions)), key=lambda index: abs(self.fractions[index]))
+        factory = IsotopeFactory()
+        isotopes_str = "\n".join(str(factory.create_isotope(self.zaids[index], self.fractions[index],
+                                                             self.libraries[self.library_indexes[index]]))
+                                 for index in top_indexes)
+        if len(self.fractions) > 5:
             return "Material {}\nTop 5 Isotopes:\nName   Z   A   Abundance\n{}".format(self.id, isotopes_str)
         return "Material {}\nIsotopes:\nName   Z   A   Abundance\n{}".format(self.id, isotopes_str)
 
     @classmethod
     def create_from_input_line(cls, line, comment=None):
-        match = re.search(r'm(\d+)(.*)', line)
+        match = PATTERNS["material"].search(line)
         if not match:
             raise ValueError("Invalid material line format")
         material_id = int(match.group(1))
@@ -266,11 +379,9 @@ class Material(Printable):
         if len(parameters) % 2 != 0:
             raise SyntaxError("Uneven number of material entries")
 
-        # Delegate creation of isotopes to IsotopeFactory
-        factory = IsotopeFactory()
+        # entries are packed into the composition arrays, no isotope instance is created
         for i in range(0, len(parameters), 2):
-            isotope = factory.create_isotope_from_input(parameters[i], parameters[i + 1])
-            material_instance.add_isotope(isotope)
+            material_instance.add_nuclide(*IsotopeFactory.parse_isotope_entry(parameters[i], parameters[i + 1]))
 
         return material_instance
     def print_output(self):
@@ -284,8 +395,11 @@ class Cell(object):
     """
     Represents a Cell with material, surfaces, excluded cells, and other attributes.
     """
+    __slots__ = ("id", "material_id", "surfaces", "cells", "importance", "universe", "volume", "density", "fill", "lattice",
+                 "transformation")
 
-    def __init__(self, cell_id, material_id, density, surfaces=None, cells=None, importance=None, universe=None, volume=None):
+    def __init__(self, cell_id, material_id, density, surfaces=None, cells=None, importance=None, universe=None, volume=None,
+                 fill=None, lattice=None, transformation=None):
         assert isinstance(cell_id, int), "cell_id must be an int"
         assert isinstance(material_id, int), "material_id must be an int of material identifier"
         assert isinstance(surfaces, list), "surfaces must be a list of surface identifiers"
@@ -293,6 +407,8 @@ class Cell(object):
         assert isinstance(importance, dict) or importance is None, "importance must be a dict or None"
         assert isinstance(universe, (int, type(None))), "universe must be an int or None"
         assert isinstance(volume, (float, type(None))), "volume must be a float or None"
+        assert isinstance(fill, (list, type(None))), "fill must be a list of (universe, multiplicity) or None"
+        assert isinstance(transformation, (int, type(None))), "transformation must be the int of trcl=n or None"
         
         self.id = cell_id
         self.material_id = material_id
@@ -302,6 +418,9 @@ class Cell(object):
         self.universe = universe
         self.volume = volume
         self.density = density
+        self.fill = fill
+        self.lattice = lattice
+        self.transformation = transformation
 
     def __str__(self):
         if self.universe is not None and self.volume is not None:
@@ -314,12 +433,10 @@ class Cell(object):
         )
 
     def replace_surface(self, old_surface_id, new_surface_id):
-        """Replaces an existing surface ID with a new one."""
-        try:
-            idx = self.surfaces.index(old_surface_id)
-            self.surfaces[idx] = new_surface_id
-        except ValueError:
-            pass  # old_surface_id not found
+        """Replaces an existing surface ID with a new one, keeping the sense (sign) of each entry."""
+        old_surface_id = abs(old_surface_id)
+        self.surfaces = [(new_surface_id if surface_id > 0 else -new_surface_id) if abs(surface_id) == old_surface_id else surface_id
+                         for surface_id in self.surfaces]
 
     def replace_material(self, new_material_id):
         """Replaces the material ID with a new material."""
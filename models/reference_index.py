@@ -0,0 +1,166 @@
+import re
+
+# tally types (last digit of the tally number) whose entries are surfaces or cells, point detectors (5) have coordinates
+SURFACE_TALLY_TYPES = (1, 2)
+CELL_TALLY_TYPES = (4, 6, 7, 8)
+
+# reverse maps, <referenced component>_<referencing component>
+REFERENCE_MAPS = ("surface_cells", "cell_cells", "material_cells", "transformation_cells", "transformation_surfaces",
+                  "surface_tallies", "cell_tallies")
+
+# reverse map -> (referenced component, referencing component)
+REFERENCE_COMPONENTS = {
+    "surface_cells": ("surfaces", "cells"),
+    "cell_cells": ("cells", "cells"),
+    "material_cells": ("materials", "cells"),
+    "transformation_cells": ("transformations", "cells"),
+    "transformation_surfaces": ("transformations", "surfaces"),
+    "surface_tallies": ("surfaces", "tallies"),
+    "cell_tallies": ("cells", "tallies"),
+}
+
+# a macrobody facet "10.2" references the macrobody 10
+_TALLY_ID = re.compile(r'(\d+)(?:\.\d+)?')
+# lattice indices "[0 1 0]" and universes "u=3" of the tally entries are not surface or cell numbers
+_NOT_TALLY_IDS = re.compile(r'\[[^\]]*\]?|u\s*=\s*-?\d+')
+
+
+def _transformation_id(surface):
+    transformation = getattr(surface, "transformation", None)
+    if transformation is None or not str(transformation).isdigit():
+        return None
+    return int(transformation)
+
+
+def _tally_ids(tally):
+    """ returns the surface or cell numbers of the tally entries, e.g. "(1 2)" "3<4" "10.1" """
+    # the entries are split at the spaces, a lattice index "[0 0 1]" spans several of them
+    entries = _NOT_TALLY_IDS.sub(" ", " ".join(tally.entries or []))
+    return set(int(number) for number in _TALLY_ID.findall(entries))
+
+
+def item_references(component, item):
+    """
+    Returns the references of the card as a list of (reverse map name, referenced id).
+    """
+    if component == "cells":
+        references = [("surface_cells", abs(surface_id)) for surface_id in item.surfaces]
+        references.extend(("cell_cells", cell_id) for cell_id in item.cells)
+        if item.material_id:
+            references.append(("material_cells", item.material_id))
+        if getattr(item, "transformation", None) is not None:
+            references.append(("transformation_cells", item.transformation))
+        return references
+    if component == "surfaces":
+        transformation_id = _transformation_id(item)
+        return [("transformation_surfaces", transformation_id)] if transformation_id is not None else []
+    if component == "tallies":
+        tally_type = item.id % 10
+        if tally_type in SURFACE_TALLY_TYPES:
+            return [("surface_tallies", surface_id) for surface_id in _tally_ids(item)]
+        if tally_type in CELL_TALLY_TYPES:
+            return [("cell_tallies", cell_id) for cell_id in _tally_ids(item)]
+    return []
+
+
+class ReferenceIndex(object):
+    """
+    Reverse reference maps of the model: which cells use a surface, material or cell (#id),
+    which surfaces use a transformation and which tallies score a surface or cell.
+
+    Every referencing card keeps its forward references, so a replaced or removed card only updates its own
+    entries of the reverse maps and a lookup is a dictionary access instead of a scan of the model.
+    """
+    def __init__(self):
+        self.maps = dict((name, {}) for name in REFERENCE_MAPS)
+        # (component, id) -> references of the card, see item_references
+        self.forward = {}
+
+    @classmethod
+    def from_model(cls, mcnp_input):
+        instance = cls()
+        for component in ("cells", "surfaces", "tallies"):
+            for item_id, item in (getattr(mcnp_input, component) or {}).items():
+                instance.update(component, item_id, item)
+        return instance
+
+    def copy(self):
+        """ returns an index which can be updated without changing this one, the reference lists are shared """
+        copied = ReferenceIndex()
+        copied.maps = dict((name, dict((referenced_id, set(item_ids)) for referenced_id, item_ids in reverse_map.items()))
+                           for name, reverse_map in self.maps.items())
+        copied.forward = dict(self.forward)
+        return copied
+
+    def update(self, component, item_id, item):
+        """ replaces the references of the card, item None removes them """
+        self.remove(component, item_id)
+        if item is None:
+            return
+        references = item_references(component, item)
+        if not references:
+            return
+        self.forward[(component, item_id)] = references
+        for name, referenced_id in references:
+            self.maps[name].setdefault(referenced_id, set()).add(item_id)
+
+    def remove(self, component, item_id):
+        for name, referenced_id in self.forward.pop((component, item_id), ()):
+            referencing_ids = self.maps[name].get(referenced_id)
+            if referencing_ids is None:
+                continue
+            referencing_ids.discard(item_id)
+            if not referencing_ids:
+                del self.maps[name][referenced_id]
+
+    def referencing(self, name, referenced_id):
+        """ returns the sorted ids of the cards referencing the id through the reverse map """
+        return sorted(self.maps[name].get(referenced_id, ()))
+
+    def cells_using_surface(self, surface_id):
+        return self.referencing("surface_cells", abs(surface_id))
+
+    def cells_referencing_cell(self, cell_id):
+        return self.referencing("cell_cells", cell_id)
+
+    def cells_using_material(self, material_id):
+        return self.referencing("material_cells", material_id)
+
+    def cells_using_transformation(self, transformation_id):
+        return self.referencing("transformation_cells", transformation_id)
+
+    def surfaces_using_transformation(self, transformation_id):
+        return self.referencing("transformation_surfaces", transformation_id)
+
+    def tallies_of_surface(self, surface_id):
+        return self.referencing("surface_tallies", surface_id)
+
+    def tallies_of_cell(self, cell_id):
+        return self.referencing("cell_tallies", cell_id)
+
+    def dangling(self, present_ids):
+        """
+        Returns the references to ids which are not in the model.
+
+        The referenced ids of each reverse map are its keys, so the missing ones are one set difference per map
+        and only they are mapped back to the referencing cards.
+
+        Args:
+            present_ids (function): returns the set of ids of a model component, e.g. present_ids("surfaces").
+
+        Returns:
+            dict: reverse map name -> {referencing id: sorted missing ids}, maps without missing ids are left out.
+        """
+        dangling = {}
+        for name in REFERENCE_MAPS:
+            referenced_component = REFERENCE_COMPONENTS[name][0]
+            missing_ids = set(self.maps[name]).difference(present_ids(referenced_component))
+            if not missing_ids:
+                continue
+            missing_by_card = dangling[name] = {}
+            for missing_id in missing_ids:
+                for item_id in self.maps[name][missing_id]:
+                    missing_by_card.setdefault(item_id, []).append(missing_id)
+            for item_ids in missing_by_card.values():
+                item_ids.sort()
+        return dangling
@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+# universe of the cells without the u keyword
+REAL_WORLD = 0
+
+
+class UniverseGraph(object):
+    """
+    Graph of the repeated structures of the cell block: universe -> its cells -> the universes they are filled with.
+
+    A fill edge carries the number of lattice elements filled with the universe, so the number of instances of
+    a universe is the sum over the cells it fills of (instances of the cell's universe * multiplicity) and is never
+    computed by expanding the lattices. The queries are memoized per universe, the graph is rebuilt when cells change.
+    """
+    def __init__(self):
+        # universe -> ids of its cells
+        self.universe_cells = defaultdict(list)
+        # universe of each cell
+        self.cell_universe = {}
+        # universe -> [(filled cell id, multiplicity)]
+        self.filled_by = defaultdict(list)
+        self._instance_counts = {}
+        self._depths = {}
+        self._top_level_cells = {}
+
+    @classmethod
+    def from_cells(cls, cells):
+        instance = cls()
+        for cell_id, cell in cells.items():
+            instance.add_cell(cell_id, cell)
+        return instance
+
+    def add_cell(self, cell_id, cell):
+        universe = abs(cell.universe) if cell.universe else REAL_WORLD
+        self.cell_universe[cell_id] = universe
+        self.universe_cells[universe].append(cell_id)
+        for filling_universe, multiplicity in getattr(cell, "fill", None) or []:
+            # lattice elements filled with the universe of the lattice itself are not nested
+            if filling_universe != universe:
+                self.filled_by[filling_universe].append((cell_id, multiplicity))
+
+    def universes(self):
+        return sorted(set(self.universe_cells) | set(self.filled_by))
+
+    def _memoized(self, cache, universe, compute, visiting):
+        if universe in cache:
+            return cache[universe]
+        if universe in visiting:
+            raise ValueError("Universe {} is filled with itself".format(universe))
+        visiting.add(universe)
+        try:
+            cache[universe] = compute(universe, visiting)
+        finally:
+            visiting.discard(universe)
+        return cache[universe]
+
+    def instance_count(self, universe):
+        """ returns the number of times the universe is instantiated in the geometry, 0 if it is never used """
+        return self._memoized(self._instance_counts, universe, self._count, set())
+
+    def _count(self, universe, visiting):
+        if universe == REAL_WORLD:
+            return 1
+        return sum(self._memoized(self._instance_counts, self.cell_universe[cell_id], self._count, visiting) * multiplicity
+                   for cell_id, multiplicity in self.filled_by.get(universe, ()))
+
+    def nesting_depth(self, universe):
+        """ returns the deepest level the universe is nested at, 0 for the real world, None if it is never used """
+        return self._memoized(self._depths, universe, self._depth, set())
+
+    def _depth(self, universe, visiting):
+        if universe == REAL_WORLD:
+            return 0
+        depths = [self._memoized(self._depths, self.cell_universe[cell_id], self._depth, visiting)
+                  for cell_id, __ in self.filled_by.get(universe, ())]
+        depths = [depth for depth in depths if depth is not None]
+        return max(depths) + 1 if depths else None
+
+    def top_level_cells(self, universe):
+        """ returns the sorted ids of the real world cells which eventually contain the universe """
+        return sorted(self._memoized(self._top_level_cells, universe, self._top_level, set()))
+
+    def _top_level(self, universe, visiting):
+        cells = set()
+        for cell_id, __ in self.filled_by.get(universe, ()):
+            cell_universe = self.cell_universe[cell_id]
+            if cell_universe == REAL_WORLD:
+                cells.add(cell_id)
+            else:
+                cells |= self._memoized(self._top_level_cells, cell_universe, self._top_level, visiting)
+        return frozenset(cells)
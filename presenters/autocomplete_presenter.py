@@ -1,12 +1,18 @@
 
 from abc import ABCMeta, abstractmethod
-from npp_mcnp_plugin.utils.string_utils import return_list_entries_starting_with_string
 from npp_mcnp_plugin.utils.general_utils import format_notifier_message
 from npp_mcnp_plugin.services.utils import is_column_at_cell_definition
+from npp_mcnp_plugin.utils.card_patterns import PATTERNS
+from npp_mcnp_plugin.utils.snippet_index import get_snippet_index
 
 import logging
 import re
-    
+
+# number of ids shown by the id autocompletion
+MAX_ID_COMPLETIONS = 50
+# number of keywords shown by the physics block autocompletion
+MAX_KEYWORD_COMPLETIONS = 50
+
 class AbstractBlockAutoCompletePresenter(object):
     __metaclass__ = ABCMeta
 
@@ -23,16 +29,16 @@ class AbstractBlockAutoCompletePresenter(object):
         self.mcnp_input = mcnp_input
         self.notifier = notifier
         self.logger = logging.getLogger(self.__class__.__name__)
-    def _autocoplete_ids(self, first_digits, my_list_of_ids):
+    def _autocoplete_ids(self, first_digits, component):
         """
-        This function provides autocomplete suggestions for ids based on the first digits entered and list provided.
+        This function provides autocomplete suggestions for ids based on the first digits entered and the ids of the model component.
         
          Args:
             first_digits (str): The first part of the cell id.
+            component (str): The model component of the ids, e.g. 'cells' or 'surfaces'.
         """
- 
-        possible_cell_list = return_list_entries_starting_with_string(my_list_of_ids, first_digits)
-        return possible_cell_list
+        possible_ids = self.mcnp_input.id_index(component).complete(first_digits, MAX_ID_COMPLETIONS)
+        return [str(item_id) for item_id in possible_ids]
     
     def pop_suggestions(self):
         result = self.provide_autocomplete_suggestions()
@@ -68,31 +74,27 @@ class CellBlockAutoCompletePresenter(AbstractBlockAutoCompletePresenter):
 
     def provide_autocomplete_suggestions(self):
         new_entry = self.model_of_current_line.last_entry_before_cursor
-        new_entry_digits = re.sub(r'[^0-9]', '', new_entry)
+        new_entry_digits = PATTERNS["non_digit"].sub('', new_entry)
         entry_length = len(new_entry_digits)
         mytype=None
         message = None
         self.logger.info("Entry added: %s", new_entry)
 
-        # Define regex patterns with optional negative sign
-        trcl_pattern = r"trcl=-?\d+"
-        hash_pattern = r"#-?\d+"
-        number_pattern = r"-?\d+$"
-
-        if  re.match(trcl_pattern, new_entry):
-            message = self._autocoplete_ids(first_digits=new_entry_digits, my_list_of_ids=self.mcnp_input.transformations.keys())
+        # precompiled patterns with optional negative sign, see utils/card_patterns.py
+        if  PATTERNS["trcl_entry"].match(new_entry):
+            message = self._autocoplete_ids(first_digits=new_entry_digits, component="transformations")
             mytype = "translation"
 
-        elif re.match(hash_pattern, new_entry):
-            message = self._autocoplete_ids(first_digits=new_entry_digits,my_list_of_ids=self.mcnp_input.cells.keys())
+        elif PATTERNS["cell_complement_entry"].match(new_entry):
+            message = self._autocoplete_ids(first_digits=new_entry_digits,component="cells")
             mytype = "cell"
 
         elif self.model_of_current_line.is_cursor_at_material:
-             message = self._autocoplete_ids(first_digits=new_entry_digits,my_list_of_ids=self.mcnp_input.materials.keys())
+             message = self._autocoplete_ids(first_digits=new_entry_digits,component="materials")
              mytype = "material"
 
-        elif re.match(number_pattern, new_entry) and self.is_cursor_at_cell_definition():
-             message = self._autocoplete_ids(first_digits=new_entry_digits,my_list_of_ids=self.mcnp_input.surfaces.keys())
+        elif PATTERNS["number_entry"].match(new_entry) and self.is_cursor_at_cell_definition():
+             message = self._autocoplete_ids(first_digits=new_entry_digits,component="surfaces")
              mytype = "surface"
 
         self.logger.info("autocoplete type Found {} ".format(mytype))
@@ -108,4 +110,17 @@ class PhysicsBlockAutoCompletePresenter(AbstractBlockAutoCompletePresenter):
         super(PhysicsBlockAutoCompletePresenter, self).__init__(model_of_current_line, mcnp_input, notifier)
 
     def provide_autocomplete_suggestions(self):
-        return {}  # Implement your physics autocomplete logic here
\ No newline at end of file
+        """
+        Completes the keyword of the data card being typed from the snippets, e.g. "ph" -> phys:n, phys:p, ...
+        Only the first entry of a card is completed, the "*" and "+" modifiers are kept.
+        """
+        if (len(self.model_of_current_line.text_till_cursor_list) != 1 or
+                self.model_of_current_line.is_current_line_continuation_line):
+            return {}
+        new_entry = self.model_of_current_line.last_entry_before_cursor.lstrip("*+")
+        if not new_entry or not new_entry[0].isalpha():
+            return {}
+
+        keywords = get_snippet_index().complete(new_entry, MAX_KEYWORD_COMPLETIONS)
+        self.logger.info("Keyword completions of %s: %d", new_entry, len(keywords))
+        return {"type": "keyword", "value": format_notifier_message(keywords), "entry_length": len(new_entry)}
\ No newline at end of file
@@ -1,4 +1,5 @@
 from autocomplete_presenter import AbstractBlockAutoCompletePresenter
+from npp_mcnp_plugin.utils.card_patterns import PATTERNS
 import re
 from Npp import editor
 
@@ -7,29 +8,39 @@ class AutocompleteNewCellLinePresenter(AbstractBlockAutoCompletePresenter):
         super(AutocompleteNewCellLinePresenter, self).__init__(model_of_current_line, mcnp_input, notifier)
         self.editor = editor  # Add editor reference
 
+    def _previous_cell_id(self, line_number):
+        """
+        Returns the id of the last cell card above the line, from the line index of the model when there is one.
+        """
+        line_index = self.mcnp_input.line_index
+        if line_index is not None:
+            card_span = line_index.card_before(line_number + 1)
+            if card_span is not None and card_span.block_type == "cells" and isinstance(card_span.card_id, int):
+                return card_span.card_id
+            return None
+
+        digit_line_pattern = PATTERNS["digit_line"]
+        while line_number >= 0:
+            current_line_text = self.editor.getLine(line_number).strip().lower()
+            match = digit_line_pattern.match(current_line_text)
+            if match:
+                return int(match.group(1))
+            line_number -= 1
+        return None
+
     def provide_autocomplete_suggestions(self):
         self.logger.info("Handling autocomplete for new cell line.")
-        digit_line_pattern = re.compile(r'^\s*(\d+)')
         result = {"value": None}
 
         # Determine the line number above the current cursor position
         line_number = self.editor.lineFromPosition(self.editor.getCurrentPos()) - 1
-        while line_number >= 0:
-            current_line_text = self.editor.getLine(line_number).strip().lower()
-            match = digit_line_pattern.match(current_line_text)
-            if match:
-                previous_ID = int(match.group(1))
-                next_ID = previous_ID + 1
-                while next_ID in  self.mcnp_input.cells.keys():
-                    next_ID += 1
-                result = {"value": next_ID}
-                break
-            else:
-                line_number -= 1
+        previous_ID = self._previous_cell_id(line_number)
+        if previous_ID is not None:
+            result = {"value": self.mcnp_input.id_allocator("cells").next_free(previous_ID)}
 
         if not result.get("value"):
             self.logger.info("No preceding digit line found.")
         else:
             self.logger.info("Next cell ID determined: %s", result["value"])
 
-        return result
\ No newline at end of file
+        return result
@@ -1,8 +1,8 @@
 from abc import ABCMeta, abstractmethod
 import logging
-from npp_mcnp_plugin.utils.general_utils import format_notifier_message, validate_return_id_as_int, initialise_json_data, find_by_key_and_prefix
-surface_info = initialise_json_data("surface_info.json")
-physics_and_macrobodies_info = initialise_json_data("mcnp.tmSnippets.json")
+from npp_mcnp_plugin.utils.general_utils import format_notifier_message, validate_return_id_as_int
+from npp_mcnp_plugin.utils.data_registry import load_data
+from npp_mcnp_plugin.utils.snippet_index import get_snippet_index, MACROBODY_CATEGORY
 import re
 
 class AbstractBlockSelectionPresenter(object):
@@ -51,15 +51,23 @@ class CellBlockPresenter(AbstractBlockSelectionPresenter):
             self.logger.debug("No surface is selected")
             return None   
 
-    def should_ignore_selection(self):
+    def _handle_lattice_selected(self):
         """
-        This function checks if the selection should be ignored.
-        currently we do nothing if this is a lattice line.
+        This function handles the selection in the fill of a cell, it shows the universes filling the cell
+        and how many times they are instantiated.
         """
-        if self.selected_card_service.is_lattice_line:
-            self.logger.info("Ignore line")
-            return True
-        return False
+        cell = self.mcnp_input.cells.get(self.selected_card_service.get_cell_id_of_card())
+        if cell is None or not cell.fill:
+            return None
+        universes = self.mcnp_input.universes
+        message = ["Cell {} fill:".format(cell.id)]
+        for universe, multiplicity in cell.fill:
+            try:
+                message.append("universe {} x {}: {} instances, nesting depth {}".format(
+                    universe, multiplicity, universes.instance_count(universe), universes.nesting_depth(universe)))
+            except ValueError as e:
+                message.append("universe {} x {}: {}".format(universe, multiplicity, e))
+        return {"type": "fill", "value": "\n".join(message)}
 
     def _handle_cell_id_selected(self):
         """
@@ -68,12 +76,9 @@ class CellBlockPresenter(AbstractBlockSelectionPresenter):
         cell_id = self.selected_card_service.get_cell_id()
 
         self.logger.debug("Cell id selected: {}".format(cell_id))
-        all_cell_mentions = []
-        # find all the cells which have the selected cell id mentioned in the mcnp input
-        for id in self.mcnp_input.cells:
-            if cell_id in self.mcnp_input.cells[id].cells:
-                self.logger.debug("Found #{} in the input of cell with id  {}".format(cell_id,id ))
-                all_cell_mentions.append(id)
+        # cells which have the selected cell id mentioned as #id in the mcnp input
+        all_cell_mentions = self.mcnp_input.references.cells_referencing_cell(cell_id)
+        self.logger.debug("Found #{} in the input of cells with id {}".format(cell_id, all_cell_mentions))
 
         if all_cell_mentions:
             return {"type": "cell_id", "value": "entry #{} is present in cells with id's  {}".format(cell_id, all_cell_mentions)}
@@ -105,8 +110,8 @@ class CellBlockPresenter(AbstractBlockSelectionPresenter):
         """
         self.logger.debug("Called method analyze_selection\n")
 
-        if self.should_ignore_selection():
-            return None
+        if self.selected_card_service.is_lattice_line:
+            return self._handle_lattice_selected()
         elif self.selected_card_service.is_cell_like_but_format():
             return None        
         elif self.selected_card_service.selected_mcnp_card.is_current_line_continuation_line:
@@ -148,8 +153,8 @@ class SurfaceBlockPresenter(AbstractBlockSelectionPresenter):
         surface_type = self.selected_card_service.get_surface_type() 
         self.logger.debug("Surface type selected: {}".format(surface_type))
 
-        # Try to find the surface type in surface_info first, then in physics_and_macrobodies_info
-        message = surface_info.get(surface_type, None) or find_by_key_and_prefix(surface_type.lower(), physics_and_macrobodies_info, search_key_string="macrobody")
+        # Try to find the surface type in surface_info.json first, then in the macrobody snippets
+        message = load_data("surface_info.json").get(surface_type, None) or get_snippet_index().find_body(surface_type, MACROBODY_CATEGORY)
 
         if message is None:
             message = "Surface type not found..."
@@ -0,0 +1,140 @@
+import logging
+import threading
+try:
+    from npp_mcnp_plugin.utils.file_parser import FileParser
+    from npp_mcnp_plugin.utils.input_validator import InputValidator
+    from npp_mcnp_plugin.models.error import ErrorCollection
+    from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+    from npp_mcnp_plugin.services.validation_service import ValidationService
+except ImportError:
+    from utils.file_parser import FileParser
+    from utils.input_validator import InputValidator
+    from models.error import ErrorCollection
+    from models.mcnp_input import ModelMcnpInput
+    from services.validation_service import ValidationService
+
+
+class ParseCancelled(Exception):
+    """ raised in the worker when a newer parse was requested """
+
+
+class ParseResult(object):
+    def __init__(self, filename, content_hash, parser, mcnp_input, error_collection, from_cache=False):
+        self.filename = filename
+        self.content_hash = content_hash
+        self.parser = parser
+        self.mcnp_input = mcnp_input
+        self.error_collection = error_collection
+        self.from_cache = from_cache
+
+
+class BackgroundParseService(object):
+    """
+    Parses and validates the editor text on a worker thread.
+
+    The new ModelMcnpInput is built next to the current one, which keeps serving the editor callbacks,
+    and is handed to on_parsed only when parsing and validation completed. Every request gets a generation number,
+    a newer request cancels the running one at its next phase boundary and a cancelled result is never handed over.
+    """
+    def __init__(self, parse_cache, on_parsed, run_in_background=True):
+        """
+        Args:
+            parse_cache (ParseCache): cache of the parsed and validated inputs.
+            on_parsed (function): called with the ParseResult of the latest request from the worker thread,
+                swaps the model in, it must not wait for the UI thread (e.g. a message box).
+            run_in_background (bool): parse on a worker thread, False parses in the calling thread.
+        """
+        self.parse_cache = parse_cache
+        self.on_parsed = on_parsed
+        # kept between the parses, only the changed cards are validated again
+        self.validation_service = ValidationService(InputValidator())
+        self.run_in_background = run_in_background
+        self.generation = 0
+        self.latest_request = None
+        self.worker = None
+        self._lock = threading.Lock()
+        self._handover_lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def submit(self, text, filename, content_hash, previous_parser=None, previous_model=None):
+        """
+        Requests the parse of the text, the running parse is cancelled.
+        previous_model is a copy of the model of the previous parse (see ModelMcnpInput.copy), it is patched with the
+        changed cards instead of building a new model, the cards with unchanged text keep their instances.
+
+        Returns:
+            bool: False if the same text of the same file is already parsed or being parsed.
+        """
+        with self._lock:
+            if self.latest_request == (filename, content_hash):
+                return False
+            self.generation += 1
+            generation = self.generation
+            self.latest_request = (filename, content_hash)
+
+        if not self.run_in_background:
+            self._run(generation, text, filename, content_hash, previous_parser, previous_model)
+            return True
+        self.worker = threading.Thread(target=self._run, args=(generation, text, filename, content_hash, previous_parser, previous_model))
+        self.worker.daemon = True
+        self.worker.start()
+        return True
+
+    def cancel(self):
+        with self._lock:
+            self.generation += 1
+            self.latest_request = None
+
+    def _check_cancelled(self, generation):
+        if generation != self.generation:
+            raise ParseCancelled()
+
+    def _run(self, generation, text, filename, content_hash, previous_parser, previous_model=None):
+        try:
+            result = self.parse(generation, text, filename, content_hash, previous_parser, previous_model)
+        except ParseCancelled:
+            self.logger.info("Parse of %s cancelled by a newer request", filename)
+            return
+        except Exception as e:
+            self.logger.exception("Error while parsing %s: %s", filename, e)
+            return
+
+        # the handovers are serialised, so an outdated result can't replace a newer one after its generation check,
+        # and on_parsed runs without the request lock, submit and cancel never wait for it
+        with self._handover_lock:
+            with self._lock:
+                if generation != self.generation:
+                    self.logger.info("Dropping outdated parse of %s", filename)
+                    return
+            self.on_parsed(result)
+
+    def parse(self, generation, text, filename, content_hash, previous_parser=None, previous_model=None):
+        """
+        Loads the text from the parse cache or parses and validates it, checking for cancellation between the phases.
+        """
+        cached = self.parse_cache.load(content_hash)
+        if cached is not None:
+            mcnp_input, error_collection = cached
+            return ParseResult(filename, content_hash, FileParser(filename, error_collection, lazy=True),
+                               mcnp_input, error_collection, from_cache=True)
+
+        error_collection = ErrorCollection()
+        parser = FileParser.from_buffer(text, error_collection, filename=filename, previous_parser=previous_parser, lazy=True)
+        self._check_cancelled(generation)
+
+        if previous_model is not None:
+            mcnp_input = previous_model
+            changed_ids = mcnp_input.update_from_file_parser(parser)
+            self.logger.info("Patched %d changed cards", sum(len(ids) for ids in changed_ids.values()))
+        else:
+            mcnp_input = ModelMcnpInput.from_file_parser(parser)
+        parser.card_cache.release_previous()
+        self._check_cancelled(generation)
+
+        # the validation also builds or patches the reference index of the model, the hovers only look it up
+        self.validation_service.validate(mcnp_input, error_collection)
+        self._check_cancelled(generation)
+
+        if not self.parse_cache.store(content_hash, mcnp_input, error_collection, parser.get_included_files()):
+            self.logger.warning("Parsed model of %s is not cached, it is parsed again in the next session", filename)
+        return ParseResult(filename, content_hash, parser, mcnp_input, error_collection)
@@ -41,6 +41,12 @@ class CellSelectionService(SelectionInvestigationService):
         cell_id = self.selected_mcnp_card.first_entry_in_selection
 
         return validate_return_id_as_int(cell_id)
+
+    def get_cell_id_of_card(self):
+        """
+        Returns the id of the cell card the selection is in, also on its continuation lines.
+        """
+        return validate_return_id_as_int(self.selected_mcnp_card.full_entry.split()[0])
         
     def is_cell_definition_selected(self):
         """
@@ -0,0 +1,175 @@
+import logging
+try:
+    from npp_mcnp_plugin.utils.file_parser import FileParser
+    from npp_mcnp_plugin.utils.data_card_dispatcher import DataCard
+    from npp_mcnp_plugin.utils.string_utils import is_comment_line, is_string_empty, remove_comments
+    from npp_mcnp_plugin.models.error import ErrorCollection
+except ImportError:
+    from utils.file_parser import FileParser
+    from utils.data_card_dispatcher import DataCard
+    from utils.string_utils import is_comment_line, is_string_empty, remove_comments
+    from models.error import ErrorCollection
+
+
+class ModelSyncService(object):
+    """
+    Keeps the MCNP input model in sync with the editor between saves.
+
+    Only the cards overlapping the modified lines are read from the editor and parsed again,
+    the cards the modification removed are found in the line index of the model, which still has the lines
+    of before the modification (Notepad++ doesn't send the "before" modification notifications).
+    Tallies and physics settings depend on several cards, they are refreshed on save.
+    """
+    # data cards which are synced live, mnemonic -> model component
+    DATA_CARD_COMPONENTS = {"m": "materials", "tr": "transformations"}
+
+    def __init__(self, mcnp_input, get_line, get_line_count):
+        """
+        Args:
+            mcnp_input (ModelMcnpInput): the model updated in place.
+            get_line (function): returns the text of the editor line by its number.
+            get_line_count (function): returns the number of lines in the editor.
+        """
+        self.mcnp_input = mcnp_input
+        self.get_line = get_line
+        self.get_line_count = get_line_count
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _line_without_comment(self, line_no):
+        line, __ = remove_comments(self.get_line(line_no).lower().rstrip("\r\n"))
+        return line
+
+    def _is_continuation_line(self, line_no):
+        line = self._line_without_comment(line_no)
+        if is_string_empty(line):
+            return False
+        if line.startswith("    "):
+            return True
+        return line_no > 0 and self._line_without_comment(line_no - 1).rstrip().endswith("&")
+
+    def card_range(self, first_line, last_line):
+        """
+        Expands the line range to the start and end of the cards it overlaps,
+        the comment lines directly above the first card are included as they describe it.
+        """
+        line_count = self.get_line_count()
+        first_line = max(0, min(first_line, line_count - 1))
+        last_line = max(first_line, min(last_line, line_count - 1))
+
+        while first_line > 0 and self._is_continuation_line(first_line):
+            first_line -= 1
+        while first_line > 0 and is_comment_line(self._line_without_comment(first_line - 1)) \
+                and not self._is_continuation_line(first_line - 1):
+            first_line -= 1
+        while last_line + 1 < line_count and self._is_continuation_line(last_line + 1):
+            last_line += 1
+        return first_line, last_line
+
+    def _read_lines(self, first_line, last_line):
+        return [self.get_line(line_no).lower() for line_no in range(first_line, last_line + 1)]
+
+    def _read_cards(self, first_line, last_line, lines=None):
+        if lines is None:
+            lines = self._read_lines(first_line, last_line)
+        return FileParser(None, ErrorCollection()).format_blocks(lines)
+
+    def _card_ids(self, block_type, cards):
+        """ returns the ids defined by the cards per model component without creating the instances """
+        card_ids = {}
+        for card in cards:
+            if is_comment_line(card):
+                continue
+            if block_type in ("cells", "surfaces"):
+                first_entry = card.split()[0]
+                if first_entry.isdigit():
+                    card_ids.setdefault(block_type, set()).add(int(first_entry))
+                continue
+            data_card = DataCard.from_line(card)
+            if data_card and data_card.number and data_card.mnemonic in self.DATA_CARD_COMPONENTS:
+                card_ids.setdefault(self.DATA_CARD_COMPONENTS[data_card.mnemonic], set()).add(int(data_card.number))
+        return card_ids
+
+    def _parse_cards(self, block_type, cards):
+        """
+        creates the instances of the cards per model component, errors are left for the validation on save.
+        The READ cards are resolved on save, the cards of the included files stay in the model meanwhile.
+        """
+        parser = FileParser(None, ErrorCollection())
+        parser.included_files = []
+        parser.block = {block_type: cards}
+        if block_type == "cells":
+            return {"cells": parser.get_cells()}
+        elif block_type == "surfaces":
+            return {"surfaces": parser.get_surfaces()}
+        return {"materials": parser.get_materials(), "transformations": parser.get_transformations()}
+
+    def _indexed_card_ids(self, first_line, last_line):
+        """
+        Returns the ids per model component of the cards the line index has on the lines first_line to last_line.
+        """
+        card_ids = {}
+        if self.mcnp_input.line_index is None:
+            return card_ids
+        for card_span in self.mcnp_input.line_index.cards_between(first_line, last_line):
+            if card_span.block_type in ("cells", "surfaces"):
+                if isinstance(card_span.card_id, int):
+                    card_ids.setdefault(card_span.block_type, set()).add(card_span.card_id)
+                continue
+            data_card = DataCard.from_line(str(card_span.card_id))
+            if data_card and data_card.number and data_card.mnemonic in self.DATA_CARD_COMPONENTS:
+                card_ids.setdefault(self.DATA_CARD_COMPONENTS[data_card.mnemonic], set()).add(int(data_card.number))
+        return card_ids
+
+    def after_modification(self, first_line, last_line, lines_added=0):
+        """
+        Parses the cards overlapping the modified lines and patches them into the model.
+
+        Args:
+            first_line (int): first modified line.
+            last_line (int): last modified line, after the modification.
+            lines_added (int): number of lines added by the modification, negative if lines were deleted.
+
+        Returns:
+            dict: the changed ids per model component.
+        """
+        # any modification, also of comments, changes what a selection shows
+        self.mcnp_input.mark_modified()
+        # the cards on the modified lines before the modification, read before the index is shifted
+        removed_ids = self._indexed_card_ids(first_line, last_line - lines_added)
+        if lines_added:
+            self.mcnp_input.shift_block_locations(first_line, lines_added)
+
+        changed_ids = {}
+        block_type = self.mcnp_input.return_block_type(first_line)
+        if block_type is None:
+            self._remove_items(removed_ids, {}, changed_ids)
+            self.mcnp_input.refresh_indexes(changed_ids)
+            return changed_ids
+
+        first_line, last_line = self.card_range(first_line, last_line)
+        lines = self._read_lines(first_line, last_line)
+        if self.mcnp_input.line_index is not None:
+            self.mcnp_input.line_index.reindex(first_line, last_line, lines)
+        cards = self._read_cards(first_line, last_line, lines)
+        new_items = self._parse_cards(block_type, cards)
+        # a card which is still present but can't be parsed yet (e.g. while typing) keeps its previous instance
+        present_ids = self._card_ids(block_type, cards)
+
+        self._remove_items(removed_ids, present_ids, changed_ids)
+        for component, items in new_items.items():
+            model_items = getattr(self.mcnp_input, component)
+            for item_id, item in items.items():
+                model_items[item_id] = item
+                changed_ids.setdefault(component, set()).add(item_id)
+        self.mcnp_input.refresh_indexes(changed_ids)
+
+        self.logger.debug("Live sync of lines %d-%d changed %s", first_line, last_line, changed_ids)
+        return changed_ids
+
+    def _remove_items(self, removed_ids, present_ids, changed_ids):
+        """ removes the items of the removed ids which are no longer present from the model """
+        for component, item_ids in removed_ids.items():
+            model_items = getattr(self.mcnp_input, component)
+            for item_id in item_ids - present_ids.get(component, set()):
+                model_items.pop(item_id, None)
+                changed_ids.setdefault(component, set()).add(item_id)
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# seconds without a new selection event before the latest one is analysed
+QUIET_PERIOD = 0.1
+# number of memoized selection results
+MAX_MEMOIZED_SELECTIONS = 256
+
+# no event is waiting for the quiet period
+_NO_EVENT = object()
+
+
+class SelectionEventService(object):
+    """
+    Coalesces the selection events (UPDATEUI fires on every caret move and scroll) and memoizes their results.
+
+    Only the latest event of a burst is analysed, once no new event came for the quiet period.
+    The results are memoized by the key of the event, (model version, line, selection start, selection end),
+    an event with the key of the previous one is dropped and a memoized key is notified without being analysed again.
+    The key None records that the selection was cleared, so selecting the same text again shows it again.
+
+    The editor is read by the snapshot function in the thread of the event (the UI thread),
+    only the analysis of the snapshot runs on the worker.
+    """
+    def __init__(self, analyze, notify, quiet_period=QUIET_PERIOD, max_memoized=MAX_MEMOIZED_SELECTIONS, run_in_background=True):
+        """
+        Args:
+            analyze (function): analyses the snapshot of the selection, returns the result or None.
+            notify (function): shows the result.
+            quiet_period (float): seconds without events before the latest event is analysed.
+            max_memoized (int): number of results kept, the least recently used are dropped first.
+            run_in_background (bool): coalesce on a worker thread, False analyses every event in the calling thread.
+        """
+        self.analyze = analyze
+        self.notify = notify
+        self.quiet_period = quiet_period
+        self.max_memoized = max_memoized
+        self.run_in_background = run_in_background
+        self.memoized = OrderedDict()
+        self.last_key = None
+        self.pending_key = _NO_EVENT
+        self.pending_snapshot = None
+        self.last_event_time = 0
+        self.worker = None
+        self._condition = threading.Condition()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def submit(self, key, snapshot=None):
+        """
+        Records the selection event, it replaces the event still waiting for the quiet period.
+
+        Args:
+            key: key of the selection, None if the selection was cleared.
+            snapshot (function): reads the state of the editor analysed for the key, called here
+                unless the key is the previous one or its result is memoized.
+        """
+        state = None
+        if snapshot is not None and self._needs_analysis(key):
+            state = snapshot()
+        if not self.run_in_background:
+            self.process(key, state)
+            return
+        with self._condition:
+            self.pending_key = key
+            self.pending_snapshot = state
+            self.last_event_time = time.time()
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._work)
+                self.worker.daemon = True
+                self.worker.start()
+            self._condition.notify()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self.pending_key is _NO_EVENT:
+                    self._condition.wait()
+                remaining = self.last_event_time + self.quiet_period - time.time()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                key, self.pending_key = self.pending_key, _NO_EVENT
+                state, self.pending_snapshot = self.pending_snapshot, None
+            try:
+                self.process(key, state)
+            except Exception as e:
+                self.logger.exception("Error while analysing the selection: %s", e)
+
+    def _needs_analysis(self, key):
+        return key is not None and key != self.last_key and key not in self.memoized
+
+    def process(self, key, state=None):
+        """
+        Analyses the snapshot of the selection of the key unless it is the previous one or its result is memoized.
+        """
+        if key == self.last_key:
+            return
+        self.last_key = key
+        if key is None:
+            return
+
+        if key in self.memoized:
+            result = self.memoized.pop(key)
+        else:
+            result = self.analyze(state)
+        # memoized before the pending event is checked, a newer event with the same key is dropped as the previous one
+        self.memoized[key] = result
+        if len(self.memoized) > self.max_memoized:
+            self.memoized.popitem(last=False)
+
+        # the selection moved while it was analysed, the newer event is shown instead
+        pending_key = self.pending_key
+        if pending_key is not _NO_EVENT and pending_key != key:
+            return
+        if result is not None:
+            self.notify(result)
+
+    def clear(self):
+        with self._condition:
+            self.pending_key = _NO_EVENT
+            self.pending_snapshot = None
+            self.last_key = None
+            self.memoized.clear()
@@ -1,5 +1,6 @@
 import re
 from npp_mcnp_plugin.utils.general_utils import  validate_return_id_as_int
+from npp_mcnp_plugin.utils.card_patterns import PATTERNS
 
 def is_column_at_cell_definition(model_of_current_line, cursor_or_selection_column):
         """
@@ -24,7 +25,7 @@ def is_column_at_cell_definition(model_of_current_line, cursor_or_selection_colu
             return False
 
         # if cursor is after letters (imp, vol etc..) we are past the cell definition
-        if bool(re.search(r'[a-zA-Z]', model_of_current_line.text_till_cursor)):
+        if bool(PATTERNS["letter"].search(model_of_current_line.text_till_cursor)):
             return False
 
         return True
\ No newline at end of file
@@ -0,0 +1,184 @@
+import logging
+import threading
+from collections import namedtuple
+try:
+    from npp_mcnp_plugin.models.error import ErrorModel
+    from npp_mcnp_plugin.models.lazy_card_dict import LazyCardDict
+    from npp_mcnp_plugin.models.reference_index import ReferenceIndex
+except ImportError:
+    from models.error import ErrorModel
+    from models.lazy_card_dict import LazyCardDict
+    from models.reference_index import ReferenceIndex
+
+# model components in the order their errors are reported
+VALIDATED_COMPONENTS = ("surfaces", "cells", "materials", "tallies")
+# model components whose cards reference other cards, see item_references
+REFERENCING_COMPONENTS = ("cells", "surfaces", "tallies")
+
+# result of a rule for one card,
+# errors None marks a card which failed to be created, its error is reported by the LazyCardDict when it is accessed
+CachedResult = namedtuple("CachedResult", ["card_key", "errors"])
+
+
+class ValidationRule(object):
+    """
+    A check of the cards of one model component, its result depends only on the card.
+    The references between the cards are checked for the whole model (see ValidationService._validate_references).
+
+    Args:
+        name (str): unique name of the rule.
+        component (str): the model component whose cards are checked, e.g. 'cells'.
+        check (function): check(card, context) -> (error_code, error_message), context is the ValidationContext.
+    """
+    def __init__(self, name, component, check):
+        self.name = name
+        self.component = component
+        self.check = check
+
+    def run(self, card, context):
+        error_code, error_message = self.check(card, context)
+        return [ErrorModel(str(card), error_message, error_code)] if error_message else []
+
+
+class ValidationContext(object):
+    """
+    the model being validated, the id sets of its components are created once per validation.
+    A model without reference index gets one filled with the cards the rules create,
+    so a card evicted from the cache of the lazy cards isn't created a second time for the references.
+    """
+    def __init__(self, mcnp_input):
+        self.mcnp_input = mcnp_input
+        self._ids = {}
+        self.references = None if mcnp_input.has_references else ReferenceIndex()
+        # (component, id) of the cards already read into references
+        self.referenced = set()
+
+    def add_references(self, component, item_id, card):
+        if self.references is not None and component in REFERENCING_COMPONENTS:
+            self.references.update(component, item_id, card)
+            self.referenced.add((component, item_id))
+
+    def finish_references(self):
+        """ reads the cards the rules didn't create into the references and sets them on the model """
+        if self.references is None:
+            return
+        for component in REFERENCING_COMPONENTS:
+            items = getattr(self.mcnp_input, component) or {}
+            for item_id in list(items):
+                if (component, item_id) not in self.referenced:
+                    self.references.update(component, item_id, items.get(item_id))
+        self.mcnp_input.set_references(self.references)
+        self.references = None
+
+    def ids(self, component):
+        if component not in self._ids:
+            self._ids[component] = set(getattr(self.mcnp_input, component) or ())
+        return self._ids[component]
+
+
+def default_rules(validator):
+    """
+    Returns the rules of the InputValidator checks.
+    """
+    return [
+        ValidationRule("surface", "surfaces", lambda surface, context: validator.validate_surface(surface)),
+        # the referenced surfaces are checked for the whole model by validate_references
+        ValidationRule("cell", "cells", lambda cell, context: validator.validate_cell(cell)),
+        ValidationRule("material", "materials", lambda material, context: validator.validate_material(material)),
+        ValidationRule("tally", "tallies", lambda tally, context: validator.validate_tally(tally)),
+    ]
+
+
+def card_key(items, item_id):
+    """
+    Returns what identifies the text of the card: the source of a lazy card, the instance otherwise.
+    Unchanged cards keep their instance across re-parses (see CardCache), so the instance is compared by identity.
+    """
+    if isinstance(items, LazyCardDict) and item_id not in items.instances:
+        return items.source(item_id)
+    return items.get(item_id)
+
+
+def _same_card(key, other_key):
+    return key is other_key or (isinstance(key, tuple) and key == other_key)
+
+
+class ValidationService(object):
+    """
+    Validates the model with a set of rules and caches the result of each rule per card.
+
+    A card is checked again only if its text changed since the previous validation, the cards of the other results
+    are not even created. The service is kept between the saves, so the InputValidator data is loaded once.
+
+    The references between the cards are checked in one pass over the reverse reference maps of the model
+    (ModelMcnpInput.references), which are updated only for the changed cards.
+    """
+    def __init__(self, validator, rules=None):
+        self.validator = validator
+        self.rules = rules if rules is not None else default_rules(validator)
+        # (rule name, card id) -> CachedResult
+        self.cache = {}
+        # component -> ids present at the previous validation
+        self.previous_ids = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def validate(self, mcnp_input, error_collection):
+        """
+        Adds the errors of all the rules to the error collection.
+
+        Returns:
+            int: the number of card checks which were run, the others came from the cache.
+        """
+        with self._lock:
+            context = ValidationContext(mcnp_input)
+            checks = 0
+            for component in VALIDATED_COMPONENTS:
+                for rule in self.rules:
+                    if rule.component == component:
+                        checks += self._apply_rule(rule, context, error_collection)
+            self._validate_references(context, error_collection)
+            self._validate_model(mcnp_input, error_collection)
+            self.previous_ids = dict((component, context.ids(component)) for component in VALIDATED_COMPONENTS)
+            self.logger.info("Validation ran %d card checks", checks)
+            return checks
+
+    def _apply_rule(self, rule, context, error_collection):
+        items = getattr(context.mcnp_input, rule.component)
+        present_ids = context.ids(rule.component)
+        checks = 0
+        for item_id in list(items):
+            cache_key = (rule.name, item_id)
+            key = card_key(items, item_id)
+            cached = self.cache.get(cache_key)
+            if cached is None or not _same_card(cached.card_key, key):
+                card = items.get(item_id)
+                if card is None:
+                    self.cache[cache_key] = CachedResult(key, None)
+                    continue
+                context.add_references(rule.component, item_id, card)
+                cached = self.cache[cache_key] = CachedResult(card_key(items, item_id), rule.run(card, context))
+                checks += 1
+            elif cached.errors is None:
+                # reports the error of the card again
+                items.get(item_id)
+                continue
+            for error in cached.errors:
+                error_collection.add_error(error)
+
+        # results of the removed cards
+        for item_id in self.previous_ids.get(rule.component, set()) - present_ids:
+            self.cache.pop((rule.name, item_id), None)
+        return checks
+
+    def _validate_references(self, context, error_collection):
+        context.finish_references()
+        references = context.mcnp_input.references
+        for component, item_id, error_code, message in self.validator.validate_references(references, context.ids):
+            card = getattr(context.mcnp_input, component).get(item_id)
+            error_collection.add_error(ErrorModel(str(card), message, error_code))
+
+    def _validate_model(self, mcnp_input, error_collection):
+        # Check if the model has any tallies present if not add error to the collection
+        if not mcnp_input.tallies:
+            error_collection.add_error(ErrorModel("Tally Block", "No tallies present in the file", "TALLY_BLOCK_EMPTY"))
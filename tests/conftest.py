@@ -0,0 +1,71 @@
+import pytest
+
+
+class FakeEditor(object):
+    """
+    Editor of Notepad++ for the tests, the lines can be edited by the tests.
+    get_line and get_line_count are the line callbacks of ModelSyncService,
+    the other methods are the ones of the Scintilla editor read by ModelOfLine.
+    """
+    def __init__(self, text):
+        self.lines = text.splitlines(True)
+        self.selection = (0, 0)
+        self.calls = []
+
+    @property
+    def text(self):
+        return "".join(self.lines)
+
+    def get_line(self, line_no):
+        return self.lines[line_no]
+
+    def get_line_count(self):
+        return len(self.lines)
+
+    def _lines(self):
+        return self.text.split("\n")
+
+    def select(self, line_no, column, length):
+        start = self.positionFromLine(line_no) + column
+        self.selection = (start, start + length)
+
+    def getSelText(self):
+        return self.text[self.selection[0]:self.selection[1]]
+
+    def getSelectionStart(self):
+        return self.selection[0]
+
+    def getSelectionEnd(self):
+        return self.selection[1]
+
+    def getCurrentPos(self):
+        return self.selection[1]
+
+    def getColumn(self, position):
+        return position - (self.text.rfind("\n", 0, position) + 1)
+
+    def lineFromPosition(self, position):
+        return self.text[:position].count("\n")
+
+    def getLineCount(self):
+        return len(self._lines())
+
+    def positionFromLine(self, line_no):
+        return sum(len(line) + 1 for line in self._lines()[:line_no])
+
+    def getLineEndPosition(self, line_no):
+        return self.positionFromLine(line_no) + len(self._lines()[line_no])
+
+    def getTextRange(self, start, end):
+        self.calls.append("getTextRange")
+        return self.text[start:end]
+
+    def getLine(self, line_no):
+        self.calls.append("getLine")
+        return self._lines()[line_no] + "\n"
+
+
+@pytest.fixture
+def editor(request):
+    """ FakeEditor with the INPUT of the test module """
+    return FakeEditor(request.module.INPUT)
@@ -0,0 +1,59 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+
+INPUT_WITH_DATA_CARDS = """title
+1 0 -1 imp:n=1
+2 0 1 imp:n=0
+
+1 so 10
+
+c water
+m1 1001 2 8016 1
+c broken material
+m2 1001 2 8016
+m3 6000 1
+*tr1 0 0 0 0 90 90
+f4:n 1
+fc4 flux in the sphere
+e4 1 2 3
+fm4 -1 1 -4
++f6 1
+e0 10 20
+mode n p
+nps 1e6
+kcode 1000 1 10 100
+"""
+
+
+@pytest.fixture
+def parser(tmpdir):
+    input_file = tmpdir.join("input.i")
+    input_file.write(INPUT_WITH_DATA_CARDS)
+    return FileParser.from_file(str(input_file), ErrorCollection())
+
+
+def test_malformed_material_does_not_discard_other_materials(parser):
+    materials = parser.get_materials()
+
+    assert sorted(materials.keys()) == [1, 3]
+    assert len(parser.error_collection.get_all_errors()) == 1
+
+
+def test_tally_options_are_attached(parser):
+    tallies = parser.get_tallies()
+
+    assert tallies[4].energies == ["1", "2", "3"]
+    assert tallies[4].multipliers == ["-1", "1", "-4"]
+    assert "flux in the sphere" in tallies[4].comment
+    assert tallies[6].collision_heating_enabled
+    assert tallies[6].energies == ["10", "20"]
+
+
+def test_transformations_and_physics(parser):
+    assert list(parser.get_transformations().keys()) == [1]
+    assert parser.get_physics() == {"mode": "n p", "nps": 1000000, "kcode": "kcode 1000 1 10 100"}
+
+
+def test_data_block_is_dispatched_once(parser):
+    assert parser.get_materials() is parser.parse_data_block()["materials"]
@@ -0,0 +1,40 @@
+import io
+import os
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+
+INPUT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcnp_example_inputs", "input_1.i")
+
+CELL_IDS = [1, 2] + list(range(10, 29)) + [998, 999]
+SURFACE_IDS = [1, 2, 3] + list(range(10, 30)) + [999]
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_from_buffer_parses_the_text_of_the_editor(newline):
+    with io.open(INPUT_FILE, "r", newline="") as f:
+        text = f.read().replace("\n", newline)
+
+    parser = FileParser.from_buffer(text, ErrorCollection(), filename=INPUT_FILE)
+
+    assert len(parser.lines) == 107
+    assert all(line.endswith("\n") and not line.endswith("\r\n") for line in parser.lines)
+    assert parser.lines[-1] == "f4:n 1\n"
+    assert parser.block_locations == {
+        "cells": {"start": 1, "end": 40},
+        "surfaces": {"start": 41, "end": 72},
+        "physics": {"start": 73, "end": 107},
+    }
+    assert parser.title == "test input graphite target with concrete shielding\n"
+    assert sorted(parser.get_cells()) == CELL_IDS
+    assert sorted(parser.get_surfaces()) == SURFACE_IDS
+
+
+def test_from_buffer_lowers_the_lines_and_keeps_their_line_ends():
+    parser = FileParser(None, ErrorCollection())
+
+    parser.read_text("Title\r\n1 0 -1 IMP:N=1\r\r\n1 SO 10")
+    assert parser.lines == ["title\n", "1 0 -1 imp:n=1\n", "\n", "1 so 10"]
+
+    parser.read_text("")
+    assert parser.lines == []
@@ -0,0 +1,69 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 imp:n=1
+3 0 2 imp:n=0
+
+1 so 10
+2 so 20
+
+m1 1001 2 8016 1
+f4:n 1
+e4 1 2 3
+"""
+
+
+@pytest.fixture
+def input_file(tmpdir):
+    input_file = tmpdir.join("input.i")
+    input_file.write(INPUT)
+    return input_file
+
+
+def reparse(input_file, parser, model, new_text):
+    input_file.write(new_text)
+    new_parser = FileParser.from_file(str(input_file), ErrorCollection(), previous_parser=parser)
+    return new_parser, model.update_from_file_parser(new_parser)
+
+
+def test_unchanged_cards_keep_their_instances(input_file):
+    parser = FileParser.from_file(str(input_file), ErrorCollection())
+    model = ModelMcnpInput.from_file_parser(parser)
+    cell_1, surface_2, material_1 = model.cells[1], model.surfaces[2], model.materials[1]
+
+    parser, changed_ids = reparse(input_file, parser, model, INPUT.replace("1 so 10", "1 so 15"))
+
+    assert changed_ids["surfaces"] == set([1])
+    assert changed_ids["cells"] == set()
+    assert changed_ids["materials"] == set()
+    assert model.cells[1] is cell_1
+    assert model.surfaces[2] is surface_2
+    assert model.materials[1] is material_1
+    assert model.surfaces[1].parameters == "15"
+    assert parser.card_cache.created == 1
+
+
+def test_removed_and_added_cards_are_patched(input_file):
+    parser = FileParser.from_file(str(input_file), ErrorCollection())
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    new_text = INPUT.replace("3 0 2 imp:n=0\n", "4 0 2 imp:n=0\n").replace("m1 1001 2 8016 1", "m2 1001 2 8016 1")
+    parser, changed_ids = reparse(input_file, parser, model, new_text)
+
+    assert changed_ids["cells"] == set([3, 4])
+    assert sorted(model.cells.keys()) == [1, 2, 4]
+    assert sorted(model.materials.keys()) == [0, 2]
+
+
+def test_tally_is_recreated_when_its_options_change(input_file):
+    parser = FileParser.from_file(str(input_file), ErrorCollection())
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    parser, changed_ids = reparse(input_file, parser, model, INPUT.replace("e4 1 2 3", "e4 1 2"))
+
+    assert changed_ids["tallies"] == set([4])
+    assert model.tallies[4].energies == ["1", "2"]
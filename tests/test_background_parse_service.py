@@ -0,0 +1,82 @@
+import threading
+from npp_mcnp_plugin.services.background_parse_service import BackgroundParseService
+from npp_mcnp_plugin.utils.parse_cache import ParseCache
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 imp:n=0
+
+1 so 10
+
+m1 1001 2 8016 1
+f4:n 1
+"""
+
+
+def test_parsed_model_is_handed_over(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    results = []
+    service = BackgroundParseService(cache, results.append, run_in_background=False)
+
+    assert service.submit(INPUT, "input.i", cache.content_hash(INPUT))
+    # same text of the same file is not parsed again
+    assert not service.submit(INPUT, "input.i", cache.content_hash(INPUT))
+
+    assert len(results) == 1
+    assert sorted(results[0].mcnp_input.cells) == [1, 2]
+    assert not results[0].from_cache
+
+    # another session loads the validated model from the cache
+    other_results = []
+    BackgroundParseService(cache, other_results.append, run_in_background=False).submit(INPUT, "input.i", cache.content_hash(INPUT))
+    assert other_results[0].from_cache
+    assert sorted(other_results[0].mcnp_input.cells) == [1, 2]
+
+
+def test_newer_request_cancels_running_parse(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    results = []
+    service = BackgroundParseService(cache, results.append)
+    first_started, release_first = threading.Event(), threading.Event()
+    parse = service.parse
+
+    def slow_first_parse(generation, text, *args):
+        if generation == 1:
+            first_started.set()
+            release_first.wait(5)
+        return parse(generation, text, *args)
+
+    service.parse = slow_first_parse
+    service.submit(INPUT, "input.i", cache.content_hash(INPUT))
+    first_worker = service.worker
+    assert first_started.wait(5)
+
+    new_text = INPUT.replace("1 so 10", "1 so 10\n2 so 20")
+    service.submit(new_text, "input.i", cache.content_hash(new_text))
+    service.worker.join(5)
+    release_first.set()
+    first_worker.join(5)
+
+    assert len(results) == 1
+    assert sorted(results[0].mcnp_input.surfaces) == [1, 2]
+
+
+def test_submit_does_not_wait_for_the_handover(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    handover_started, release_handover = threading.Event(), threading.Event()
+
+    def slow_on_parsed(result):
+        # e.g. a message box waiting for the user
+        handover_started.set()
+        release_handover.wait(5)
+
+    service = BackgroundParseService(cache, slow_on_parsed)
+    service.submit(INPUT, "input.i", cache.content_hash(INPUT))
+    assert handover_started.wait(5)
+
+    submitted = threading.Event()
+    submitter = threading.Thread(target=lambda: (service.cancel(), submitted.set()))
+    submitter.start()
+    assert submitted.wait(1)
+    release_handover.set()
+    submitter.join(5)
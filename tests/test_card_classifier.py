@@ -0,0 +1,45 @@
+import logging
+import re
+import pytest
+from npp_mcnp_plugin.utils.card_patterns import classify_card
+from npp_mcnp_plugin.utils.string_utils import get_block_type_from_line
+
+# block type patterns of the sequential classifier replaced by the combined one
+SEQUENTIAL_PATTERNS = [
+    ('surfaces', r'^\d+\s+\d+\s+[a-zA-Z]+\s+[-]?\d+'),
+    ('surfaces', r'^\d+\s+(?!like\b)[a-zA-Z]+\s+[-]?\d+'),
+    ('surfaces', r'^\d+\s+\d+\s+[a-zA-Z]+\s+[-]?.'),
+    ('surfaces', r'^\d+\s+(?!like\b)[a-zA-Z]+\s+[-]?.'),
+    ('cells', r'^\d+\s+\d+\s+[-]?\d[\S+]?.*\s+\S+'),
+    ('cells', r'^\d+\s+0\s+[\S+]?.*\s+\S+'),
+    ('cells', r'^\d+\s+like\s+\d+\s+but'),
+    ('physics', r'^kcode\s+.*'),
+    ('physics', r'^mode\s+.*'),
+]
+
+test_data = [
+    ("1 pz 0", ("surfaces", "surface")),
+    ("5 2 cz -10", ("surfaces", "surface_with_transformation")),
+    ("12  81 -2.35 1 -3   -13 12 imp:n=1", ("cells", "cell")),
+    ("999 0  999 imp:n=0", ("cells", "cell")),
+    ("3 0 (-3 1 2):(-2 -1)", ("cells", "void_cell")),
+    ("5 like 2 but imp:n=0", ("cells", "like_but_cell")),
+    ("kcode 1000 1 10 100", ("physics", "kcode")),
+    ("mode n p", ("physics", "mode")),
+    ("m1 1001 1", (None, None)),
+    ("c comment", (None, None)),
+    ("", (None, None)),
+]
+
+
+def sequential_block_type(line):
+    for block_type, pattern in SEQUENTIAL_PATTERNS:
+        if re.match(pattern, line):
+            return block_type
+    return None
+
+
+@pytest.mark.parametrize("line, expected", test_data)
+def test_classify_card(line, expected):
+    assert classify_card(line) == expected
+    assert get_block_type_from_line(logging.getLogger(), line) == sequential_block_type(line)
@@ -0,0 +1,47 @@
+import pickle
+import pytest
+from npp_mcnp_plugin.models.mcnp_input_cards import Surface, Tally, Isotope, Transformation, Cell, pack_coefficients
+
+
+def test_cards_have_no_instance_dict():
+    cards = [
+        Surface.create_from_input_line("1 so 10", ""),
+        Tally.create_from_input_line("f4:n 1", ""),
+        Transformation.create_from_input_line("tr1 0 0 1", ""),
+        Isotope(1, 1, 0.5, "80c"),
+        Cell(1, 0, None, [1], [], None),
+    ]
+    for card in cards:
+        assert not hasattr(card, "__dict__")
+        with pytest.raises(AttributeError):
+            card.unknown_attribute = 1
+
+
+@pytest.mark.parametrize("parameters, coefficients, text_kept", [
+    ("10", [10.0], False),
+    ("1.5 -2 0 3", [1.5, -2.0, 0.0, 3.0], False),
+    ("1e-05 2.50", [1e-05, 2.5], True),
+    ("0 0 abc", [], True),
+])
+def test_surface_coefficients_are_packed(parameters, coefficients, text_kept):
+    surface = Surface(1, "so", parameters, "")
+    assert surface.parameters == parameters
+    assert list(surface.coefficients) == coefficients
+    assert (pack_coefficients(parameters)[1] is not None) == text_kept
+
+
+def test_surface_parameters_update_and_pickle():
+    surface = Surface.create_from_input_line("2 5 pz 1.5", "top")
+    surface.update_surface_parameters("2.5")
+    copy = pickle.loads(pickle.dumps(surface, pickle.HIGHEST_PROTOCOL))
+
+    assert copy.parameters == "2.5"
+    assert list(copy.coefficients) == [2.5]
+    assert (copy.id, copy.transformation, copy.surface_type, copy.comment) == (2, "5", "pz", "top")
+
+
+def test_repeated_strings_are_shared():
+    first = Surface.create_from_input_line("1 " + "".join(["r", "cc"]) + " 0 0 0 0 0 1 2", "")
+    second = Surface.create_from_input_line("2 rcc 1 1 1 0 0 1 2", "")
+    assert first.surface_type is second.surface_type
+    assert Isotope(1, 1, 0.5, "".join(["80", "c"])).library is Isotope(8, 16, 0.5, "80c").library
@@ -0,0 +1,42 @@
+import json
+import os
+from npp_mcnp_plugin.utils import data_registry
+from npp_mcnp_plugin.utils.data_registry import DataRegistry
+
+
+def write_json(path, data, mtime):
+    path.write(json.dumps(data))
+    os.utime(str(path), (mtime, mtime))
+
+
+def test_dataset_is_loaded_once_and_compiled(tmpdir, monkeypatch):
+    data_dir, compiled_dir = tmpdir.mkdir("data"), tmpdir.join("compiled")
+    write_json(data_dir.join("surface_info.json"), {"so": "Sphere centered at origin"}, 1000)
+
+    registry = DataRegistry(str(data_dir), str(compiled_dir))
+    dataset = registry.get("surface_info.json")
+    assert dataset == {"so": "Sphere centered at origin"}
+    assert registry.get("surface_info.json") is dataset
+    assert compiled_dir.join("surface_info.json.marshal").check()
+
+    # a new session reads the compiled data without decoding the JSON
+    def fail(*args, **kwargs):
+        raise AssertionError("the JSON should not be decoded")
+    monkeypatch.setattr(data_registry.json, "load", fail)
+    assert DataRegistry(str(data_dir), str(compiled_dir)).get("surface_info.json") == dataset
+
+
+def test_changed_json_is_compiled_again(tmpdir):
+    data_dir, compiled_dir = tmpdir.mkdir("data"), tmpdir.join("compiled")
+    write_json(data_dir.join("element_names.json"), {"1": "H"}, 1000)
+    DataRegistry(str(data_dir), str(compiled_dir)).get("element_names.json")
+
+    write_json(data_dir.join("element_names.json"), {"1": "H", "2": "He"}, 2000)
+    assert DataRegistry(str(data_dir), str(compiled_dir)).get("element_names.json") == {"1": "H", "2": "He"}
+
+
+def test_unreadable_compiled_data_falls_back_to_the_json(tmpdir):
+    data_dir, compiled_dir = tmpdir.mkdir("data"), tmpdir.mkdir("compiled")
+    write_json(data_dir.join("element_names.json"), {"1": "H"}, 1000)
+    compiled_dir.join("element_names.json.marshal").write_binary(b"not marshal data")
+    assert DataRegistry(str(data_dir), str(compiled_dir)).get("element_names.json") == {"1": "H"}
@@ -0,0 +1,56 @@
+import pytest
+from npp_mcnp_plugin.models.id_allocator import IdAllocator
+from npp_mcnp_plugin.models.line_index import LineIndex
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.models.mcnp_input_cards import Cell
+
+
+def test_used_ids_are_merged_into_ranges():
+    allocator = IdAllocator([5, 1, 2, 3, 10, 11])
+    assert list(zip(allocator.starts, allocator.ends)) == [(1, 3), (5, 5), (10, 11)]
+
+
+def test_next_free():
+    allocator = IdAllocator(range(1, 10001))
+    assert allocator.next_free(0) == 10001
+    assert allocator.next_free(5000) == 10001
+    assert allocator.next_free(20000) == 20001
+    allocator.remove(7000)
+    assert allocator.next_free(5000) == 7000
+    allocator.add(7000)
+    assert len(allocator) == 1
+
+
+@pytest.mark.parametrize("ids, block_size, expected", [
+    ([], 3, 1),
+    ([1, 2, 4, 5, 9, 10], 1, 3),
+    ([1, 2, 4, 5, 9, 10], 3, 6),
+    ([1, 2, 4, 5, 9, 10], 4, 11),
+    ([3, 4], 2, 1),
+])
+def test_first_free_block(ids, block_size, expected):
+    assert IdAllocator(ids).first_free_block(block_size) == expected
+
+
+def test_first_free_block_after_changes():
+    allocator = IdAllocator([1, 2, 3, 7])
+    assert allocator.first_free_block(3) == 4
+    allocator.add(5)
+    assert allocator.first_free_block(3) == 8
+    allocator.remove(2)
+    assert allocator.first_free_block(1) == 2
+
+
+def test_model_allocator_follows_added_cells():
+    model = ModelMcnpInput(surfaces={}, cells={1: Cell(1, 0, 0, [1], [])}, materials={}, tallies={}, transformations={})
+    assert model.id_allocator("cells").next_free(0) == 2
+    model.add_cell(Cell(2, 0, 0, [1], []))
+    assert model.id_allocator("cells").next_free(0) == 3
+
+
+def test_card_before_line():
+    index = LineIndex({"cells": {"start": 1, "end": 4}})
+    index._append_cards([(1, 2, 10), (3, 3, 11)])
+    assert index.card_before(3).card_id == 10
+    assert index.card_before(4).card_id == 11
+    assert index.card_before(1) is None
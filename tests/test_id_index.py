@@ -0,0 +1,34 @@
+from npp_mcnp_plugin.models.id_index import IdPrefixIndex
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.models.mcnp_input_cards import Surface
+
+
+def test_completions_are_numeric_and_shortest_first():
+    index = IdPrefixIndex([3, 1, 10, 100, 12, 2, 19, 1000, 21])
+    assert index.complete("1", 10) == [1, 10, 12, 19, 100, 1000]
+    assert index.complete("1", 3) == [1, 10, 12]
+    assert index.complete("2", 10) == [2, 21]
+    assert index.complete("4", 10) == []
+    assert index.complete("", 2) == [1, 2]
+
+
+def test_zero_prefix_only_completes_zero():
+    assert IdPrefixIndex([0, 1, 10]).complete("0", 10) == [0]
+
+
+def test_add_and_remove():
+    index = IdPrefixIndex([5])
+    index.add(50)
+    index.add(50)
+    assert index.complete("5", 10) == [5, 50]
+    index.remove(5)
+    index.remove(7)
+    assert index.complete("5", 10) == [50]
+
+
+def test_model_index_follows_added_cards():
+    model = ModelMcnpInput(surfaces={1: Surface(1, "so", "1", None)}, cells={}, materials={}, tallies={}, transformations={})
+    assert model.id_index("surfaces").complete("1", 10) == [1]
+    model.add_surface(Surface(11, "so", "2", None))
+    assert model.id_index("surfaces").complete("1", 10) == [1, 11]
+    assert model.id_index("materials").complete("", 10) == [0]
@@ -0,0 +1,142 @@
+import os
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.utils.include_resolver import INCLUDE_CACHE, find_read_cards
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 imp:n=1
+3 0 2 imp:n=0
+
+1 so 10
+read file=surfaces.i noecho
+
+m1 1001 2 8016 1
+read file=Materials.i
+read file=missing.i
+"""
+
+SURFACES = """2 so 20
+c outer sphere
+3 so 30
+"""
+
+MATERIALS = """m2 6000 1
+read file=tr.i
+"""
+
+TRANSFORMATIONS = """tr1 0 0 1
+"""
+
+
+@pytest.fixture
+def input_file(tmpdir):
+    INCLUDE_CACHE.clear()
+    tmpdir.join("surfaces.i").write(SURFACES)
+    tmpdir.join("Materials.i").write(MATERIALS)
+    tmpdir.join("tr.i").write(TRANSFORMATIONS)
+    input_file = tmpdir.join("input.i")
+    input_file.write(INPUT)
+    return input_file
+
+
+def test_find_read_cards():
+    assert find_read_cards(["1 so 10", "read noecho file=a.i", "read file = b.i"]) == \
+        [("read noecho file=a.i", "a.i"), ("read file = b.i", "b.i")]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_included_cards_are_merged_into_the_model(input_file, lazy):
+    error_collection = ErrorCollection()
+    parser = FileParser.from_file(str(input_file), error_collection, lazy=lazy)
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    assert sorted(model.surfaces) == [1, 2, 3]
+    assert sorted(model.materials) == [0, 1, 2]
+    assert model.surfaces[3].parameters == "30"
+    assert model.get_transformation(1).id == 1
+
+    directory = os.path.dirname(str(input_file))
+    assert model.get_card_file("surfaces", 1) is None
+    assert model.get_card_file("surfaces", 3) == os.path.join(directory, "surfaces.i")
+    # lines are lower case, the file name is matched case-insensitively
+    assert model.get_card_file("materials", 2) == os.path.join(directory, "Materials.i")
+    assert model.get_card_file("transformations", 1) == os.path.join(directory, "tr.i")
+
+    assert [error.error_code for error in error_collection.get_all_errors()] == ["INCLUDE_NOT_FOUND"]
+
+
+def test_included_files_are_cached_until_modified(input_file, tmpdir):
+    first_parser = FileParser.from_file(str(input_file), ErrorCollection())
+    first_surfaces = first_parser.get_surfaces()
+    second_surfaces = FileParser.from_file(str(input_file), ErrorCollection()).get_surfaces()
+    assert second_surfaces[2] is first_surfaces[2]
+
+    surfaces_file = tmpdir.join("surfaces.i")
+    surfaces_file.write(SURFACES.replace("2 so 20", "2 so 25"))
+    os.utime(str(surfaces_file), (0, os.path.getmtime(str(surfaces_file)) + 10))
+
+    third_surfaces = FileParser.from_file(str(input_file), ErrorCollection()).get_surfaces()
+    assert third_surfaces[2].parameters == "25"
+
+
+def test_update_patches_included_cards(input_file, tmpdir):
+    parser = FileParser.from_file(str(input_file), ErrorCollection(), lazy=True)
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    tmpdir.join("surfaces.i").write("4 so 40\n")
+    new_parser = FileParser.from_file(str(input_file), ErrorCollection(), previous_parser=parser, lazy=True)
+    changed_ids = model.update_from_file_parser(new_parser)
+
+    assert changed_ids["surfaces"] == set([2, 3, 4])
+    assert sorted(model.surfaces) == [1, 4]
+    assert model.get_card_file("surfaces", 4) is not None
+
+
+def test_circular_include_is_reported(tmpdir):
+    INCLUDE_CACHE.clear()
+    tmpdir.join("loop.i").write("m5 1001 1\nread file=loop.i\n")
+    input_file = tmpdir.join("input.i")
+    input_file.write("title\n1 0 -1\n\n1 so 10\n\nread file=loop.i\n")
+
+    error_collection = ErrorCollection()
+    model = ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), error_collection))
+
+    assert sorted(model.materials) == [0, 5]
+    assert [error.error_code for error in error_collection.get_all_errors()] == ["INCLUDE_CIRCULAR"]
+
+
+def test_live_sync_keeps_included_cards_without_resolving_read_cards(input_file, monkeypatch):
+    from npp_mcnp_plugin.utils import include_resolver
+    from npp_mcnp_plugin.services.model_sync_service import ModelSyncService
+    model = ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), ErrorCollection()))
+    lines = INPUT.splitlines(True)
+    service = ModelSyncService(model, lambda line_no: lines[line_no], lambda: len(lines))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("READ cards are resolved on save only")
+    monkeypatch.setattr(include_resolver, "parse_included_file", fail)
+
+    lines[6] = "read file=surfaces.i\n"
+    service.after_modification(6, 6)
+    lines[5] = "1 so 15\n"
+    service.after_modification(5, 5)
+
+    assert model.surfaces[1].parameters == "15"
+    assert sorted(model.surfaces) == [1, 2, 3]
+
+
+def test_included_file_is_parsed_again_when_a_nested_file_changes(input_file, tmpdir):
+    model = ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), ErrorCollection()))
+    assert model.get_transformation(1).id == 1
+
+    # tr.i is included by Materials.i, which is unchanged
+    tr_file = tmpdir.join("tr.i")
+    tr_file.write("tr2 0 0 1\n")
+    os.utime(str(tr_file), (0, os.path.getmtime(str(tr_file)) + 10))
+
+    model = ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), ErrorCollection()))
+    assert sorted(model.transformations) == [2]
+    assert sorted(model.materials) == [0, 1, 2]
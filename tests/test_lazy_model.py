@@ -0,0 +1,108 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.models.lazy_card_dict import LazyCardDict
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 imp:n=1
+3 0 2x imp:n=0
+
+1 so 10
+2 so 20
+
+m1 1001 2 8016 1
+m2 1001 2 8016
+f4:n 1
+"""
+
+
+def parse(text, tmpdir, previous_parser=None):
+    input_file = tmpdir.join("input.i")
+    input_file.write(text)
+    return FileParser.from_file(str(input_file), ErrorCollection(), previous_parser=previous_parser, lazy=True)
+
+
+def test_cards_are_created_on_first_access(tmpdir):
+    model = ModelMcnpInput.from_file_parser(parse(INPUT, tmpdir))
+
+    assert isinstance(model.cells, LazyCardDict)
+    assert not model.cells.cached
+    assert 2 in model.cells and 1 in model.surfaces
+    assert not model.cells.cached and not model.surfaces.cached
+
+    assert model.get_cell(2).surfaces == [1, 2]
+    assert list(model.cells.cached) == [2]
+    assert model.get_material(1).id == 1
+    assert model.get_material(0) == "Void"
+
+
+def test_cards_failing_creation_are_reported_once(tmpdir):
+    parser = parse(INPUT, tmpdir)
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    assert isinstance(model.get_cell(3), str)
+    assert isinstance(model.get_material(2), str)
+    assert sorted(model.cells) == [1, 2]
+    assert len(parser.error_collection.get_all_errors()) == 2
+
+
+def test_cache_is_bounded():
+    cards = LazyCardDict(dict((i, ("{} so 1".format(i), "")) for i in range(1, 6)),
+                         lambda line, comment: line.split()[0], max_cached=2)
+
+    assert [cards[i] for i in range(1, 6)] == ["1", "2", "3", "4", "5"]
+    assert list(cards.cached) == [4, 5]
+
+
+def test_patch_keeps_unchanged_instances(tmpdir):
+    parser = parse(INPUT, tmpdir)
+    model = ModelMcnpInput.from_file_parser(parser)
+    cell_1 = model.get_cell(1)
+
+    parser = parse(INPUT.replace("2 0 1 -2", "4 0 1 -2"), tmpdir, previous_parser=parser)
+    changed_ids = model.update_from_file_parser(parser)
+
+    assert changed_ids["cells"] == set([2, 4])
+    assert model.get_cell(1) is cell_1
+    assert sorted(model.cells) == [1, 3, 4]
+    assert sorted(model.materials) == [0, 1, 2]
+
+
+def test_patched_copy_leaves_the_model_unchanged(tmpdir):
+    parser = parse(INPUT, tmpdir)
+    model = ModelMcnpInput.from_file_parser(parser)
+    cell_1 = model.get_cell(1)
+    assert model.references.cells_using_surface(2) == [2]
+
+    assert 2 in model.id_index("cells")
+    copied = model.copy()
+    parser = parse(INPUT.replace("2 0 1 -2", "4 0 1 -2"), tmpdir, previous_parser=parser)
+    copied.update_from_file_parser(parser)
+
+    # the indexes of the copy are patched for the changed cards, not built again from all the cards
+    assert copied._references is not None and copied._references is not model._references
+    assert 4 in copied.id_index("cells") and 2 not in copied.id_index("cells")
+    assert 2 in model.id_index("cells") and 4 not in model.id_index("cells")
+    assert copied.get_cell(1) is cell_1
+    assert 4 in copied.cells and 2 not in copied.cells
+    assert copied.references.cells_using_surface(2) == [4]
+    assert copied.version != model.version
+    assert 2 in model.cells and 4 not in model.cells
+    assert model.references.cells_using_surface(2) == [2]
+
+
+def test_lazy_model_is_pickled_with_protocol_2(tmpdir):
+    import pickle
+    model = ModelMcnpInput.from_file_parser(parse(INPUT, tmpdir))
+    model.cells.get(1)
+
+    # python 2 pickles functions by module and name, the factories have to be pickled as class methods
+    for component in ("cells", "surfaces", "materials"):
+        assert isinstance(getattr(model, component).__getstate__()["create_instance_func"], tuple)
+
+    loaded = pickle.loads(pickle.dumps(model, 2))
+    assert loaded.cells[1].surfaces == [1]
+    assert loaded.surfaces[2].id == 2
+    assert loaded.materials[1].id == 1
@@ -0,0 +1,105 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.models.line_index import LineIndex, scan_cards
+from npp_mcnp_plugin.services.model_sync_service import ModelSyncService
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 &
+c inside the card
+     imp:n=1
+c cell 3
+3 0 2 imp:n=0
+
+1 so 10
+2 so 20
+
+m1 1001 2
+     8016 1
+f4:n 1
+"""
+
+
+@pytest.fixture
+def model():
+    return ModelMcnpInput.from_file_parser(FileParser.from_buffer(INPUT, ErrorCollection()))
+
+
+def test_scan_cards_merges_continuation_and_comment_lines():
+    assert list(scan_cards(INPUT.splitlines()[1:7], 1)) == [(1, 1, 1), (2, 4, 2), (6, 6, 3)]
+
+
+def test_lines_map_to_block_and_card(model):
+    assert model.return_card_span(3) == (2, 4, "cells", 2)
+    assert model.return_card_span(4).card_id == 2
+    assert model.return_card_span(5) is None
+    assert model.return_card_span(9) == (9, 9, "surfaces", 2)
+    assert model.return_card_span(12) == (11, 12, "physics", "m1")
+    assert model.return_card_span(13).card_id == "f4:n"
+
+    assert model.return_block_type(0) is None
+    assert model.return_block_type(6) == "cells"
+    assert model.return_block_type(8) == "surfaces"
+    assert model.return_block_type(11) == "physics"
+
+
+def test_live_edits_keep_the_index_in_sync(model, editor):
+    service = ModelSyncService(model, editor.get_line, editor.get_line_count)
+
+    # a continuation line is added to surface 1
+    editor.lines.insert(9, "     $ radius\n")
+    editor.lines[8] = "1 so &\n"
+    editor.lines[9] = "     10\n"
+    service.after_modification(8, 9, lines_added=1)
+
+    assert model.return_card_span(9) == (8, 9, "surfaces", 1)
+    assert model.return_card_span(10) == (10, 10, "surfaces", 2)
+    assert model.return_card_span(14).card_id == "f4:n"
+
+    # cell 3 is removed
+    del editor.lines[5:7]
+    service.after_modification(5, 5, lines_added=-2)
+
+    assert model.return_card_span(5) is None
+    assert model.return_card_span(6) == (6, 7, "surfaces", 1)
+    assert model.return_card_span(12).card_id == "f4:n"
+
+
+@pytest.mark.parametrize("text, physics_cards", [
+    ("title\n1 0 -1 imp:n=1\n\n1 so 10\n", 0),
+    ("title\n1 0 -1 imp:n=1\n", 0),
+    ("title\n1 0 -1 imp:n=1\n\n1 so 10\n\nm1 1001 1\n", 1),
+])
+def test_decks_with_missing_blocks_are_parsed(text, physics_cards):
+    parser = FileParser.from_buffer(text, ErrorCollection())
+    model = ModelMcnpInput.from_file_parser(parser)
+
+    assert sorted(model.cells) == [1]
+    assert len(parser.block["physics"]) == physics_cards
+    assert model.return_block_type(1) == "cells"
+
+
+def test_edits_at_several_positions_match_a_rebuilt_index():
+    lines = ["{} so {}".format(surface_id, surface_id) for surface_id in range(1, 41)]
+    blocks = {"surfaces": {"start": 0, "end": 99}}
+    line_index = LineIndex.from_blocks(blocks, lambda block_type: lines)
+
+    # cards added below and above the previous edit, then removed, the shift is kept pending in between
+    for line_no, lines_added in [(30, 2), (5, 1), (20, 3), (2, -1), (35, -2), (0, 1)]:
+        if lines_added > 0:
+            lines[line_no + 1:line_no + 1] = ["{} so 1".format(100 + line_no + count) for count in range(lines_added)]
+        else:
+            del lines[line_no + 1:line_no + 1 - lines_added]
+        line_index.shift(line_no, lines_added)
+        # the lines of the edit, from the card at the line number (see ModelSyncService.card_range)
+        last_line = line_no + max(0, lines_added)
+        line_index.reindex(line_no, last_line, lines[line_no:last_line + 1])
+
+    rebuilt = LineIndex.from_blocks(blocks, lambda block_type: lines)
+    assert [line_index.card_at(line_no) for line_no in range(len(lines) + 1)] == \
+        [rebuilt.card_at(line_no) for line_no in range(len(lines) + 1)]
+    assert [line_index.card_before(line_no) for line_no in range(len(lines) + 1)] == \
+        [rebuilt.card_before(line_no) for line_no in range(len(lines) + 1)]
+    assert line_index.cards_between(10, 30) == rebuilt.cards_between(10, 30)
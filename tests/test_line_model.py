@@ -0,0 +1,87 @@
+import sys
+import types
+import pytest
+
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+
+INPUT = """title
+1 1 -1.0 -1
+     imp:n=1
+2 0 1 -2 &
+  imp:n=1
+3 0 2 imp:n=0
+
+1 so 10
+2 so 20
+
+m1 1001 2 8016 1
+"""
+
+
+@pytest.fixture
+def line_model(monkeypatch, editor):
+    """ line_model imports the editor of Notepad++, it is imported with a fake Npp module and reads the fake editor """
+    npp = types.ModuleType("Npp")
+    npp.editor = editor
+    monkeypatch.setitem(sys.modules, "Npp", npp)
+    from npp_mcnp_plugin.models import line_model
+    monkeypatch.setattr(line_model, "editor", editor)
+    return line_model
+
+
+@pytest.fixture
+def line_index():
+    return FileParser.from_buffer(INPUT, ErrorCollection(), "input.i").get_line_index()
+
+
+def test_from_notepad_reads_the_card_with_one_range(line_model, editor, line_index):
+    editor.select(2, 5, 3)
+    model = line_model.ModelOfLine.from_notepad(line_index)
+
+    assert editor.calls == ["getTextRange"]
+    # the card (lines 1 and 2) and one line on each side
+    assert model.first_line_no == 0
+    assert model.lines == ["title", "1 1 -1.0 -1", "     imp:n=1", "2 0 1 -2 &"]
+    assert model.selected_text == "" and model.current_line_no == 2
+    assert model.current_line == "     imp:n=1"
+
+
+@pytest.mark.parametrize("line_no, full_entry", [
+    (1, "1 1 -1.0 -1 imp:n=1"),
+    (2, "1 1 -1.0 -1 imp:n=1"),
+    (4, "2 0 1 -2 imp:n=1"),
+    (5, "3 0 2 imp:n=0"),
+])
+def test_full_entry_of_continued_cards(line_model, editor, line_index, line_no, full_entry):
+    editor.select(line_no, 0, 1)
+    assert line_model.ModelOfLine.from_notepad(line_index).full_entry == full_entry
+    # without the line index the card is found by walking the lines of the window
+    assert line_model.ModelOfLine.from_notepad().full_entry == full_entry
+    assert "getLine" not in editor.calls
+
+
+def test_window_is_clipped_at_the_edges_of_the_editor(line_model, editor):
+    editor.select(11, 0, 2)
+    model = line_model.ModelOfLine.from_notepad()
+
+    assert model.first_line_no == 0
+    assert model.line_count == 12
+    assert len(model.lines) == 12
+    assert model.current_line == ""
+    assert model.full_entry == ""
+
+
+def test_lines_past_the_snapshot_are_read_from_the_editor(line_model, editor):
+    model = line_model.ModelOfLine(current_line_no=4, lines=["2 0 1 -2 &", "  imp:n=1"], first_line_no=3, line_count=12)
+
+    assert model.full_entry == "2 0 1 -2 imp:n=1"
+    # the line before the card (is it continued?) and the line after it (end of the card), each read once
+    assert editor.calls == ["getLine", "getLine"]
+    assert model.get_line(2) == "     imp:n=1"
+    assert model.get_line(5) == "3 0 2 imp:n=0"
+    assert len(editor.calls) == 2
+
+    # lines outside of the editor are empty and not read
+    assert model.get_line(-1) == "" and model.get_line(12) == ""
+    assert len(editor.calls) == 2
@@ -0,0 +1,30 @@
+import pytest
+from npp_mcnp_plugin.models.mcnp_input_cards import Material, IsotopeFactory
+
+
+def test_composition_is_packed_and_isotopes_are_shared():
+    material = Material.create_from_input_line("m1 1001.70c 2 8016.70c 1 6000 1")
+    assert list(material.zaids) == [1001, 8016, 6000]
+    assert list(material.fractions) == [2.0, 1.0, 1.0]
+    assert material.libraries == ["70c", None]
+    assert list(material.library_indexes) == [0, 0, 1]
+
+    other = Material.create_from_input_line("m2 1001.70c 2")
+    assert material.isotopes[0] is other.isotopes[0]
+    assert material.isotopes[0] is IsotopeFactory().create_isotope(1001, 2.0, "70c")
+    assert [isotope.name for isotope in material.isotopes] == ["H", "O", "C"]
+
+
+def test_isotopes_setter_and_add_isotope():
+    factory = IsotopeFactory()
+    material = Material(1, None, [factory.create_isotope(1001, 2.0, "70c")])
+    material.add_isotope(factory.create_isotope(8016, 1.0, "80c"))
+    assert [(isotope.zzzaaa, isotope.abundance, isotope.library) for isotope in material.isotopes] == \
+        [(1001, 2.0, "70c"), (8016, 1.0, "80c")]
+
+
+def test_str_lists_largest_fractions():
+    material = Material.create_from_input_line("m1 1001 1 1002 6 2004 3 6012 5 7014 2 8016 4")
+    lines = str(material).splitlines()
+    assert lines[1] == "Top 5 Isotopes:"
+    assert len(lines) == 8
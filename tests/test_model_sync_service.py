@@ -0,0 +1,74 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.services.model_sync_service import ModelSyncService
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2
+     imp:n=1
+3 0 2 imp:n=0
+
+1 so 10
+2 so 20
+
+m1 1001 2 8016 1
+f4:n 1
+"""
+
+
+@pytest.fixture
+def editor_and_service(tmpdir, editor):
+    input_file = tmpdir.join("input.i")
+    input_file.write(INPUT)
+    model = ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), ErrorCollection()))
+    return editor, ModelSyncService(model, editor.get_line, editor.get_line_count)
+
+
+def test_edited_continuation_line_updates_whole_card(editor_and_service):
+    editor, service = editor_and_service
+    editor.lines[3] = "     -3 imp:n=1\n"
+    changed_ids = service.after_modification(3, 3)
+
+    assert changed_ids == {"cells": set([2])}
+    assert service.mcnp_input.cells[2].surfaces == [1, 2, 3]
+
+
+def test_renamed_cell_replaces_old_id(editor_and_service):
+    editor, service = editor_and_service
+    editor.lines[4] = "4 0 2 imp:n=0\n"
+    service.after_modification(4, 4)
+
+    assert sorted(service.mcnp_input.cells.keys()) == [1, 2, 4]
+
+
+def test_inserted_surface_shifts_following_blocks(editor_and_service):
+    editor, service = editor_and_service
+    editor.lines.insert(8, "3 so 30\n")
+    service.after_modification(7, 8, lines_added=1)
+
+    assert sorted(service.mcnp_input.surfaces.keys()) == [1, 2, 3]
+    assert service.mcnp_input.return_block_type(10) == "physics"
+
+    editor.lines[10] = "m2 1001 2 8016 1\n"
+    service.after_modification(10, 10)
+
+    assert sorted(service.mcnp_input.materials.keys()) == [0, 2]
+
+
+def test_deleted_cards_are_removed_without_before_notification(editor_and_service):
+    editor, service = editor_and_service
+    # lines of cell 3 and of the blank line after it
+    del editor.lines[4:6]
+    changed_ids = service.after_modification(4, 4, lines_added=-2)
+
+    assert changed_ids["cells"] == set([3])
+    assert sorted(service.mcnp_input.cells.keys()) == [1, 2]
+    assert service.mcnp_input.return_block_type(4) == "surfaces"
+
+    # deleted continuation line, the card is kept
+    del editor.lines[3]
+    changed_ids = service.after_modification(2, 2, lines_added=-1)
+    assert changed_ids == {"cells": set([2])}
+    assert service.mcnp_input.cells[2].surfaces == [1, 2]
@@ -0,0 +1,80 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.utils.parse_cache import ParseCache
+from npp_mcnp_plugin.utils.include_resolver import INCLUDE_CACHE
+from npp_mcnp_plugin.models.error import ErrorCollection, ErrorModel
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 imp:n=0
+
+1 so 10
+read file=surfaces.i
+
+m1 1001 2 8016 1
+f4:n 1
+"""
+
+
+@pytest.fixture
+def parsed(tmpdir):
+    INCLUDE_CACHE.clear()
+    tmpdir.join("surfaces.i").write("2 so 20\n")
+    error_collection = ErrorCollection()
+    parser = FileParser.from_buffer(INPUT, error_collection, filename=str(tmpdir.join("input.i")), lazy=True)
+    model = ModelMcnpInput.from_file_parser(parser)
+    error_collection.add_error(ErrorModel("1 so 10", "Some validation error", "SURFACE_INVALID"))
+    return parser, model, error_collection
+
+
+def test_stored_model_is_loaded(tmpdir, parsed):
+    parser, model, error_collection = parsed
+    cache = ParseCache(str(tmpdir.join("cache")))
+    key = cache.content_hash(INPUT)
+    assert cache.load(key) is None
+
+    assert cache.store(key, model, error_collection, parser.get_included_files())
+    loaded_model, loaded_errors = cache.load(key)
+
+    assert sorted(loaded_model.cells) == [1, 2]
+    assert sorted(loaded_model.surfaces) == [1, 2]
+    assert loaded_model.cells[1].material_id == model.cells[1].material_id
+    assert loaded_model.materials[0] == "Void"
+    assert sorted(loaded_model.tallies) == [4]
+    assert loaded_model.get_card_file("surfaces", 2) == str(tmpdir.join("surfaces.i"))
+    assert [(error.line, error.error_code) for error in loaded_errors.get_all_errors()] == [("1 so 10", "SURFACE_INVALID")]
+
+
+def test_key_depends_on_text_and_plugin_version(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    assert cache.content_hash(INPUT) == cache.content_hash(INPUT)
+    assert cache.content_hash(INPUT) != cache.content_hash(INPUT + "c\n")
+    assert cache.content_hash(INPUT) != ParseCache(str(tmpdir), plugin_version="0.0").content_hash(INPUT)
+
+
+def test_key_depends_on_the_directory_of_the_file(tmpdir):
+    # the READ cards of the same text resolve to the files of another directory
+    cache = ParseCache(str(tmpdir))
+    first, second = str(tmpdir.join("a", "deck.i")), str(tmpdir.join("b", "deck.i"))
+    assert cache.content_hash(INPUT, first) == cache.content_hash(INPUT, first)
+    assert cache.content_hash(INPUT, first) != cache.content_hash(INPUT, second)
+
+
+def test_changed_included_file_invalidates_entry(tmpdir, parsed):
+    parser, model, error_collection = parsed
+    cache = ParseCache(str(tmpdir.join("cache")))
+    key = cache.content_hash(INPUT)
+    cache.store(key, model, error_collection, parser.get_included_files())
+
+    tmpdir.join("surfaces.i").write("2 so 25\nc longer\n")
+    assert cache.load(key) is None
+
+
+def test_old_entries_are_pruned(tmpdir, parsed):
+    parser, model, error_collection = parsed
+    cache = ParseCache(str(tmpdir.join("cache")), max_entries=2)
+    keys = [cache.content_hash(INPUT + "c {}\n".format(i)) for i in range(3)]
+    for key in keys:
+        cache.store(key, model, error_collection)
+    assert len(tmpdir.join("cache").listdir()) == 2
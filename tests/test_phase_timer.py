@@ -0,0 +1,12 @@
+from npp_mcnp_plugin.utils.general_utils import PhaseTimer
+
+
+def test_phases_are_timed_from_the_previous_mark():
+    ticks = iter([1.0, 1.0125, 1.015, 1.5])
+    timer = PhaseTimer(start=1.0, clock=lambda: next(ticks))
+    timer.mark("imports")
+    timer.mark("views")
+    timer.mark("callbacks")
+    assert [phase for phase, __ in timer.phases] == ["imports", "views", "callbacks"]
+    assert timer.summary() == "imports 0.0 ms, views 12.5 ms, callbacks 2.5 ms, total 15.0 ms"
+    assert timer.elapsed() == 0.5
@@ -0,0 +1,115 @@
+import pytest
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput, HandlerMcnpInput
+from npp_mcnp_plugin.models.reference_index import _tally_ids
+from npp_mcnp_plugin.models.mcnp_input_cards import Cell, Surface, Material
+from npp_mcnp_plugin.services.model_sync_service import ModelSyncService
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 #1 imp:n=1
+3 1 -1.0 2 imp:n=0
+
+1 so 10
+2 5 so 20
+
+m1 1001 2 8016 1
+tr5 0 0 1
+f4:n 1 3
+f2:n 2
+"""
+
+
+@pytest.fixture
+def model(tmpdir):
+    input_file = tmpdir.join("input.i")
+    input_file.write(INPUT)
+    return ModelMcnpInput.from_file_parser(FileParser.from_file(str(input_file), ErrorCollection(), lazy=True))
+
+
+def test_reverse_references(model):
+    references = model.references
+    assert references.cells_using_surface(1) == [1, 2]
+    assert references.cells_using_surface(2) == [2, 3]
+    assert references.cells_referencing_cell(1) == [2]
+    assert references.cells_using_material(1) == [1, 3]
+    assert references.surfaces_using_transformation(5) == [2]
+    assert references.tallies_of_cell(3) == [4]
+    assert references.tallies_of_surface(2) == [2]
+    assert references.cells_referencing_cell(3) == []
+
+
+def test_macrobody_facets_reference_the_macrobody():
+    class Tally(object):
+        entries = ["10.1", "10.2", "(3", "20.4)", "5<6[0", "1", "0]", "u=7"]
+
+    assert _tally_ids(Tally()) == set([10, 3, 20, 5, 6])
+
+
+def test_added_cell_updates_references(model):
+    model.references
+    model.add_cell(Cell(4, 1, -1.0, [2], [3]))
+    assert model.references.cells_using_material(1) == [1, 3, 4]
+    assert model.references.cells_referencing_cell(3) == [4]
+
+
+def test_handler_replaces_surface_and_material(model):
+    handler = HandlerMcnpInput(model)
+    handler.replace_surface(1, Surface(7, "so", "15", None))
+    assert model.cells[1].surfaces == [7]
+    assert sorted(model.surfaces) == [2, 7]
+    assert model.references.cells_using_surface(1) == []
+    assert model.references.cells_using_surface(7) == [1, 2]
+
+    handler.replace_material_in_cell_block(1, Material(2, None))
+    assert model.cells[1].material_id == 2
+    assert model.references.cells_using_material(1) == []
+    assert model.references.cells_using_material(2) == [1, 3]
+
+
+def test_handler_leaves_the_shared_cards_unchanged(model):
+    # built before the copy, the copy shares them
+    cell, surface = model.cells[1], model.surfaces[1]
+    model.surfaces[2]
+    copied = model.copy()
+    handler = HandlerMcnpInput(copied)
+    handler.replace_surface(1, Surface(7, "so", "15", None))
+    handler.replace_material_in_cell_block(1, Material(2, None))
+    handler.replace_surface_parameters_in_surface_block(2, Surface(2, "so", "25", None))
+
+    assert copied.cells[1].surfaces == [7] and copied.cells[1].material_id == 2
+    assert copied.surfaces[2].parameters == "25"
+    # the model and the card cache of its parser keep the cards of the text
+    assert model.cells[1] is cell and cell.surfaces == [1] and cell.material_id == 1
+    assert model.surfaces[1] is surface and surface.id == 1
+    assert model.surfaces[2].parameters == "20"
+
+
+def test_live_sync_updates_references(model, editor):
+    model.references
+    service = ModelSyncService(model, editor.get_line, editor.get_line_count)
+    editor.lines[2] = "2 0 1 -2 #3 imp:n=1\n"
+    service.after_modification(2, 2)
+
+    assert model.references.cells_referencing_cell(1) == []
+    assert model.references.cells_referencing_cell(3) == [2]
+
+
+def test_dangling_references_of_the_whole_model():
+    text = INPUT.replace("2 0 1 -2 #1", "2 0 1 -2 #1 #9 trcl=7").replace("3 1 -1.0", "3 4 -1.0").replace(
+        "f4:n 1 3", "f4:n 1 (3 8)<u=6[0 0 1]").replace("f2:n 2", "f2:n 2 12")
+    error_collection = ErrorCollection()
+    model = ModelMcnpInput.from_file_parser(FileParser.from_buffer(text, error_collection, lazy=True))
+    present_ids = lambda component: set(getattr(model, component))
+
+    assert model.references.dangling(present_ids) == {
+        "cell_cells": {2: [9]},
+        "material_cells": {3: [4]},
+        "transformation_cells": {2: [7]},
+        "cell_tallies": {4: [8]},
+        "surface_tallies": {2: [12]},
+    }
+
+    model = ModelMcnpInput.from_file_parser(FileParser.from_buffer(INPUT, ErrorCollection(), lazy=True))
+    assert model.references.dangling(present_ids) == {}
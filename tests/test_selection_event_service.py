@@ -0,0 +1,101 @@
+import time
+from npp_mcnp_plugin.services.selection_event_service import SelectionEventService
+
+
+class Recorder(object):
+    def __init__(self):
+        self.analysed = 0
+        self.notified = []
+
+    def analyze(self, state):
+        self.analysed += 1
+        return {"value": self.analysed, "state": state}
+
+
+def test_repeated_and_memoized_selections_are_not_analysed():
+    recorder = Recorder()
+    service = SelectionEventService(recorder.analyze, recorder.notified.append, run_in_background=False)
+    service.submit((1, 10, 100, 105))
+    service.submit((1, 10, 100, 105))
+    service.submit((1, 11, 120, 122))
+    service.submit((1, 10, 100, 105))
+    assert recorder.analysed == 2
+    assert [result["value"] for result in recorder.notified] == [1, 2, 1]
+
+    # cleared selection, the same text selected again is shown again
+    service.submit(None)
+    service.submit((1, 10, 100, 105))
+    assert recorder.analysed == 2
+    assert len(recorder.notified) == 4
+
+    # new model version
+    service.submit((2, 10, 100, 105))
+    assert recorder.analysed == 3
+
+
+def test_memoized_results_are_bounded():
+    recorder = Recorder()
+    service = SelectionEventService(recorder.analyze, recorder.notified.append, max_memoized=2, run_in_background=False)
+    for line in range(3):
+        service.submit((1, line, 0, 1))
+    assert list(service.memoized) == [(1, 1, 0, 1), (1, 2, 0, 1)]
+
+
+def test_burst_of_events_is_coalesced():
+    recorder = Recorder()
+    service = SelectionEventService(recorder.analyze, recorder.notified.append, quiet_period=0.05)
+    for position in range(50):
+        service.submit((1, position, position, position + 1))
+    deadline = time.time() + 2
+    while not recorder.notified and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert recorder.analysed == 1
+    assert service.last_key == (1, 49, 49, 50)
+
+
+def test_snapshot_is_taken_in_the_calling_thread_for_analysed_keys():
+    import threading
+    recorder = Recorder()
+    snapshot_threads = []
+
+    def snapshot():
+        snapshot_threads.append(threading.current_thread())
+        return "line"
+
+    service = SelectionEventService(recorder.analyze, recorder.notified.append, quiet_period=0.01)
+    service.submit((1, 10, 100, 105), snapshot)
+    deadline = time.time() + 2
+    while not recorder.notified and time.time() < deadline:
+        time.sleep(0.01)
+    # memoized, the editor isn't read again
+    service.submit(None, snapshot)
+    service.submit((1, 10, 100, 105), snapshot)
+
+    assert snapshot_threads == [threading.current_thread()]
+    assert recorder.notified[0]["state"] == "line"
+
+
+def test_same_selection_submitted_during_the_analysis_is_shown():
+    import threading
+    recorder = Recorder()
+    analysing, release = threading.Event(), threading.Event()
+
+    def slow_analyze(state):
+        analysing.set()
+        release.wait(2)
+        return recorder.analyze(state)
+
+    service = SelectionEventService(slow_analyze, recorder.notified.append, quiet_period=0.01)
+    service.submit((1, 10, 100, 105))
+    assert analysing.wait(2)
+    # e.g. an UPDATEUI of a scroll, the selection is unchanged
+    service.submit((1, 10, 100, 105))
+    release.set()
+
+    deadline = time.time() + 2
+    while not recorder.notified and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert [result["value"] for result in recorder.notified] == [1]
+    assert (1, 10, 100, 105) in service.memoized
@@ -0,0 +1,61 @@
+from npp_mcnp_plugin.utils.data_registry import load_data
+from npp_mcnp_plugin.utils.snippet_index import SnippetIndex, get_snippet_index, snippet_keyword, MACROBODY_CATEGORY, CARD_CATEGORY
+from npp_mcnp_plugin.utils.general_utils import find_by_key_and_prefix
+from npp_mcnp_plugin.utils.input_validator import InputValidator
+from npp_mcnp_plugin.models.mcnp_input_cards import Surface
+
+
+def test_macrobodies_match_the_snippet_scan():
+    snippets = load_data("mcnp.tmSnippets.json")
+    index = get_snippet_index()
+    for prefix in ("box", "rpp", "sph", "rcc", "wed", "so", "tr"):
+        assert index.find_body(prefix, MACROBODY_CATEGORY) == find_by_key_and_prefix(prefix, snippets, search_key_string="macrobody")
+    assert index.find_body("RCC", MACROBODY_CATEGORY)[0].startswith("RCC")
+    assert index.find_body("kcode", CARD_CATEGORY)[0].startswith("kcode")
+
+
+def test_keywords_are_completed_from_the_trie():
+    index = get_snippet_index()
+    assert index.complete("phys") == ["phys:e", "phys:h", "phys:n", "phys:p"]
+    assert index.complete("FM") == ["fmesh", "fmult"]
+    assert index.complete("l", limit=2) == ["lca", "lcb"]
+    assert index.complete("zz") == []
+    # macrobodies are surface types, not data card keywords
+    assert index.complete("box") == []
+
+
+def test_snippet_keywords():
+    assert snippet_keyword("PHYS:n") == "phys:n"
+    assert snippet_keyword("FMESHn (rec)") == "fmesh"
+    assert snippet_keyword("SDEF (full)") == "sdef"
+    assert snippet_keyword("RMESH1") == "rmesh1"
+
+
+def test_entries_without_prefix_are_skipped():
+    index = SnippetIndex({"ARB": "Arbitrary Polyhedron", "SPH macrobody": {"prefix": ["SPH"], "body": ["SPH"]}})
+    assert index.find("sph") == {"prefix": ["SPH"], "body": ["SPH"]}
+    assert index.complete("") == []
+
+
+def test_macrobody_surfaces_are_valid():
+    validator = InputValidator()
+    assert validator.validate_surface(Surface(1, "rpp", "0 1 0 1 0 1", "")) == (None, None)
+    assert validator.validate_surface(Surface(2, "xyz", "0 1", ""))[0] == "SURFACE_INVALID_TYPE"
+
+
+class FakeLine(object):
+    def __init__(self, text_till_cursor, continuation=False):
+        self.text_till_cursor_list = text_till_cursor.split()
+        self.last_entry_before_cursor = self.text_till_cursor_list[-1] if self.text_till_cursor_list else None
+        self.is_current_line_continuation_line = continuation
+
+
+def test_physics_block_completes_the_card_keyword():
+    from npp_mcnp_plugin.presenters.autocomplete_presenter import PhysicsBlockAutoCompletePresenter
+
+    def suggestions(text_till_cursor, continuation=False):
+        return PhysicsBlockAutoCompletePresenter(FakeLine(text_till_cursor, continuation), None, None).provide_autocomplete_suggestions()
+
+    assert suggestions("*ph") == {"type": "keyword", "value": "phys:e\nphys:h\nphys:n\nphys:p", "entry_length": 2}
+    assert suggestions("kcode 10") == {}
+    assert suggestions("ph", continuation=True) == {}
@@ -0,0 +1,78 @@
+import pytest
+from npp_mcnp_plugin.models.mcnp_cell_factory import CellFactory, parse_fill
+from npp_mcnp_plugin.models.universe_graph import UniverseGraph
+
+# core (real world) -> assembly lattice 17x17 of pin universes -> pin cells
+CELLS = [
+    "1 0 -1 fill=10 imp:n=1",
+    "2 0 1 imp:n=0",
+    "10 0 -2 lat=1 u=10 fill=0:1 0:1 0:0 20 20 2r imp:n=1",
+    "11 0 -3 lat=1 u=11 fill=-1:1 0:0 0:0 21 11 21 imp:n=1",
+    "20 1 -10.0 -4 u=20 imp:n=1",
+    "21 1 -10.0 -4 u=21 imp:n=1",
+    "30 0 -5 u=30 imp:n=1",
+]
+
+
+def graph_of(lines):
+    cells = dict((cell.id, cell) for cell in (CellFactory.create_from_input_line(line) for line in lines))
+    return UniverseGraph.from_cells(cells)
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("1 0 -1 fill=5 imp:n=1", [(5, 1)]),
+    ("1 0 -1 *fill=5 (30 60 90) imp:n=1", [(5, 1)]),
+    ("1 0 -1 lat=1 fill=-1:1 0:1 0:0 1 2 2r 3 (1) 1 imp:n=1", [(1, 2), (2, 3), (3, 1)]),
+    ("1 0 -1 imp:n=1", None),
+])
+def test_parse_fill(line, expected):
+    assert parse_fill(line) == expected
+
+
+def test_instance_counts_depth_and_top_level_cells():
+    graph = graph_of(CELLS)
+    assert graph.instance_count(10) == 1
+    assert graph.instance_count(20) == 4
+    assert graph.instance_count(21) == 0
+    assert graph.instance_count(30) == 0
+    assert graph.nesting_depth(20) == 2
+    assert graph.nesting_depth(30) is None
+    assert graph.top_level_cells(20) == [1]
+
+
+def test_cyclic_fill_is_reported():
+    graph = graph_of(["1 0 -1 fill=2 imp:n=1", "2 0 -1 u=2 fill=3 imp:n=1", "3 0 -1 u=3 fill=2 imp:n=1"])
+    with pytest.raises(ValueError):
+        graph.instance_count(2)
+
+
+def test_repeated_structures_are_counted_without_expansion():
+    # 5 nested levels of 5x5 lattices: 25**5 ~ 10**7 instances of the innermost universe
+    lines = ["1 0 -1 fill=1 imp:n=1"]
+    for level in range(1, 6):
+        lines.append("1{0} 0 -1 lat=1 u={0} fill=0:4 0:4 0:0 {1} 24r imp:n=1".format(level, level + 1))
+    lines.append("16 1 -1.0 -1 u=6 imp:n=1")
+    graph = graph_of(lines)
+
+    assert graph.instance_count(6) == 25 ** 5
+    assert graph.nesting_depth(6) == 6
+    assert graph.top_level_cells(6) == [1]
+
+
+def test_universes_filled_by_several_paths_are_visited_once():
+    # every universe is filled by two cells of the next outer one: 2**20 paths to the innermost universe
+    lines = ["1 0 -1 fill=1 imp:n=1"]
+    for level in range(1, 21):
+        lines.append("{0}1 0 -1 u={0} fill={1} imp:n=1".format(level, level + 1))
+        lines.append("{0}2 0 1 u={0} fill={1} imp:n=1".format(level, level + 1))
+    graph = graph_of(lines)
+    visits = []
+    for name in ("_count", "_depth", "_top_level"):
+        compute = getattr(graph, name)
+        setattr(graph, name, lambda universe, visiting, compute=compute: visits.append(universe) or compute(universe, visiting))
+
+    assert graph.instance_count(21) == 2 ** 20
+    assert graph.nesting_depth(21) == 21
+    assert graph.top_level_cells(21) == [1]
+    # each query computes every universe of the chain once, the paths are never expanded
+    assert sorted(visits) == sorted(list(range(22)) * 2 + list(range(1, 22)))
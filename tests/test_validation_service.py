@@ -0,0 +1,84 @@
+from npp_mcnp_plugin.utils.file_parser import FileParser
+from npp_mcnp_plugin.utils.input_validator import InputValidator
+from npp_mcnp_plugin.models.error import ErrorCollection
+from npp_mcnp_plugin.models.mcnp_input import ModelMcnpInput
+from npp_mcnp_plugin.services.validation_service import ValidationService
+
+INPUT = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 -2 imp:n=1
+3 0 2 imp:n=0
+
+1 so 10
+2 so 20
+3 xx 30
+
+m1 1001 2 8016 1
+f4:n 1
+"""
+
+
+def validate(service, text):
+    error_collection = ErrorCollection()
+    model = ModelMcnpInput.from_file_parser(FileParser.from_buffer(text, error_collection, lazy=True))
+    checks = service.validate(model, error_collection)
+    return checks, [(error.error_code, error.line) for error in error_collection.get_all_errors() or []]
+
+
+def test_only_changed_cards_are_checked_again():
+    service = ValidationService(InputValidator())
+    checks, errors = validate(service, INPUT)
+    assert checks == 9
+    assert ("SURFACE_INVALID_TYPE", "Surface 3: xx 30 ") in errors
+
+    # the tallies are combined from several cards and created again on every parse
+    checks, cached_errors = validate(service, INPUT)
+    assert checks == 1
+    assert cached_errors == errors
+
+    checks, errors = validate(service, INPUT.replace("3 xx 30", "3 so 30"))
+    assert checks == 2
+    assert "SURFACE_INVALID_TYPE" not in [error_code for error_code, __ in errors]
+
+
+def test_removed_surface_is_reported_in_referencing_cells():
+    service = ValidationService(InputValidator())
+    validate(service, INPUT)
+    checks, errors = validate(service, INPUT.replace("2 so 20\n", ""))
+    # only the tally is checked again, the references are checked by the bulk pass
+    assert checks == 1
+    assert [line for error_code, line in errors if error_code == "CELL_INVALID_SURFACES"] == [
+        "Cell 2: Material ID 0, Surfaces [1, 2], Cells [], Importance {}",
+        "Cell 3: Material ID 0, Surfaces [2], Cells [], Importance {}"]
+
+
+def test_removed_cards_are_dropped_from_the_cache():
+    service = ValidationService(InputValidator())
+    validate(service, INPUT)
+    checks, errors = validate(service, INPUT.replace("f4:n 1\n", ""))
+    assert checks == 0
+    assert ("TALLY_BLOCK_EMPTY", "Tally Block") in errors
+    assert ("tally", 4) not in service.cache
+
+
+def test_card_failing_to_be_created_is_reported_again():
+    service = ValidationService(InputValidator())
+    text = INPUT.replace("m1 1001 2 8016 1", "m1 1001 2 8016")
+    for __ in range(2):
+        checks, errors = validate(service, text)
+        assert [error_code for error_code, __ in errors].count("INVALID_DATA") == 1
+
+
+def test_validation_builds_the_reference_index_of_the_model():
+    service = ValidationService(InputValidator())
+    validate(service, INPUT)
+    # second model: every result is cached, the rules create no card and the references read them
+    model = ModelMcnpInput.from_file_parser(FileParser.from_buffer(INPUT, ErrorCollection(), lazy=True))
+    assert not model.has_references
+    service.validate(model, ErrorCollection())
+
+    assert model.has_references
+    built = model.references
+    expected = ModelMcnpInput.from_file_parser(FileParser.from_buffer(INPUT, ErrorCollection(), lazy=True)).references
+    assert built.maps == expected.maps
+    assert built.cells_using_surface(2) == [2, 3]
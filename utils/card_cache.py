@@ -0,0 +1,56 @@
+import hashlib
+import logging
+
+
+def card_hash(*parts):
+    """
+    Returns the content hash of a logical card built from its parts (card type, merged line, comment...).
+    """
+    text = "\0".join(parts)
+    if not isinstance(text, bytes):
+        text = text.encode("utf-8")
+    return hashlib.md5(text).hexdigest()
+
+
+class CardCache(object):
+    """
+    Keeps the instances created from the logical cards (after the continuation lines are merged) by their content hash.
+
+    A cache built for a re-parse of the same file receives the previous cache,
+    the cards whose text did not change reuse the previous instance instead of being created again.
+    """
+    def __init__(self, previous=None):
+        self.previous_instances = previous.instances if previous is not None else {}
+        self.instances = {}
+        self.reused = 0
+        self.created = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get_or_create(self, card_type, line, comment, create_instance_func, *extra_key_parts):
+        """
+        Returns the instance of the card from the previous parse if its content is unchanged,
+        otherwise creates it with create_instance_func(line, comment).
+
+        Args:
+            card_type (str): card namespace, e.g. "cell" or "material", so equal text in different blocks does not collide.
+            line (str): merged card line.
+            comment (str): comment attached to the card.
+            create_instance_func (function): function creating the instance from the line and comment.
+            extra_key_parts (str): additional text the instance depends on, e.g. options of a tally given on separate cards.
+        """
+        key = card_hash(card_type, line, comment or "", *extra_key_parts)
+        instance = self.previous_instances.get(key)
+        if instance is None:
+            instance = create_instance_func(line, comment)
+            self.created += 1
+        else:
+            self.reused += 1
+
+        if instance is not None:
+            self.instances[key] = instance
+        return instance
+
+    def release_previous(self):
+        """ drops the references to the previous parse once the re-parse is finished """
+        self.logger.info("Cards reused: %d, created: %d", self.reused, self.created)
+        self.previous_instances = {}
@@ -0,0 +1,86 @@
+import re
+
+# Registry of the compiled patterns shared by the parser, the card factories and the editor callbacks.
+PATTERNS = {
+    # card starts in the blocks of the input file
+    "cell_card": re.compile(r'(\d+)\s+(\d+)\s+(\S+)\s+(.*)'),
+    "surface_card": re.compile(r'^\d+'),
+    # "*tr5 ..." -> ("*", "tr", "5"), "+f6 ..." -> ("+", "f", "6"), "mode n" -> ("", "mode", "")
+    "data_card": re.compile(r'([*+]?)([a-z]+)(\d*)'),
+    # "read file=matlib.i noecho" -> "matlib.i", valid in any block
+    "read_card": re.compile(r'read\b.*?\bfile\s*=\s*(\S+)'),
+
+    # card entries
+    "cell_definition": re.compile(r'(\d+)\s+(\d+)\s+(\S+.*)?'),
+    "cell_separators": re.compile(r"[-:()]"),
+    # "fill=-1:1 -1:1 0:0 1 2 2r" -> "-1:1 -1:1 0:0 1 2 2r", "*fill=5 (30 60 90)" -> "5 (30 60 90)"
+    "fill": re.compile(r'(?<![a-z])\*?fill\s*=?\s*(.*)'),
+    "fill_range": re.compile(r'(-?\d+):(-?\d+)$'),
+    "repeat_entry": re.compile(r'(\d*)r$'),
+    "tally": re.compile(r'(\+?f)(\d+)\:?(\S+)?(.*)'),
+    "transformation": re.compile(r'\*?tr(\d+)(.*)'),
+    "material": re.compile(r'm(\d+)(.*)'),
+    "multiple_spaces": re.compile(r' +'),
+    "entry_separators": re.compile(r"[,\s]+"),
+    "number": re.compile(r'\d+'),
+    "non_digit": re.compile(r'[^0-9]'),
+    "letter": re.compile(r'[a-zA-Z]'),
+
+    # entries typed in the cell block
+    "trcl_entry": re.compile(r"trcl=-?\d+"),
+    "cell_complement_entry": re.compile(r"#-?\d+"),
+    "number_entry": re.compile(r"-?\d+$"),
+    "digit_line": re.compile(r'^\s*(\d+)'),
+}
+
+# Card classifier, one alternation with a named group per card kind.
+# The alternatives are tried in order, the first matching one gives the card kind:
+#   surfaces: "1 2 px 3" (with transformation) and "1 px 3"
+#   cells:    "1 2 -3.0 -1", "1 0 -1" and "2 like 1 but"
+#   physics:  "kcode ..." and "mode ..."
+CARD_CLASSIFIER = re.compile(
+    r'(?P<surface_with_transformation>\d+\s+\d+\s+[a-zA-Z]+\s+[-]?.)'
+    r'|(?P<surface>\d+\s+(?!like\b)[a-zA-Z]+\s+[-]?.)'
+    r'|(?P<cell>\d+\s+\d+\s+[-]?\d[\S+]?.*\s+\S+)'
+    r'|(?P<void_cell>\d+\s+0\s+[\S+]?.*\s+\S+)'
+    r'|(?P<like_but_cell>\d+\s+like\s+\d+\s+but)'
+    r'|(?P<kcode>kcode\s+.*)'
+    r'|(?P<mode>mode\s+.*)'
+)
+
+CARD_KIND_BLOCK_TYPES = {
+    "surface_with_transformation": "surfaces",
+    "surface": "surfaces",
+    "cell": "cells",
+    "void_cell": "cells",
+    "like_but_cell": "cells",
+    "kcode": "physics",
+    "mode": "physics",
+}
+
+_compiled_patterns = {}
+
+
+def compile_pattern(regex_pattern):
+    """
+    Returns the compiled regex pattern, the patterns given as strings are compiled once and kept.
+    """
+    if hasattr(regex_pattern, "match"):
+        return regex_pattern
+    compiled = _compiled_patterns.get(regex_pattern)
+    if compiled is None:
+        compiled = _compiled_patterns[regex_pattern] = re.compile(regex_pattern)
+    return compiled
+
+
+def classify_card(full_mcnp_input_line):
+    """
+    Classifies the full MCNP card with a single match.
+
+    Returns:
+        tuple: (block type, card kind), (None, None) if the card is not recognized.
+    """
+    match = CARD_CLASSIFIER.match(full_mcnp_input_line)
+    if not match:
+        return None, None
+    return CARD_KIND_BLOCK_TYPES[match.lastgroup], match.lastgroup
@@ -0,0 +1,211 @@
+import re
+import logging
+
+try:
+    from npp_mcnp_plugin.models.mcnp_input_cards import Tally, Transformation, Material
+    from npp_mcnp_plugin.models.error import ErrorModel
+    from npp_mcnp_plugin.utils.string_utils import is_comment_line
+    from npp_mcnp_plugin.utils.card_cache import CardCache
+    from npp_mcnp_plugin.utils.card_patterns import PATTERNS
+except ImportError:
+    from models.mcnp_input_cards import Tally, Transformation, Material
+    from models.error import ErrorModel
+    from utils.string_utils import is_comment_line
+    from utils.card_cache import CardCache
+    from utils.card_patterns import PATTERNS
+
+logger = logging.getLogger(__name__)
+
+# Splits the start of a data card into modifier, mnemonic and card number:
+#   "*tr5 ..."  -> ("*", "tr", "5")
+#   "+f6 ..."   -> ("+", "f", "6")
+#   "m60 ..."   -> ("", "m", "60")
+#   "mode n"    -> ("", "mode", "")
+DATA_CARD_PATTERN = PATTERNS["data_card"]
+
+
+class DataCard(object):
+    """
+    Data card tokenized once before it is handed over to the registered handler.
+    """
+    def __init__(self, line, modifier, mnemonic, number):
+        self.line = line
+        self.modifier = modifier
+        self.mnemonic = mnemonic
+        self.number = number
+
+    @property
+    def entries(self):
+        """ entries of the card after the card name """
+        return self.line.split()[1:]
+
+    @classmethod
+    def from_line(cls, line):
+        match = DATA_CARD_PATTERN.match(line)
+        if not match:
+            return None
+        return cls(line, match.group(1), match.group(2), match.group(3))
+
+
+# mnemonic -> handler(data, card, comment, card_cache)
+DATA_CARD_HANDLERS = {}
+
+
+def register_data_card(*mnemonics):
+    """
+    Decorator registering a handler for the given data card mnemonics.
+    """
+    def decorator(handler):
+        for mnemonic in mnemonics:
+            DATA_CARD_HANDLERS[mnemonic] = handler
+        return handler
+    return decorator
+
+
+def new_data_block(lazy=False):
+    return {
+        "transformations": {},
+        "materials": {},
+        # lazy dispatch keeps only the line and comment of the materials, see LazyCardDict
+        "material_sources": {} if lazy else None,
+        "tallies": {},
+        "physics": {},
+        "tally_cards": [],
+        "tally_options": {},
+    }
+
+
+@register_data_card("tr")
+def handle_transformation(data, card, comment, card_cache):
+    transformation = card_cache.get_or_create("transformation", card.line, comment, Transformation.create_from_input_line)
+    data["transformations"][transformation.id] = transformation
+    return transformation
+
+
+@register_data_card("m")
+def handle_material(data, card, comment, card_cache):
+    if not card.number:
+        return None
+    if data["material_sources"] is not None:
+        data["material_sources"][int(card.number)] = (card.line, comment)
+        return card.line
+    material = card_cache.get_or_create("material", card.line, comment, Material.create_from_input_line)
+    data["materials"][material.id] = material
+    return material
+
+
+@register_data_card("f")
+def handle_tally(data, card, comment, card_cache):
+    """
+    Tallies are created once the whole block is dispatched as their options can follow the tally card.
+    """
+    data["tally_cards"].append((card, comment))
+    return card.line
+
+
+@register_data_card("e", "fc", "fm")
+def handle_tally_option(data, card, comment, card_cache):
+    """
+    Tally options can be placed before or after the tally card,
+    they are attached to the tallies once the whole block is dispatched.
+    """
+    tally_id = int(card.number) if card.number else 0
+    if card.mnemonic == "fc":
+        value = card.line.split(None, 1)[1] if len(card.line.split(None, 1)) > 1 else ""
+    else:
+        value = card.entries
+    data["tally_options"].setdefault(tally_id, {})[card.mnemonic] = value
+    return value
+
+
+@register_data_card("kcode", "sdef")
+def handle_source(data, card, comment, card_cache):
+    data["physics"][card.mnemonic] = card.line
+    return card.line
+
+
+@register_data_card("mode")
+def handle_mode(data, card, comment, card_cache):
+    # drop mode and split line according to spaces and commas
+    mode_particles = " ".join(PATTERNS["entry_separators"].split(card.line[len("mode"):].strip()))
+    data["physics"]["mode"] = mode_particles
+    return mode_particles
+
+
+@register_data_card("nps")
+def handle_nps(data, card, comment, card_cache):
+    nps = int(float(card.entries[0]))
+    data["physics"]["nps"] = nps
+    return nps
+
+
+def create_tallies(data, error_collection, card_cache):
+    """
+    Creates the tallies and attaches the collected e, fc and fm options to them.
+    e0 sets the default energy bins of the tallies without their own e card.
+    The options are part of the cache key, so a tally is reused only if its options are unchanged too.
+    """
+    default_options = data["tally_options"].get(0, {})
+    for card, comment in data["tally_cards"]:
+        options = data["tally_options"].get(int(card.number) if card.number else None, {})
+
+        def create_tally(line, comment):
+            tally = Tally.create_from_input_line(line, comment)
+            if tally is None:
+                return None
+            if "e" in options or "e" in default_options:
+                tally.add_energy_bins(options.get("e", default_options.get("e")))
+            if "fc" in options:
+                tally.add_comment(options["fc"])
+            if "fm" in options:
+                tally.add_multiplier(options["fm"])
+            return tally
+
+        try:
+            tally = card_cache.get_or_create("tally", card.line, comment, create_tally,
+                                             repr(sorted(options.items())), repr(default_options.get("e")))
+            if tally:
+                logger.debug("Created instance: %s", tally)
+                data["tallies"][tally.id] = tally
+        except Exception as e:
+            logger.error("Error while processing line '%s': %s", card.line, e)
+            error_collection.add_error(ErrorModel(card.line, e, "INVALID_DATA"))
+
+
+def dispatch_data_block(block, error_collection, card_cache=None, lazy=False):
+    """
+    Parses the data (physics) block in a single pass.
+
+    Every card is tokenized once and routed by its mnemonic to the registered handler.
+    Errors are captured per card, so one malformed card does not abort the rest of the block.
+
+    Args:
+        block (list): merged lines of the data block.
+        error_collection (ErrorCollection): collects the errors of the failed cards.
+        card_cache (CardCache): reuses the instances of the cards unchanged since the previous parse.
+        lazy (bool): keep only the sources of the materials instead of creating them.
+
+    Returns:
+        dict: transformations, materials, tallies and physics settings parsed from the block.
+    """
+    card_cache = card_cache if card_cache is not None else CardCache()
+    data = new_data_block(lazy)
+    comment = ""
+    for line in block:
+        if is_comment_line(line):
+            comment += " " + PATTERNS["multiple_spaces"].sub(' ', line.lstrip("c"))
+            continue
+
+        card = DataCard.from_line(line)
+        handler = DATA_CARD_HANDLERS.get(card.mnemonic) if card else None
+        if handler is not None:
+            try:
+                instance = handler(data, card, comment, card_cache)
+                logger.debug("Created instance: %s", instance)
+            except Exception as e:
+                logger.error("Error while processing line '%s': %s", line, e)
+                error_collection.add_error(ErrorModel(line, e, "INVALID_DATA"))
+        comment = ""
+
+    create_tallies(data, error_collection, card_cache)
+    return data
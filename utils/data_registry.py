@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import marshal
+import logging
+import threading
+
+try:
+    from npp_mcnp_plugin.utils.general_utils import file_stamp
+except ImportError:
+    from utils.general_utils import file_stamp
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+# the plugin directory may not be writable, the compiled data is kept next to the parse cache
+DEFAULT_COMPILED_DIR = os.path.join(os.path.expanduser("~"), ".npp_mcnp_plugin", "data_cache")
+# the marshal format depends on the interpreter, a file written by another python version is compiled again
+COMPILED_FORMAT = "{}.{}:{}".format(sys.version_info[0], sys.version_info[1], marshal.version)
+
+
+class DataRegistry(object):
+    """
+    The datasets of the data directory (surface types, snippets, element names, ...), shared by the whole plugin.
+
+    A dataset is loaded on first use and kept, so it is decoded once per session whichever module asks for it.
+    The JSON is compiled to marshal in the compiled directory, the compiled file is read instead of the JSON
+    as long as the stamp of the JSON file (modification time and size) it was compiled from is unchanged.
+    """
+    def __init__(self, data_dir=DATA_DIR, compiled_dir=DEFAULT_COMPILED_DIR):
+        self.data_dir = data_dir
+        self.compiled_dir = compiled_dir
+        self.datasets = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get(self, filename):
+        """ returns the dataset of the data file, e.g. get("surface_info.json") """
+        dataset = self.datasets.get(filename)
+        if dataset is None:
+            with self._lock:
+                if filename not in self.datasets:
+                    self.datasets[filename] = self._load(filename)
+                dataset = self.datasets[filename]
+        return dataset
+
+    def _compiled_path(self, filename):
+        return os.path.join(self.compiled_dir, filename + ".marshal")
+
+    def _load(self, filename):
+        json_path = os.path.join(self.data_dir, filename)
+        stamp = list(file_stamp(json_path))
+        compiled_path = self._compiled_path(filename)
+
+        dataset = self._load_compiled(compiled_path, stamp)
+        if dataset is not None:
+            return dataset
+
+        self.logger.info("Compiling data file %s", filename)
+        with open(json_path, 'r') as json_file:
+            dataset = json.load(json_file)
+        self._store_compiled(compiled_path, stamp, dataset)
+        return dataset
+
+    def _load_compiled(self, compiled_path, stamp):
+        if not os.path.exists(compiled_path):
+            return None
+        try:
+            with open(compiled_path, "rb") as compiled_file:
+                compiled_format, compiled_stamp, dataset = marshal.load(compiled_file)
+        except Exception as e:
+            self.logger.warning("Dropping unreadable compiled data %s: %s", compiled_path, e)
+            return None
+        if compiled_format != COMPILED_FORMAT or list(compiled_stamp) != stamp:
+            return None
+        return dataset
+
+    def _store_compiled(self, compiled_path, stamp, dataset):
+        """ written to a temporary file and renamed, so another editor never reads a partial file """
+        temporary_path = "{}.{}.tmp".format(compiled_path, os.getpid())
+        try:
+            if not os.path.isdir(self.compiled_dir):
+                os.makedirs(self.compiled_dir)
+            with open(temporary_path, "wb") as compiled_file:
+                marshal.dump((COMPILED_FORMAT, stamp, dataset), compiled_file)
+            # os.rename doesn't replace an existing file on Windows
+            self._remove(compiled_path)
+            os.rename(temporary_path, compiled_path)
+        except Exception as e:
+            self.logger.warning("Could not store compiled data %s: %s", compiled_path, e)
+            self._remove(temporary_path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self.datasets.clear()
+
+
+# registry of the plugin
+DATA = DataRegistry()
+
+
+def load_data(filename):
+    """ returns the shared dataset of the data file, loaded on first use """
+    return DATA.get(filename)
@@ -1,16 +1,28 @@
 import re
 import logging
+from itertools import islice
 
 
-from npp_mcnp_plugin.models.mcnp_input_cards import Surface, Tally, Transformation, Material
+from npp_mcnp_plugin.models.mcnp_input_cards import Surface, Material
 from npp_mcnp_plugin.models.mcnp_cell_factory import CellFactory
 from npp_mcnp_plugin.models.error import  ErrorModel
+from npp_mcnp_plugin.models.lazy_card_dict import LazyCardDict
+from npp_mcnp_plugin.models.line_index import LineIndex
 from npp_mcnp_plugin.utils.string_utils import is_comment_line, is_match_at_start
+from npp_mcnp_plugin.utils.data_card_dispatcher import dispatch_data_block
+from npp_mcnp_plugin.utils.card_cache import CardCache
+from npp_mcnp_plugin.utils.card_patterns import PATTERNS
+from npp_mcnp_plugin.utils.include_resolver import resolve_includes
+
+# a line of the text with its line end, the last line may have none
+LINE_PATTERN = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+")
 
 
 class FileParser(object):
-    def __init__(self, filename, error_collection):
+    def __init__(self, filename, error_collection, card_cache=None, lazy=False):
         self.filename = filename
+        # lazy parser keeps the source of the cells, surfaces and materials and creates them on first access
+        self.lazy = lazy
 
         self.error_collection = error_collection
         self.lines = None
@@ -18,18 +30,26 @@ class FileParser(object):
         self.has_header = False
         self.block = {}
         self.block_locations = {}
+        self.data_block = None
+        # instances of the parsed cards by content hash, reused by the next parse of the file
+        self.card_cache = card_cache if card_cache is not None else CardCache()
+        # files included with READ cards, resolved on first access
+        self.included_files = None
+        # line to block and card index, built on first access
+        self.line_index = None
         self.title  = ""
         self.logger = logging.getLogger(self.__class__.__name__)
          
     def set_header_flag(self):
         # Determine if we have a header block
-        self.has_header = self.lines[0].startswith("message")
+        self.has_header = bool(self.lines) and self.lines[0].startswith("message")
 
     def set_block_locations(self):
         """
         Finds and sets the start and end lines of each block of data in the file.
 
         This method identifies the indices of empty lines in the file, which are used to determine the boundaries of different blocks of data (cells, surfaces, and physics). It then sets the start and end lines for each block in the `block_locations` attribute. If a header is present, it adjusts the indices accordingly.
+        The blocks missing in a deck with fewer blank separators (e.g. while it is being written) are empty and placed at the end of the file.
 
         Returns:
             None
@@ -43,6 +63,9 @@ class FileParser(object):
             if line.strip() == "":
                 block_start_indices.append(i)
 
+        missing_separators = (3 if self.has_header else 2) - len(block_start_indices)
+        block_start_indices.extend([len(self.lines)] * max(0, missing_separators))
+
         if self.has_header:
             self.parse_header(block_start_indices[0])
             block_start_indices[0] += offset  # adding offset as this is an empty line
@@ -54,6 +77,19 @@ class FileParser(object):
         self.block_locations['physics'] = {'start': block_start_indices[2] + offset, 'end': block_start_indices[3] + offset if len(block_start_indices) > 3 else len(self.lines)}
                 
         return 
+    def iter_block_lines(self, block_type):
+        """ returns the raw lines of the block """
+        location = self.block_locations[block_type]
+        return islice(self.lines, location['start'], location['end'])
+
+    def get_line_index(self):
+        """
+        Returns the LineIndex of the parsed input, mapping every line to its block and card.
+        """
+        if self.line_index is None:
+            self.line_index = LineIndex.from_blocks(self.block_locations, self.iter_block_lines)
+        return self.line_index
+
     def parse_header(self, line_no):
         self.message_block = self.lines[:line_no]
 
@@ -61,7 +97,7 @@ class FileParser(object):
         self.title = self.lines[self.block_locations['cells']['start']-1]
     def parse_blocks(self):
         for key in ['cells','surfaces', 'physics']:
-            self.block[key] =self.format_blocks(self.lines[self.block_locations[key]['start']:self.block_locations[key]['end']])
+            self.block[key] =self.format_blocks(self.iter_block_lines(key))
   
 
     def parse(self):
@@ -72,6 +108,7 @@ class FileParser(object):
         """
         self.parse_blocks()
         self.parse_title()
+        self.data_block = None
 
         self.logger.info("Cells block: %d\nSurfaces block: %d\nPhysics block: %d\n",
             len(self.block["cells"]), len(self.block["surfaces"]), len(self.block["physics"])
@@ -88,9 +125,19 @@ class FileParser(object):
 
         If accidenally the line is empty we skip it.
         """
+        return list(self.iter_formatted_block(block))
+
+    def iter_formatted_block(self, block):
+        """
+        Generator version of format_blocks, yields the merged lines one by one.
+        Only the last two merged lines can still change (continuation line or comment insertion),
+        so only they are held back and the block can be formatted while it is being read.
+        """
         merged_block = []
         comment = ""
         for  line in block:
+            while len(merged_block) > 2:
+                yield merged_block.pop(0)
             
             line = line.rstrip('\n')
             if line.strip() == "":
@@ -114,7 +161,8 @@ class FileParser(object):
                 self._add_new_line(merged_block, line, comment)
                 comment = ""
 
-        return merged_block
+        for line in merged_block:
+            yield line
     
     def _remove_leading_spaces(self, line):
         """
@@ -139,12 +187,14 @@ class FileParser(object):
         if comment:
             merged_block.insert(-2, "c " + comment.replace("--", "").replace("==", "").replace("||", "").strip())    
 
-    def _parse_block(self, block, regex_pattern, create_instance_func):
+    def _parse_block(self, block, regex_pattern, create_instance_func, card_type):
         """
         Generic method to parse a block of lines based on a regex pattern and create instances using a provided function.
         Captures instance errors and passes them to the error collector
+        Cards unchanged since the previous parse reuse their instance from the card cache.
 
         Args:
+            card_type (str): the type of the card used as the card cache namespace.
             regex_pattern (str): The regex pattern to match lines.
             create_instance_func (function): The function to create an instance from a line and comment.
 
@@ -152,23 +202,15 @@ class FileParser(object):
             dict: A dictionary of parsed instances indexed by their ID.
         """
         parsed_items = {}
-        comment = ""
+        line = None
         try:
-            for line in block:
-                if is_match_at_start(line, regex_pattern=regex_pattern):
-
-                    # returns instance and error message if any during the instance creation
-                    instance = create_instance_func(line, comment)
-                    
-                    if instance:
-                        self.logger.debug("Created instance: %s", instance)
-                        parsed_items[instance.id] = instance
-                    comment = ""
-
-                elif is_comment_line(line):
-                    comment += " " + re.sub(' +', ' ', line.lstrip("c"))
-                else:
-                    comment = ""
+            for line, comment in self._iter_cards(block, regex_pattern):
+                # returns instance and error message if any during the instance creation
+                instance = self.card_cache.get_or_create(card_type, line, comment, create_instance_func)
+                
+                if instance:
+                    self.logger.debug("Created instance: %s", instance)
+                    parsed_items[instance.id] = instance
                     
         except Exception as e:
                 # Catch any exception, log it, and add it to the error collection
@@ -179,55 +221,118 @@ class FileParser(object):
                 )
         return parsed_items
 
+    def _iter_cards(self, block, regex_pattern):
+        """
+        Yields the lines matching the regex pattern together with the comment lines collected above them.
+        """
+        comment = ""
+        for line in block:
+            if is_match_at_start(line, regex_pattern=regex_pattern):
+                yield line, comment
+                comment = ""
+            elif is_comment_line(line):
+                comment += " " + PATTERNS["multiple_spaces"].sub(' ', line.lstrip("c"))
+            else:
+                comment = ""
+
+    def _collect_card_sources(self, block, regex_pattern, create_instance_func):
+        """
+        Lazy counterpart of _parse_block, only scans the card ids and keeps the line and comment of each card.
+
+        Returns:
+            LazyCardDict: cards indexed by their ID, created on first access.
+        """
+        sources = {}
+        for line, comment in self._iter_cards(block, regex_pattern):
+            card_id = line.split()[0]
+            if not card_id.isdigit():
+                self.error_collection.add_error(ErrorModel(line, "Card id {} is not a valid integer".format(card_id), "INVALID_DATA"))
+                continue
+            sources[int(card_id)] = (line, comment)
+        return LazyCardDict(sources, create_instance_func, self.error_collection)
+
+    def parse_data_block(self):
+        """
+        Dispatches every card of the physics block in a single pass and caches the result,
+        the transformation, material, tally and physics getters share it.
+        """
+        if self.data_block is None:
+            self.logger.debug("Dispatching physics block")
+            self.data_block = dispatch_data_block(self.block["physics"], self.error_collection, self.card_cache, lazy=self.lazy)
+        return self.data_block
+
+    def get_included_files(self):
+        """
+        Parses the files included with READ cards, see include_resolver.resolve_includes.
+        The errors of the included files are added to the error collection.
+        """
+        if self.included_files is None:
+            self.included_files = resolve_includes(self, FileParser)
+            for included_file in self.included_files:
+                for error in included_file.errors:
+                    self.error_collection.add_error(error)
+        return self.included_files
+
+    def _merge_included(self, items, component):
+        """
+        Adds the cards of the included files to the cards of the input, the cards of the input take precedence.
+        """
+        for included_file in self.get_included_files():
+            for item_id, item in included_file.components.get(component, {}).items():
+                if item_id not in items:
+                    items[item_id] = item
+                elif items.get(item_id) is not item:
+                    self.logger.warning("%s %s of included file %s is already defined", component, item_id, included_file.path)
+        return items
+
+    def get_card_files(self):
+        """
+        Returns the file of every card included with a READ card, {component: {id: path}}.
+        """
+        card_files = {}
+        for included_file in self.get_included_files():
+            for component, items in included_file.components.items():
+                for item_id in items:
+                    card_files.setdefault(component, {}).setdefault(item_id, included_file.path)
+        return card_files
+
     def get_transformations(self):
-        self.logger.debug("Parsing transformations")
-        return self._parse_block(self.block["physics"],
-            regex_pattern="\*?tr\d",
-            create_instance_func=Transformation.create_from_input_line
-        )
+        return self._merge_included(self.parse_data_block()["transformations"], "transformations")
 
     def get_materials(self):
-        self.logger.debug("Parsing materials")
-        return self._parse_block(self.block["physics"],
-            regex_pattern='m(\d+)(.*)',
-            create_instance_func=Material.create_from_input_line,
-        )
+        if self.lazy:
+            materials = LazyCardDict(self.parse_data_block()["material_sources"], Material.create_from_input_line, self.error_collection)
+        else:
+            materials = self.parse_data_block()["materials"]
+        return self._merge_included(materials, "materials")
 
     def get_tallies(self):
-        self.logger.debug("Parsing tallies")
-        return self._parse_block(self.block["physics"],
-            regex_pattern='^(\+?f)(\d+)\:?',
-            create_instance_func=Tally.create_from_input_line,
-        )
+        return self._merge_included(self.parse_data_block()["tallies"], "tallies")
+
     def get_surfaces(self):
         self.logger.debug("Parsing surfaces")
-        return self._parse_block(self.block["surfaces"],
-            regex_pattern='^\d+',
-            create_instance_func=Surface.create_from_input_line,
-        )
+        if self.lazy:
+            surfaces = self._collect_card_sources(self.block["surfaces"], PATTERNS["surface_card"], Surface.create_from_input_line)
+        else:
+            surfaces = self._parse_block(self.block["surfaces"],
+                regex_pattern=PATTERNS["surface_card"],
+                create_instance_func=Surface.create_from_input_line,
+                card_type="surface",
+            )
+        return self._merge_included(surfaces, "surfaces")
     def get_cells(self):
         self.logger.debug("Parsing cells")
-        return self._parse_block(self.block["cells"],
-            regex_pattern='(\d+)\s+(\d+)\s+(\S+)\s+(.*)',
-            create_instance_func=CellFactory.create_from_input_line,
-        )    
+        if self.lazy:
+            cells = self._collect_card_sources(self.block["cells"], PATTERNS["cell_card"], CellFactory.create_from_input_line)
+        else:
+            cells = self._parse_block(self.block["cells"],
+                regex_pattern=PATTERNS["cell_card"],
+                create_instance_func=CellFactory.create_from_input_line,
+                card_type="cell",
+            )
+        return self._merge_included(cells, "cells")
     def get_physics(self):
-        information_dict = {}
-        for line in self.block["physics"]:
-            if line.startswith("kcode"):
-                # parse source object
-                information_dict['kcode'] = line
-            elif line.startswith("mode"):
-                # parse mode
-                # drop mode and split line according to spaces and commas into a list
-                mode_particle_list = re.sub(r"[,mode]", " ", line)
-                    
-                information_dict['mode'] = mode_particle_list
-
-            elif line.startswith("nps"):
-                # parse nps
-                information_dict['nps'] = int(float(line.split()[1]))
-        return information_dict
+        return self.parse_data_block()["physics"]
 
     def split_comment_from_line(self, line, comment=""):
         """
@@ -260,20 +365,35 @@ class FileParser(object):
 
     def read_file(self):
         """
-        Reads the file and stores the lines in the `lines` attribute in lower case.
+        Reads the file line by line and stores the lines in the `lines` attribute in lower case.
         """
         try:
             with open(self.filename, 'r') as file:
-                self.lines = [line.lower() for line in file.readlines()]
+                self.read_lines(file)
         except Exception as e:
             self.logger.exception("Error reading file: {}\n".format(str(e))) 
+
+    def read_text(self, text):
+        """
+        Splits the text of the whole input into the `lines` attribute in lower case,
+        the lines keep their newline characters the same way as file.readlines().
+        The text is split and lowered line by line, so no other copy of the whole text is made.
+        """
+        self.read_lines(match.group() for match in LINE_PATTERN.finditer(text))
+
+    def read_lines(self, lines):
+        """ stores the lines in the `lines` attribute in lower case, with '\r\n' and '\r' line ends as '\n' """
+        self.lines = [line.rstrip("\r\n").lower() + "\n" if line.endswith(("\n", "\r")) else line.lower()
+                      for line in lines]
         
     @classmethod
-    def from_file(cls, file_path, error_collection):
+    def from_file(cls, file_path, error_collection, previous_parser=None, lazy=False):
         """
         Class method to create an instance of FileParser from a file path.
+        If the previous parser of the file is given, the instances of its unchanged cards are reused.
         """
-        instance = cls(file_path, error_collection)
+        card_cache = CardCache(previous_parser.card_cache) if previous_parser is not None else None
+        instance = cls(file_path, error_collection, card_cache, lazy)
 
         
         instance.read_file()
@@ -281,6 +401,19 @@ class FileParser(object):
         instance.logger.info("FileParser created from file: %s", file_path)  
 
         return instance
- 
-        
 
+    @classmethod
+    def from_buffer(cls, text, error_collection, filename=None, previous_parser=None, lazy=False):
+        """
+        Class method to create an instance of FileParser from the text of the editor buffer,
+        e.g. editor.getCharacterPointer(). Gives the same result as from_file without reading the file from disk,
+        so unsaved edits are parsed as well.
+        """
+        card_cache = CardCache(previous_parser.card_cache) if previous_parser is not None else None
+        instance = cls(filename, error_collection, card_cache, lazy)
+
+        instance.read_text(text)
+        instance.analyse_file()
+        instance.logger.info("FileParser created from buffer of: %s", filename)
+
+        return instance
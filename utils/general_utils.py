@@ -1,13 +1,15 @@
 
+import os
 import logging
-import os, json
+import time
 # Add the format_notifier_message function
 def initialise_json_data( filename):
-        current_dir = os.path.dirname(__file__)
-        file_path = os.path.join(current_dir, '..', 'data', filename)
-        with open(file_path, 'r') as json_file:
-            surface_info = json.load(json_file)
-        return surface_info
+        """ returns the shared dataset of the data file, see DataRegistry """
+        try:
+            from npp_mcnp_plugin.utils.data_registry import load_data
+        except ImportError:
+            from utils.data_registry import load_data
+        return load_data(filename)
 
 def validate_return_id_as_int(id):
     # Step 1: Validate and Convert material_id
@@ -20,6 +22,11 @@ def validate_return_id_as_int(id):
             raise ValueError("Invalid value '{}' provided. Expected an integer.".format(id))
     return id
 
+def file_stamp(path):
+    """ modification time and size of the file, a changed stamp invalidates what was read or parsed from the file """
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
 def format_notifier_message(items_to_show):
     """
     Formats message for the notifier into a string.
@@ -67,4 +74,30 @@ def find_by_key_and_prefix(search_prefix, json_data, search_key_string=None):
             continue
         if value["prefix"][0].lower() == search_prefix:
             return value.get("body")
-    return None   
\ No newline at end of file
+    return None   
+
+
+class PhaseTimer(object):
+    """
+    Records the duration of consecutive phases, e.g. of the plugin startup.
+    """
+    def __init__(self, start=None, clock=time.time):
+        self.clock = clock
+        self.start = start if start is not None else clock()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        """ ends the phase which started at the previous mark """
+        now = self.clock()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def elapsed(self):
+        return self.clock() - self.start
+
+    def summary(self):
+        """ e.g. "imports 12.0 ms, callbacks 0.3 ms, total 12.3 ms" """
+        parts = ["{} {:.1f} ms".format(phase, seconds * 1000) for phase, seconds in self.phases]
+        parts.append("total {:.1f} ms".format((self.last - self.start) * 1000))
+        return ", ".join(parts)
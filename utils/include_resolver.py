@@ -0,0 +1,216 @@
+import os
+import logging
+import threading
+
+try:
+    from npp_mcnp_plugin.models.error import ErrorCollection, ErrorModel
+    from npp_mcnp_plugin.utils.card_patterns import PATTERNS
+    from npp_mcnp_plugin.utils.general_utils import file_stamp
+except ImportError:
+    from models.error import ErrorCollection, ErrorModel
+    from utils.card_patterns import PATTERNS
+    from utils.general_utils import file_stamp
+
+logger = logging.getLogger(__name__)
+
+# model components of the cards each block can contain
+BLOCK_COMPONENTS = {
+    "cells": ["cells"],
+    "surfaces": ["surfaces"],
+    "physics": ["materials", "transformations", "tallies"],
+}
+
+
+class IncludedFile(object):
+    """
+    Cards parsed from a file included with a READ card into one of the blocks of the input.
+    """
+    def __init__(self, path, block_type, components, errors, includes=None, stamp=None):
+        self.path = path
+        # file_stamp of the file when it was read
+        self.stamp = stamp
+        self.block_type = block_type
+        # component -> {id: instance}
+        self.components = components
+        self.errors = errors or []
+        # files included by this file
+        self.includes = includes or []
+
+    def iter_files(self):
+        """ yields this file and all the files it includes """
+        yield self
+        for included_file in self.includes:
+            for nested_file in included_file.iter_files():
+                yield nested_file
+
+
+class IncludeCache(object):
+    """
+    Parsed included files by path and block type, shared by every parsed input.
+    An entry is valid while the modification time and size of the file and of the files it includes are unchanged,
+    so a shared library (e.g. materials) is parsed once for every deck including it.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, block_type):
+        with self._lock:
+            entry = self._entries.get((path, block_type))
+        if entry is None:
+            return None
+        stamps, included_file = entry
+        try:
+            for file_path, stamp in stamps:
+                if stamp != file_stamp(file_path):
+                    return None
+        except OSError:
+            return None
+        return included_file
+
+    def put(self, path, block_type, included_file):
+        stamps = [(nested_file.path, nested_file.stamp) for nested_file in included_file.iter_files()]
+        with self._lock:
+            self._entries[(path, block_type)] = (stamps, included_file)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+INCLUDE_CACHE = IncludeCache()
+
+
+def find_read_cards(block):
+    """
+    Returns (line, file name) of the READ cards in the formatted block.
+    """
+    read_cards = []
+    for line in block:
+        match = PATTERNS["read_card"].match(line)
+        if match:
+            read_cards.append((line, match.group(1)))
+    return read_cards
+
+
+def resolve_path(file_name, directory):
+    """
+    Returns the path of the included file relative to the directory of the including file.
+    The lines are parsed in lower case, so when the path doesn't exist the directory is searched case-insensitively.
+    """
+    path = os.path.normpath(os.path.join(directory, file_name))
+    if os.path.exists(path):
+        return path
+    parent = os.path.dirname(path)
+    try:
+        for entry in os.listdir(parent):
+            if entry.lower() == os.path.basename(path).lower():
+                return os.path.join(parent, entry)
+    except OSError:
+        pass
+    return None
+
+
+def parse_included_file(parser_class, path, block_type, cache=INCLUDE_CACHE, visited=()):
+    """
+    Parses the file included into the given block, nested READ cards are resolved as well.
+    The cached result is returned if the file didn't change since it was parsed.
+    """
+    included_file = cache.get(path, block_type)
+    if included_file is not None:
+        logger.debug("Include cache hit: %s", path)
+        return included_file
+
+    stamp = file_stamp(path)
+    error_collection = ErrorCollection()
+    parser = parser_class(path, error_collection)
+    # nested READ cards are resolved below, not by the getters of the parser
+    parser.included_files = []
+    parser.read_file()
+    parser.block = {block_type: parser.format_blocks(parser.lines or [])}
+
+    if block_type == "cells":
+        components = {"cells": parser.get_cells()}
+    elif block_type == "surfaces":
+        components = {"surfaces": parser.get_surfaces()}
+    else:
+        data_block = parser.parse_data_block()
+        components = dict((component, data_block[component]) for component in BLOCK_COMPONENTS["physics"])
+
+    includes = resolve_read_cards(parser_class, parser.block[block_type], block_type, os.path.dirname(path),
+                                  error_collection, cache, tuple(visited) + (path,))
+
+    included_file = IncludedFile(path, block_type, components, error_collection.get_all_errors(), includes, stamp)
+    cache.put(path, block_type, included_file)
+    return included_file
+
+
+def _include_jobs(block, block_type, directory, error_collection, visited=()):
+    """
+    Returns (line, path, block type) of the READ cards in the block,
+    missing and circular includes are reported to the error collection.
+    """
+    jobs = []
+    for line, file_name in find_read_cards(block):
+        path = resolve_path(file_name, directory)
+        if path is None:
+            error_collection.add_error(ErrorModel(line, "Included file {} not found".format(file_name), "INCLUDE_NOT_FOUND"))
+        elif path in visited:
+            error_collection.add_error(ErrorModel(line, "File {} includes itself".format(file_name), "INCLUDE_CIRCULAR"))
+        else:
+            jobs.append((line, path, block_type))
+    return jobs
+
+
+def _parse_job(parser_class, job, cache, visited=()):
+    """ returns (IncludedFile, None) or (None, ErrorModel) """
+    line, path, block_type = job
+    try:
+        return parse_included_file(parser_class, path, block_type, cache, visited), None
+    except Exception as e:
+        logger.error("Error while parsing included file '%s': %s", path, e)
+        return None, ErrorModel(line, e, "INCLUDE_INVALID")
+
+
+def _collect_results(results, error_collection):
+    included_files = []
+    for included_file, error in results:
+        if error is not None:
+            error_collection.add_error(error)
+        else:
+            included_files.append(included_file)
+    return included_files
+
+
+def resolve_read_cards(parser_class, block, block_type, directory, error_collection, cache=INCLUDE_CACHE, visited=()):
+    """
+    Parses the files of the READ cards of an included file, one after the other in the calling worker.
+    """
+    jobs = _include_jobs(block, block_type, directory, error_collection, visited)
+    return _collect_results([_parse_job(parser_class, job, cache, visited) for job in jobs], error_collection)
+
+
+def resolve_includes(parser, parser_class, cache=INCLUDE_CACHE):
+    """
+    Resolves the READ cards of all the blocks of the parsed input, the included files are parsed one after the other
+    (parsing is bound by the interpreter, threads wouldn't parse them faster).
+    The paths are relative to the directory of the input, the READ cards of a text without a file are not resolved.
+
+    Returns:
+        list: IncludedFile of every included file, nested includes are listed after their including file.
+    """
+    if not parser.filename:
+        logger.debug("Input without a file name, READ cards are not resolved")
+        return []
+    directory = os.path.dirname(os.path.abspath(parser.filename))
+    jobs = []
+    for block_type in ["cells", "surfaces", "physics"]:
+        if block_type in parser.block:
+            jobs.extend(_include_jobs(parser.block[block_type], block_type, directory, parser.error_collection))
+
+    results = [_parse_job(parser_class, job, cache) for job in jobs]
+
+    included_files = []
+    for included_file in _collect_results(results, parser.error_collection):
+        included_files.extend(included_file.iter_files())
+    return included_files
@@ -1,7 +1,19 @@
 from npp_mcnp_plugin.models.mcnp_input_cards import Surface, Cell, Material, Transformation, Tally, Isotope
-from npp_mcnp_plugin.utils.general_utils import initialise_json_data, find_by_key_and_prefix
+from npp_mcnp_plugin.models.reference_index import REFERENCE_MAPS, REFERENCE_COMPONENTS
+from npp_mcnp_plugin.utils.data_registry import load_data
+from npp_mcnp_plugin.utils.snippet_index import get_snippet_index, MACROBODY_CATEGORY
 import os, json, logging
 
+# reverse reference map -> error code and message of the card referencing missing ids, see ReferenceIndex.dangling
+REFERENCE_ERRORS = {
+    "surface_cells": ("CELL_INVALID_SURFACES", "Cell ID {} invalid surface(s) {}."),
+    "cell_cells": ("CELL_INVALID_CELLS", "Cell ID {} invalid complemented cell(s) {}."),
+    "material_cells": ("CELL_INVALID_MATERIAL", "Cell ID {} invalid material {}."),
+    "transformation_cells": ("CELL_INVALID_TRANSFORMATION", "Cell ID {} invalid transformation {}."),
+    "transformation_surfaces": ("SURFACE_INVALID_TRANSFORMATION", "Surface ID {} invalid transformation {}."),
+    "surface_tallies": ("TALLY_INVALID_SURFACES", "Tally id {} invalid surface(s) {}."),
+    "cell_tallies": ("TALLY_INVALID_CELLS", "Tally id {} invalid cell(s) {}."),
+}
 
 class InputValidator(object):
     """
@@ -9,35 +21,64 @@ class InputValidator(object):
     """
 
     def __init__(self):
-        self.surface_info = initialise_json_data('surface_info.json')
-        self.particle_designators_info = initialise_json_data('particle_designators_info.json')
-        self.physics_and_macrobodies_info = initialise_json_data("mcnp.tmSnippets.json")
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    def validate_cell(self, cell, existing_surface_ids):
+    # the datasets are loaded on first use and shared with the rest of the plugin
+    @property
+    def surface_info(self):
+        return load_data('surface_info.json')
+
+    @property
+    def particle_designators_info(self):
+        return load_data('particle_designators_info.json')
+
+    def validate_cell(self, cell, existing_surface_ids=None):
         """
         Validates a cell object and returns an error code and message if necessary.
+        The surfaces are checked only if existing_surface_ids is given, validate_references checks the whole model.
         """
         if not isinstance(cell, Cell):
             return "CELL_INVALID_OBJECT", "Invalid cell object. Expected a Cell object."
         
-        invalid_surfaces = filter(lambda surface_key: surface_key not in existing_surface_ids, cell.surfaces) if cell.surfaces else None
+        invalid_surfaces = None
+        if cell.surfaces and existing_surface_ids is not None:
+            invalid_surfaces = [surface_key for surface_key in cell.surfaces if abs(surface_key) not in existing_surface_ids]
         if invalid_surfaces:
             return "CELL_INVALID_SURFACES", "Cell ID {} invalid surface(s) {}.".format(cell.id, invalid_surfaces)
         if not cell.surfaces:
             return "CELL_NO_SURFACES", "Cell ID {} has no surfaces.".format(cell.id)
         return None, None
 
+    def validate_references(self, reference_index, present_ids):
+        """
+        Validates the references of all the cards at once: surfaces, complemented cells, materials and trcl of the cells,
+        transformations of the surfaces and surfaces/cells of the tallies.
+
+        Args:
+            reference_index (ReferenceIndex): reverse reference maps of the model.
+            present_ids (function): returns the set of ids of a model component.
+
+        Returns:
+            list: (referencing component, referencing id, error code, message) of every card referencing missing ids.
+        """
+        errors = []
+        dangling = reference_index.dangling(present_ids)
+        for name in REFERENCE_MAPS:
+            missing_by_card = dangling.get(name, {})
+            referencing_component = REFERENCE_COMPONENTS[name][1]
+            error_code, message = REFERENCE_ERRORS[name]
+            for item_id, missing_ids in sorted(missing_by_card.items()):
+                errors.append((referencing_component, item_id, error_code, message.format(item_id, missing_ids)))
+        return errors
+
     def validate_surface(self, surface):
         """
         Validates a surface object and returns an error code and message if necessary.
         """
-        valid_surface_types = self.surface_info.keys()
-
         if not isinstance(surface, Surface):
             return "SURFACE_INVALID_OBJECT", "Invalid surface object. Expected a Surface object."
-        if surface.surface_type not in valid_surface_types:
-            surface_info_body = find_by_key_and_prefix(surface.surface_type, self.physics_and_macrobodies_info, search_key_string="macrobody")
+        if surface.surface_type not in self.surface_info:
+            surface_info_body = get_snippet_index().find_body(surface.surface_type, MACROBODY_CATEGORY)
             if surface_info_body is None:
                 return "SURFACE_INVALID_TYPE", "Surface ID {} invalid surface type {}.".format(surface.id, surface.surface_type)
         return None, None
@@ -0,0 +1,126 @@
+import os
+import hashlib
+import logging
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from npp_mcnp_plugin.models.error import ErrorCollection, ErrorModel
+    from npp_mcnp_plugin.utils.general_utils import file_stamp
+except ImportError:
+    from models.error import ErrorCollection, ErrorModel
+    from utils.general_utils import file_stamp
+
+# cached models of another plugin version are never loaded, keep in sync with setup.py
+PLUGIN_VERSION = "0.9"
+# bumped when the layout of the cache entries changes
+CACHE_FORMAT = 9
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".npp_mcnp_plugin", "parse_cache")
+# number of cache entries kept, the least recently written are removed first
+MAX_CACHE_ENTRIES = 50
+
+
+class ParseCache(object):
+    """
+    On-disk cache of the parsed and validated MCNP input, keyed by the hash of the text and the plugin version.
+
+    An entry holds the pickled ModelMcnpInput, the validation errors and the stamps of the included files,
+    so an unchanged deck is loaded without being parsed or validated again.
+    Lazy card dictionaries only store the source of their cards, which keeps the entries compact.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, plugin_version=PLUGIN_VERSION, max_entries=MAX_CACHE_ENTRIES):
+        self.cache_dir = cache_dir
+        self.plugin_version = plugin_version
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def content_hash(self, text, filename=None):
+        """
+        returns the key of the text of the file, the same text gives the same key only for the same plugin version
+        and the same file, as the READ cards are resolved relative to the directory of the file.
+        """
+        if not isinstance(text, bytes):
+            text = text.encode("utf-8")
+        path = os.path.abspath(filename) if filename else ""
+        if not isinstance(path, bytes):
+            path = path.encode("utf-8")
+        digest = hashlib.md5("{}:{}\0".format(self.plugin_version, CACHE_FORMAT).encode("utf-8"))
+        digest.update(path + b"\0")
+        digest.update(text)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pickle")
+
+    def load(self, key):
+        """
+        Returns the cached (ModelMcnpInput, ErrorCollection) of the key,
+        None if there is no entry or one of the included files changed since it was stored.
+        """
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as cache_file:
+                entry = pickle.load(cache_file)
+        except Exception as e:
+            self.logger.warning("Dropping unreadable parse cache entry %s: %s", path, e)
+            self._remove(path)
+            return None
+
+        for included_path, stamp in entry["included_files"]:
+            try:
+                if file_stamp(included_path) != stamp:
+                    return None
+            except OSError:
+                return None
+
+        error_collection = ErrorCollection()
+        for line, message, error_code in entry["errors"]:
+            error_collection.add_error(ErrorModel(line, message, error_code))
+        self.logger.info("Parse cache hit: %s", key)
+        return entry["model"], error_collection
+
+    def store(self, key, mcnp_input, error_collection, included_files=()):
+        """
+        Stores the model and its validation errors, the entry is written to a temporary file and renamed
+        so a concurrently loading editor never reads a partial entry.
+        """
+        entry = {
+            "model": mcnp_input,
+            "errors": [(error.line, str(error.message), error.error_code) for error in error_collection.get_all_errors() or []],
+            "included_files": [(included_file.path, file_stamp(included_file.path)) for included_file in included_files],
+        }
+        path = self._entry_path(key)
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(temporary_path, "wb") as cache_file:
+                pickle.dump(entry, cache_file, pickle.HIGHEST_PROTOCOL)
+            # os.rename doesn't replace an existing file on Windows
+            self._remove(path)
+            os.rename(temporary_path, path)
+        except Exception as e:
+            self.logger.warning("Could not store parse cache entry %s: %s", path, e, exc_info=True)
+            self._remove(temporary_path)
+            return False
+        self._prune()
+        return True
+
+    def _prune(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".pickle")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
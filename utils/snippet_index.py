@@ -0,0 +1,109 @@
+import threading
+
+try:
+    from npp_mcnp_plugin.utils.data_registry import load_data
+except ImportError:
+    from utils.data_registry import load_data
+
+SNIPPETS_FILE = "mcnp.tmSnippets.json"
+# snippets whose name contains "macrobody" are surface types, the others are data cards
+MACROBODY_CATEGORY = "macrobody"
+CARD_CATEGORY = "card"
+
+
+def snippet_category(name):
+    return MACROBODY_CATEGORY if MACROBODY_CATEGORY in name.lower() else CARD_CATEGORY
+
+
+def snippet_keyword(prefix):
+    """
+    Returns the lowercase card keyword typed for the snippet prefix,
+    e.g. "PHYS:n" -> "phys:n", "FMESHn (rec)" -> "fmesh", the trailing n of "FMESHn" stands for the card number.
+    """
+    keyword = prefix.split()[0] if prefix.strip() else prefix
+    if len(keyword) > 1 and keyword.endswith("n") and keyword[-2].isupper():
+        keyword = keyword[:-1]
+    return keyword.lower()
+
+
+class _TrieNode(object):
+    __slots__ = ("children", "keywords")
+
+    def __init__(self):
+        self.children = {}
+        # keywords of the subtree, sorted
+        self.keywords = []
+
+
+class SnippetIndex(object):
+    """
+    Index of the snippets of mcnp.tmSnippets.json.
+
+    The snippets are indexed by category and lowercase prefix, so a macrobody is found with one dictionary access,
+    and their keywords are kept in a trie whose nodes list the keywords below them,
+    so the completions of the typed letters are read from one node.
+    """
+    def __init__(self, snippets):
+        # (category, lowercase prefix) -> snippet
+        self.by_prefix = {}
+        self.root = _TrieNode()
+        keywords = set()
+        for name, snippet in snippets.items():
+            # entries without a prefix (e.g. "ARB": "Arbitrary Polyhedron") are not snippets
+            if not isinstance(snippet, dict) or not snippet.get("prefix"):
+                continue
+            category = snippet_category(name)
+            for prefix in snippet["prefix"]:
+                self.by_prefix.setdefault((category, prefix.lower()), snippet)
+                if category == CARD_CATEGORY:
+                    keywords.add(snippet_keyword(prefix))
+        for keyword in sorted(keywords):
+            self._add_keyword(keyword)
+
+    def _add_keyword(self, keyword):
+        node = self.root
+        node.keywords.append(keyword)
+        for character in keyword:
+            node = node.children.setdefault(character, _TrieNode())
+            node.keywords.append(keyword)
+
+    def find(self, prefix, category=None):
+        """
+        Returns the snippet of the prefix (case insensitive), looked up in the category or in every category.
+        """
+        prefix = prefix.lower()
+        if category is not None:
+            return self.by_prefix.get((category, prefix))
+        for category in (MACROBODY_CATEGORY, CARD_CATEGORY):
+            snippet = self.by_prefix.get((category, prefix))
+            if snippet is not None:
+                return snippet
+        return None
+
+    def find_body(self, prefix, category=None):
+        """ returns the body lines of the snippet of the prefix, None if there is no such snippet """
+        snippet = self.find(prefix, category)
+        return snippet.get("body") if snippet is not None else None
+
+    def complete(self, typed, limit=None):
+        """ returns the card keywords starting with the typed letters (case insensitive), in alphabetical order """
+        node = self.root
+        for character in typed.lower():
+            node = node.children.get(character)
+            if node is None:
+                return []
+        return node.keywords[:limit] if limit is not None else list(node.keywords)
+
+
+_snippet_index = None
+_lock = threading.Lock()
+
+
+def get_snippet_index():
+    """ returns the shared index of the snippets, built on first use """
+    global _snippet_index
+    if _snippet_index is None:
+        with _lock:
+            if _snippet_index is None:
+                _snippet_index = SnippetIndex(load_data(SNIPPETS_FILE))
+    return _snippet_index
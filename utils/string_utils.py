@@ -1,4 +1,8 @@
 import re
+try:
+    from npp_mcnp_plugin.utils.card_patterns import PATTERNS, classify_card, compile_pattern
+except ImportError:
+    from utils.card_patterns import PATTERNS, classify_card, compile_pattern
 
 
 def get_block_type_from_line(logger, full_mcnp_input_line):
@@ -12,33 +16,9 @@ def get_block_type_from_line(logger, full_mcnp_input_line):
         str: The block type, one of ['surfaces', 'cells', 'physics'].
     """
     logger.debug("full line: %s", full_mcnp_input_line)
-    # Define regex patterns for each block type
-    patterns = {
-        'surfaces': [
-            r'^\d+\s+\d+\s+[a-zA-Z]+\s+[-]?\d+',  # First 'surfaces' pattern
-            r'^\d+\s+(?!like\b)[a-zA-Z]+\s+[-]?\d+',         # Second 'surfaces' pattern
-            r'^\d+\s+\d+\s+[a-zA-Z]+\s+[-]?.',  # First 'surfaces' pattern
-            r'^\d+\s+(?!like\b)[a-zA-Z]+\s+[-]?.',         # Second 'surfaces' pattern            
-        ],
-        'cells': [
-            r'^\d+\s+\d+\s+[-]?\d[\S+]?.*\s+\S+',           # 'cells' pattern
-            r'^\d+\s+0\s+[\S+]?.*\s+\S+', # 'cells' 0 pattern
-            r'^\d+\s+like\s+\d+\s+but',                     
-        ],
-        "physics": [
-            r'^kcode\s+.*',
-            r'^mode\s+.*',
-        ],
-    }
-    
-    # Check the line against each pattern in order
-    for block_type, regex_list in patterns.items():
-        for pattern in regex_list:
-            if re.match(pattern, full_mcnp_input_line):
-                return block_type
-    
-    # If no patterns match, default to 'undefined'
-    return None
+    # single match of the precompiled card classifier, see utils/card_patterns.py
+    block_type, card_kind = classify_card(full_mcnp_input_line)
+    return block_type
 def is_comment_selected(model_of_line):
      return
      
@@ -61,7 +41,7 @@ def is_match_at_start(line, regex_pattern):
     """
     checks if line starts with a specific regex pattern
     """
-    return bool(re.match(regex_pattern, line))
+    return bool(compile_pattern(regex_pattern).match(line))
 
 def return_list_entries_starting_with_string(my_list, string):
     """
@@ -87,7 +67,7 @@ def extract_keyword_value(line, keyword):
         Returns:
             The value associated with the keyword, or None if the keyword is not found.
         """
-        match = re.search(r'{}\s*=\s*(\S+)'.format(keyword), line)
+        match = compile_pattern(r'{}\s*=\s*(\S+)'.format(keyword)).search(line)
         return match.group(1) if match else None
 
 def remove_comments(line):
@@ -108,6 +88,6 @@ def remove_comments(line):
     # Helper method for regular expressions (example)
 def return_last_number_in_string(string):
         try:
-            return re.findall(r'\d+', string)[-1]
+            return PATTERNS["number"].findall(string)[-1]
         except IndexError:
             return None 
\ No newline at end of file